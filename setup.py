@@ -26,7 +26,7 @@ test_requirements = ['nose',
                     'formencode>=1.3.0a1',
                     'tw2.forms',
                     'Beaker',
-                    'Kajiki >= 0.4.4']
+                    'Kajiki >= 0.6.3, < 0.10']
 
 if py_version == (3, 2):
     # jinja2 2.7 is incompatible with Python 3.2
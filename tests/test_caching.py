@@ -8,10 +8,24 @@ For more details.
 """
 
 
+import threading
+import time
+
 import tg
 from tg.controllers import TGController
-from tg.decorators import expose, cached
+from tg.decorators import expose, cached, cached_response, validate, require
+from tg.predicates import not_anonymous
+from tg.validation import Convert
 from tg.caching import create_cache_key, cached_property, beaker_cache
+from tg.caching import _SingleFlight, _single_flight, _get_cached_value, invalidate_tags
+from tg.caching import CacheMetrics, cache_metrics, _args_names
+from tg._compat import PY3
+from nose import SkipTest
+from nose.tools import assert_raises
+from tg.support.cache import MemoryCacheManager, MemoryCache, LayeredCacheManager
+from tg.appwrappers.caching import CacheApplicationWrapper, CacheMetricsApplicationWrapper
+from tg.appwrappers.session import SessionApplicationWrapper
+from tg.configuration.utils import DependenciesList
 from tg.controllers.util import etag_cache
 from tg import cache
 from tests.base import TestWSGIController, make_app, setup_session_dir, teardown_session_dir
@@ -41,6 +55,7 @@ class MockTime:
 mocktime = MockTime()
 import beaker.container
 beaker.container.time = mocktime
+from beaker.cache import CacheManager
 
 class TestCachedProperty(object):
     def setup(self):
@@ -184,6 +199,11 @@ class SessionTouchController(TGController):
         else:
             return 'NOTOUCH'
 
+    @expose()
+    def session_get_translated(self):
+        tg.i18n.ugettext('Hello')
+        return self.session_get()
+
 
 class TestSessionTouch(TestWSGIController):
     def test_prova(self):
@@ -191,13 +211,20 @@ class TestSessionTouch(TestWSGIController):
             'i18n.no_session_touch': False,
             'i18n.enabled': True
         })
-        assert 'ACCESSED' in app.get('/session_get')
+        assert 'ACCESSED' in app.get('/session_get_translated')
 
     def test_avoid_touch(self):
         app = make_app(SessionTouchController, config_options={
             'i18n.no_session_touch': True,
             'i18n.enabled': True
         })
+        assert 'NOTOUCH' in app.get('/session_get_translated')
+
+    def test_untranslated_request_no_touch(self):
+        app = make_app(SessionTouchController, config_options={
+            'i18n.no_session_touch': False,
+            'i18n.enabled': True
+        })
         assert 'NOTOUCH' in app.get('/session_get')
 
 
@@ -284,6 +311,12 @@ class CachedController(TGController):
         CachedController.CALL_COUNT += 1
         return 'Counter=%s' % CachedController.CALL_COUNT
 
+    @expose()
+    @cached(key=['arg1'])
+    def specified_cache_key_list(self, arg1, arg2):
+        CachedController.CALL_COUNT += 1
+        return 'Counter=%s' % CachedController.CALL_COUNT
+
     @expose()
     @cached(query_args=True)
     def cache_with_args(self, arg):
@@ -421,6 +454,16 @@ class TestCacheTouch(TestWSGIController):
         r = self.app.get('/specified_cache_key_args/x/y')
         assert 'Counter=1' in r
 
+    def test_specified_cache_key_list(self):
+        self.CACHED_CONTROLLER.CALL_COUNT = 0
+
+        r = self.app.get('/specified_cache_key_list?arg1=x&arg2=y')
+        assert 'Counter=1' in r
+        r = self.app.get('/specified_cache_key_list?arg1=x&arg2=z')
+        assert 'Counter=1' in r
+        r = self.app.get('/specified_cache_key_list?arg1=y&arg2=z')
+        assert 'Counter=2' in r
+
     def test_cache_with_args(self):
         self.CACHED_CONTROLLER.CALL_COUNT = 0
 
@@ -458,6 +501,38 @@ class TestCacheTouch(TestWSGIController):
         assert namespace == 'tests.test_caching.Something'
         assert key == 'method'
 
+    def test_cache_key_sorted(self):
+        def method(a, b, c):
+            pass
+
+        namespace, key = create_cache_key(method, dict(c=3, a=1, b=2))
+        assert key == 'method a=1 b=2 c=3', key
+
+    def test_cache_key_hashed(self):
+        def method(arg):
+            pass
+
+        namespace, key = create_cache_key(method, dict(arg='x' * 100), key_max_length=50)
+        assert key.startswith('method '), key
+        assert len(key) == len('method ') + 40, key
+
+        namespace, key = create_cache_key(method, dict(arg=u'\xe0'), key_max_length=5)
+        assert len(key) == len('method ') + 40, key
+
+        namespace, key = create_cache_key(method, dict(arg='x'), key_max_length=50)
+        assert key == 'method arg=x', key
+
+    def test_make_dict_from_args(self):
+        from tg.caching import _make_dict_from_args, _args_names
+
+        def method(self, a, b):
+            pass
+
+        args_names = _args_names(method)
+        assert args_names == ((1, 'a'), (2, 'b')), args_names
+        assert _make_dict_from_args(method, (None, 1), dict(b=2), args_names) == dict(a=1, b=2)
+        assert _make_dict_from_args(method, (None, 1, 2), {}) == dict(a=1, b=2)
+
     def test_cache_key_function(self):
         def method(self, arg):
             return arg
@@ -568,3 +643,831 @@ class TestBeakerCacheTouch(TestWSGIController):
         assert 'Counter=1' in r
         r = self.app.get('/disabled_cache')
         assert 'Counter=2' in r
+
+
+class CachedResponseController(TGController):
+    CALL_COUNT = 0
+
+    @expose()
+    def clear_cache(self):
+        curcache = tg.cache.get_cache('tests.test_caching.CachedResponseController')
+        curcache.clear()
+        return ''
+
+    @expose('json')
+    @cached_response()
+    def json_response(self, arg=None):
+        CachedResponseController.CALL_COUNT += 1
+        return dict(counter=CachedResponseController.CALL_COUNT, arg=arg)
+
+    @expose()
+    @cached_response(key='arg')
+    def specified_cache_key(self, arg=None, other=None):
+        CachedResponseController.CALL_COUNT += 1
+        return 'Counter=%s' % CachedResponseController.CALL_COUNT
+
+    @expose()
+    @cached_response(vary=('identity', ))
+    def by_identity(self):
+        CachedResponseController.CALL_COUNT += 1
+        return 'Counter=%s' % CachedResponseController.CALL_COUNT
+
+    @expose()
+    @cached_response(vary=(lambda context: context.request.headers.get('X-Vary'), ))
+    def custom_vary(self):
+        CachedResponseController.CALL_COUNT += 1
+        return 'Counter=%s' % CachedResponseController.CALL_COUNT
+
+    @expose()
+    def validation_failed(self, **kw):
+        return 'Invalid'
+
+    @expose()
+    @validate({'value': Convert(int, 'Not a number')}, error_handler=validation_failed)
+    @cached_response()
+    def validated(self, value=None):
+        CachedResponseController.CALL_COUNT += 1
+        return 'Counter=%s' % CachedResponseController.CALL_COUNT
+
+    @expose()
+    @cached_response()
+    def failing(self):
+        CachedResponseController.CALL_COUNT += 1
+        tg.response.status = 500
+        return 'Counter=%s' % CachedResponseController.CALL_COUNT
+
+    @expose()
+    @require(not_anonymous())
+    @cached_response(vary=())
+    def protected(self):
+        CachedResponseController.CALL_COUNT += 1
+        return 'Counter=%s' % CachedResponseController.CALL_COUNT
+
+    @expose()
+    @cached_response()
+    def req_cache_key(self, arg=None):
+        return '%s ~ %s' % (tg.request.caching.namespace, tg.request.caching.key)
+
+
+class TestCachedResponse(TestWSGIController):
+    def __init__(self, *args, **kargs):
+        TestWSGIController.__init__(self, *args, **kargs)
+        self.app = make_app(CachedResponseController)
+
+    def setUp(self):
+        super(TestCachedResponse, self).setUp()
+        self.app.get('/clear_cache')
+        CachedResponseController.CALL_COUNT = 0
+
+    def test_response_cached(self):
+        r = self.app.get('/json_response?arg=x')
+        assert r.json == dict(counter=1, arg='x'), r
+        r = self.app.get('/json_response?arg=x')
+        assert r.json == dict(counter=1, arg='x'), r
+        assert r.content_type == 'application/json', r.content_type
+        r = self.app.get('/json_response?arg=y')
+        assert r.json == dict(counter=2, arg='y'), r
+
+    def test_hooks_skipped_on_hit(self):
+        called = []
+        def before_validate_hook(*args, **kw):
+            called.append(True)
+        tg.hooks.register('before_validate', before_validate_hook,
+                          controller=CachedResponseController.json_response)
+        try:
+            self.app.get('/json_response')
+            self.app.get('/json_response')
+        finally:
+            tg.hooks.disconnect('before_validate', before_validate_hook,
+                                controller=CachedResponseController.json_response)
+        assert len(called) == 1, called
+
+    def test_specified_cache_key(self):
+        r = self.app.get('/specified_cache_key?arg=x&other=1')
+        assert 'Counter=1' in r
+        r = self.app.get('/specified_cache_key?arg=x&other=2')
+        assert 'Counter=1' in r
+        r = self.app.get('/specified_cache_key?arg=y&other=2')
+        assert 'Counter=2' in r
+
+    def test_vary_identity(self):
+        alice = {'repoze.who.identity': {'repoze.who.userid': 'alice'}}
+        bob = {'repoze.who.identity': {'repoze.who.userid': 'bob'}}
+        r = self.app.get('/by_identity', extra_environ=alice)
+        assert 'Counter=1' in r
+        r = self.app.get('/by_identity', extra_environ=bob)
+        assert 'Counter=2' in r
+        r = self.app.get('/by_identity', extra_environ=alice)
+        assert 'Counter=1' in r
+        r = self.app.get('/by_identity')
+        assert 'Counter=3' in r
+
+    def test_vary_callable(self):
+        r = self.app.get('/custom_vary', headers={'X-Vary': 'a'})
+        assert 'Counter=1' in r
+        r = self.app.get('/custom_vary', headers={'X-Vary': 'b'})
+        assert 'Counter=2' in r
+        r = self.app.get('/custom_vary', headers={'X-Vary': 'a'})
+        assert 'Counter=1' in r
+
+    def test_invalid_vary(self):
+        try:
+            cached_response(vary=('nothing', ))
+        except ValueError:
+            pass
+        else:
+            assert False, 'Should have raised ValueError'
+
+    def test_validation_errors_not_cached(self):
+        r = self.app.get('/validated?value=nan')
+        assert 'Invalid' in r
+        r = self.app.get('/validated?value=5')
+        assert 'Counter=1' in r
+        r = self.app.get('/validated?value=nan')
+        assert 'Invalid' in r
+        r = self.app.get('/validated?value=5')
+        assert 'Counter=1' in r
+
+    def test_errors_not_cached(self):
+        r = self.app.get('/failing', status=500)
+        assert 'Counter=1' in r
+        r = self.app.get('/failing', status=500)
+        assert 'Counter=2' in r
+
+    def test_requirements_checked_on_hit(self):
+        identity = {'repoze.who.userid': 'alice'}
+        alice = {'repoze.who.identity': identity, 'repoze.what.credentials': identity}
+        r = self.app.get('/protected', extra_environ=alice)
+        assert 'Counter=1' in r
+        self.app.get('/protected', status=401)
+        r = self.app.get('/protected', extra_environ=alice)
+        assert 'Counter=1' in r
+
+    def test_cache_disabled(self):
+        # cached_response reads the configuration of the application
+        app = make_app(CachedResponseController, config_options={'cache.enabled': False})
+        r = app.get('/json_response')
+        assert r.json['counter'] == 1
+        r = app.get('/json_response')
+        assert r.json['counter'] == 2
+
+    def test_request_caching_info(self):
+        r = self.app.get('/req_cache_key?arg=5')
+        assert 'tests.test_caching.CachedResponseController ~ req_cache_key arg=5 ' \
+               'content_type:text/html lang:[] identity:None' in r, r
+
+
+class TestSingleFlight(object):
+    def setup(self):
+        self.cache = CacheManager(type='memory').get_cache('tests.test_caching.SingleFlight')
+        self.calls = []
+        self.release = threading.Event()
+
+    def _start_threads(self, target, count):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(target()))
+                   for i in range(count)]
+        for t in threads:
+            t.start()
+        return threads, results
+
+    def _wait_running(self, flight, key):
+        for i in range(100):
+            if flight.running(key):
+                return
+            time.sleep(0.01)
+        assert False, 'Call never started'
+
+    def _slow_create(self):
+        self.calls.append(True)
+        self.release.wait()
+        return 'value%s' % len(self.calls)
+
+    def test_concurrent_calls_performed_once(self):
+        flight = _SingleFlight()
+        leader, results = self._start_threads(lambda: flight.call('key', self._slow_create), 1)
+        self._wait_running(flight, 'key')
+
+        waiters, waiter_results = self._start_threads(
+            lambda: flight.call('key', self._slow_create), 9
+        )
+        time.sleep(0.1)
+        self.release.set()
+        for t in leader + waiters:
+            t.join()
+
+        assert len(self.calls) == 1, self.calls
+        assert results + waiter_results == ['value1'] * 10, results + waiter_results
+        assert not flight.running('key')
+
+    def test_errors_propagated_to_waiters(self):
+        flight = _SingleFlight()
+        errors = []
+
+        def failing():
+            self.calls.append(True)
+            self.release.wait()
+            raise ValueError('Failed')
+
+        def call():
+            try:
+                flight.call('key', failing)
+            except ValueError as e:
+                errors.append(e)
+
+        leader, __ = self._start_threads(call, 1)
+        self._wait_running(flight, 'key')
+        waiters, __ = self._start_threads(call, 4)
+        time.sleep(0.1)
+        self.release.set()
+        for t in leader + waiters:
+            t.join()
+
+        assert len(self.calls) == 1, self.calls
+        assert len(errors) == 5, errors
+        assert not flight.running('key')
+
+    def test_recursive_call(self):
+        flight = _SingleFlight()
+        value = flight.call('key', lambda: flight.call('key', lambda: 'inner'))
+        assert value == 'inner', value
+
+    def test_cached_value_created_once(self):
+        def get():
+            return _get_cached_value(self.cache, 'created_once', self._slow_create,
+                                     expiretime=60)
+
+        flight_key = (self.cache.namespace_name, 'created_once')
+        leader, results = self._start_threads(get, 1)
+        self._wait_running(_single_flight, flight_key)
+        waiters, waiter_results = self._start_threads(get, 9)
+        time.sleep(0.1)
+        self.release.set()
+        for t in leader + waiters:
+            t.join()
+
+        assert len(self.calls) == 1, self.calls
+        assert results + waiter_results == ['value1'] * 10, results + waiter_results
+
+    def test_stale_value_served_while_creating(self):
+        def get():
+            return _get_cached_value(self.cache, 'stale', self._slow_create,
+                                     expiretime=0.05, stale_grace=60)
+
+        self.release.set()
+        assert get() == 'value1'
+        assert get() == 'value1'
+        assert len(self.calls) == 1, self.calls
+
+        time.sleep(0.1)
+        self.release.clear()
+        flight_key = (self.cache.namespace_name, 'stale')
+        leader, results = self._start_threads(get, 1)
+        self._wait_running(_single_flight, flight_key)
+
+        # While the new value is being created the expired one is served.
+        waiters, waiter_results = self._start_threads(get, 9)
+        for t in waiters:
+            t.join()
+        assert waiter_results == ['value1'] * 9, waiter_results
+
+        self.release.set()
+        for t in leader:
+            t.join()
+        assert results == ['value2'], results
+        assert get() == 'value2'
+        assert len(self.calls) == 2, self.calls
+
+    def test_stale_grace_toggled(self):
+        self.release.set()
+        value = {'content': 'value'}
+        create = lambda: self.calls.append(True) or value
+
+        assert _get_cached_value(self.cache, 'toggled', create, expiretime=60) == value
+        assert self.cache.get('toggled') == value
+        # Plain values have no creation time, so they are created again.
+        assert _get_cached_value(self.cache, 'toggled', create,
+                                 expiretime=60, stale_grace=60) == value
+        assert _get_cached_value(self.cache, 'toggled', create,
+                                 expiretime=60, stale_grace=60) == value
+        assert len(self.calls) == 2, self.calls
+
+        assert _get_cached_value(self.cache, 'toggled', create, expiretime=60) == value
+        assert len(self.calls) == 2, self.calls
+
+    def test_stale_grace_legacy_string_value(self):
+        self.cache.put('legacy', 'ab', expiretime=60)
+        self.release.set()
+        assert _get_cached_value(self.cache, 'legacy', self._slow_create,
+                                 expiretime=60, stale_grace=60) == 'value1'
+        assert _get_cached_value(self.cache, 'legacy', self._slow_create,
+                                 expiretime=60) == 'value1'
+
+    def test_stale_grace_entry_pickle(self):
+        import pickle
+        from tg.caching import _StaleGraceEntry
+
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            entry = pickle.loads(pickle.dumps(_StaleGraceEntry(1.0, 'value'), protocol))
+            assert isinstance(entry, _StaleGraceEntry), entry
+            assert entry == (1.0, 'value'), entry
+
+    def test_stale_entry_expired_without_grace(self):
+        self.release.set()
+        assert _get_cached_value(self.cache, 'expired', self._slow_create,
+                                 expiretime=0.05, stale_grace=60) == 'value1'
+        time.sleep(0.1)
+        assert _get_cached_value(self.cache, 'expired', self._slow_create,
+                                 expiretime=0.05) == 'value2'
+
+    def test_value_beyond_grace_recreated(self):
+        self.release.set()
+        assert _get_cached_value(self.cache, 'grace', self._slow_create,
+                                 expiretime=0.01, stale_grace=0.01) == 'value1'
+        mocktime.set_time(mocktime.mock_time + 1)
+        try:
+            value = _get_cached_value(self.cache, 'grace', self._slow_create,
+                                      expiretime=0.01, stale_grace=0.01)
+        finally:
+            mocktime.set_time(mocktime.mock_time - 1)
+        assert value == 'value2', value
+
+
+class TestCacheTouchMemoryManager(TestCacheTouch):
+    def __init__(self, *args, **kargs):
+        TestWSGIController.__init__(self, *args, **kargs)
+        self.app = make_app(self.CACHED_CONTROLLER, config_options={
+            'cache.type': 'tg_memory'
+        })
+
+    def test_invalidate_on_startup(self):
+        # Beaker expiration runs on the mocked time, the memory cache on the
+        # real one so values created after the application started are kept.
+        self.CACHED_CONTROLLER.CALL_COUNT = 0
+
+        r = self.app.get('/invalidate_on_startup')
+        assert 'Counter=1' in r
+        r = self.app.get('/invalidate_on_startup')
+        assert 'Counter=1' in r
+
+    def test_memory_manager_used(self):
+        self.app.get('/none_key')
+        cache_manager = self.app.app.application.wrapped_dispatch.next_handler.cache_manager
+        assert isinstance(cache_manager, MemoryCacheManager), cache_manager
+        stats = cache_manager.stats()['tests.test_caching.CachedController']
+        assert stats['entries'] == 1, stats
+
+
+class TestMemoryCache(object):
+    def setup(self):
+        self.manager = MemoryCacheManager(max_entries='3')
+
+    def test_get_value(self):
+        cache = self.manager.get_cache('ns')
+        assert cache.get_value('key', createfunc=lambda: 'value') == 'value'
+        assert cache.get_value('key', createfunc=lambda: 'other') == 'value'
+        assert cache.get('key') == 'value'
+        assert cache.has_key('key')
+        assert cache.stats()['hits'] == 2, cache.stats()
+        assert cache.stats()['misses'] == 1, cache.stats()
+
+    def test_missing_key(self):
+        cache = self.manager.get_cache('ns')
+        try:
+            cache.get('missing')
+        except KeyError:
+            pass
+        else:
+            assert False, 'Should have raised KeyError'
+        assert 'missing' not in cache
+
+    def test_same_namespace(self):
+        assert self.manager.get_cache('ns') is self.manager.get_cache('ns')
+        assert self.manager.get_cache('ns') is not self.manager.get_cache('other')
+
+    def test_lru_eviction(self):
+        cache = self.manager.get_cache('ns')
+        for key in ('a', 'b', 'c'):
+            cache.put(key, key)
+        cache.get('a')
+        cache.put('d', 'd')
+
+        assert 'b' not in cache
+        for key in ('a', 'c', 'd'):
+            assert cache.get(key) == key
+        assert cache.stats()['evictions'] == 1, cache.stats()
+        assert len(cache) == 3
+
+    def test_bytes_limit(self):
+        cache = self.manager.get_cache('bytes', max_entries=None, max_bytes=10)
+        cache.put('a', b'12345')
+        cache.put('b', u'12345')
+        assert cache.stats()['bytes'] == 10, cache.stats()
+
+        cache.put('c', dict(c=b'12'))
+        assert 'a' not in cache
+        assert cache.stats()['bytes'] == 8, cache.stats()
+
+        cache.put('huge', b'x' * 11)
+        assert 'huge' not in cache
+        assert 'b' in cache
+
+    def test_expiration(self):
+        cache = self.manager.get_cache('ns')
+        cache.put('key', 'value', expiretime=60)
+        assert cache.get('key') == 'value'
+        assert cache.get('key', expiretime=-1, createfunc=lambda: 'new') == 'new'
+
+        cache.put('key', 'value', expiretime=-1)
+        assert 'key' not in cache
+
+    def test_default_expire(self):
+        cache = self.manager.get_cache('expiring', expire=-1)
+        cache.put('key', 'value')
+        assert 'key' not in cache
+
+    def test_starttime(self):
+        cache = self.manager.get_cache('ns')
+        cache.put('key', 'value')
+        assert cache.get('key', starttime=0) == 'value'
+        assert cache.get_value('key', starttime=time.time() + 1,
+                               createfunc=lambda: 'new') == 'new'
+
+    def test_remove_and_clear(self):
+        cache = self.manager.get_cache('ns')
+        cache['a'] = 1
+        cache['b'] = 2
+        del cache['a']
+        assert 'a' not in cache
+        assert cache['b'] == 2
+
+        cache.clear()
+        assert len(cache) == 0
+        cache['c'] = 3
+        assert cache['c'] == 3
+
+    def test_no_entries_limit(self):
+        cache = MemoryCacheManager(max_entries=0).get_cache('ns')
+        for i in range(100):
+            cache.put(i, i)
+        assert len(cache) == 100
+        assert cache.stats()['evictions'] == 0
+
+    def test_namespace_options_coerced(self):
+        # As provided by the beaker_cache and cached decorators arguments
+        cache = self.manager.get_cache('coerced', max_entries='2', max_bytes='100',
+                                       expire='60')
+        assert cache.max_entries == 2, cache.max_entries
+        assert cache.max_bytes == 100, cache.max_bytes
+        assert cache.expiretime == 60, cache.expiretime
+
+        cache = self.manager.get_cache('unlimited', max_entries='0')
+        assert cache.max_entries is None, cache.max_entries
+
+    def test_threaded_access(self):
+        cache = self.manager.get_cache('threads', max_entries=50)
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(500):
+                    key = (n * i) % 80
+                    cache.get_value(key, createfunc=lambda: key)
+            except Exception as e:  # pragma: no cover
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n, )) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert not errors, errors
+        assert len(cache) <= 50
+        stats = cache.stats()
+        assert stats['hits'] + stats['misses'] == 8 * 500, stats
+
+
+class TestCacheTouchLayeredManager(TestCacheTouchMemoryManager):
+    def __init__(self, *args, **kargs):
+        TestWSGIController.__init__(self, *args, **kargs)
+        self.app = make_app(self.CACHED_CONTROLLER, config_options={
+            'cache.type': 'tg_layered',
+            'cache.l2.type': 'memory',
+            'cache.l1.max_entries': '100'
+        })
+
+    def test_memory_manager_used(self):
+        self.app.get('/none_key')
+        self.app.get('/none_key')
+        cache_manager = self.app.app.application.wrapped_dispatch.next_handler.cache_manager
+        assert isinstance(cache_manager, LayeredCacheManager), cache_manager
+        assert cache_manager.local.max_entries == 100
+        stats = cache_manager.stats()['tests.test_caching.CachedController']
+        assert stats['l1_hits'] == 1, stats
+        assert stats['misses'] == 1, stats
+
+
+class TestLayeredCache(object):
+    def setup(self):
+        # Beaker memory caches share their storage, like two processes
+        # sharing the same file or database.
+        self.shared = CacheManager(type='memory')
+        self.process1 = LayeredCacheManager(self.shared, max_entries=10)
+        self.process2 = LayeredCacheManager(self.shared, max_entries=10)
+        self.namespace = 'tests.test_caching.Layered%s' % id(self)
+
+    def teardown(self):
+        self.shared.get_cache(self.namespace).clear()
+
+    def test_write_through(self):
+        cache1 = self.process1.get_cache(self.namespace)
+        cache2 = self.process2.get_cache(self.namespace)
+
+        assert cache1.get_value('key', createfunc=lambda: 'value') == 'value'
+        assert cache1.get_value('key', createfunc=lambda: 'other') == 'value'
+        assert cache2.get_value('key', createfunc=lambda: 'other') == 'value'
+        assert cache2.get_value('key', createfunc=lambda: 'other') == 'value'
+
+        assert cache1.stats()['misses'] == 1, cache1.stats()
+        assert cache1.stats()['l1_hits'] == 1, cache1.stats()
+        assert cache2.stats()['l2_hits'] == 1, cache2.stats()
+        assert cache2.stats()['l1_hits'] == 1, cache2.stats()
+
+    def test_put_and_remove(self):
+        cache1 = self.process1.get_cache(self.namespace)
+        cache2 = self.process2.get_cache(self.namespace)
+
+        cache1['key'] = 'value'
+        assert 'key' in cache1.local
+        assert cache2['key'] == 'value'
+
+        del cache1['key']
+        assert 'key' not in cache1
+        assert 'key' not in cache1.shared
+        # Local cache of other processes is not notified.
+        assert 'key' in cache2.local
+
+    def test_missing_key(self):
+        cache = self.process1.get_cache(self.namespace)
+        try:
+            cache.get('missing')
+        except KeyError:
+            pass
+        else:
+            assert False, 'Should have raised KeyError'
+        assert cache.stats()['misses'] == 1, cache.stats()
+
+    def test_local_expiration_capped(self):
+        cache = self.process1.get_cache(self.namespace)
+        cache.put('key', 'value', expiretime=0.05)
+        assert 'key' in cache.local
+        time.sleep(0.1)
+        assert 'key' not in cache.local
+
+    def test_local_copy_honours_lookup_expiretime(self):
+        cache = self.process1.get_cache(self.namespace)
+        assert cache.get_value('key', createfunc=lambda: 'value') == 'value'
+        time.sleep(0.05)
+        # The local copy is too old, the shared cache decides
+        cache.get_value('key', createfunc=lambda: 'other', expiretime=0.01)
+        assert cache.stats()['l1_hits'] == 0, cache.stats()
+        assert cache.stats()['l2_hits'] == 1, cache.stats()
+
+        # Not copied to the local cache as it was already expired
+        cache.get_value('key', createfunc=lambda: 'other', expiretime=10)
+        assert cache.stats()['l2_hits'] == 2, cache.stats()
+        cache.get_value('key', createfunc=lambda: 'other', expiretime=10)
+        assert cache.stats()['l1_hits'] == 1, cache.stats()
+
+    def test_local_expiration(self):
+        manager = LayeredCacheManager(self.shared, expire='-1')
+        cache = manager.get_cache(self.namespace)
+        cache.put('key', 'value')
+        assert 'key' not in cache.local
+        assert cache.get('key') == 'value'
+        assert cache.stats()['l2_hits'] == 1, cache.stats()
+
+    def test_clear(self):
+        cache = self.process1.get_cache(self.namespace)
+        cache.put('key', 'value')
+        cache.clear()
+        assert 'key' not in cache
+
+
+class TaggedCachingController(TGController):
+    CALL_COUNT = 0
+
+    @expose()
+    def clear_cache(self):
+        tg.cache.get_cache('tests.test_caching.TaggedCachingController').clear()
+        tg.cache.get_cache('tests.test_caching').clear()
+        tg.cache.get_cache('tg.caching.tags').clear()
+        return ''
+
+    @expose()
+    def invalidate(self, *tags):
+        return 'Removed=%s' % invalidate_tags(tags)
+
+    @expose()
+    @cached(tags=['item:{item}', 'items'])
+    def item(self, item):
+        TaggedCachingController.CALL_COUNT += 1
+        return 'Counter=%s' % TaggedCachingController.CALL_COUNT
+
+    @expose()
+    @cached_response(tags=['item:{item}', 'responses'])
+    def item_response(self, item):
+        TaggedCachingController.CALL_COUNT += 1
+        return 'Counter=%s' % TaggedCachingController.CALL_COUNT
+
+    @expose()
+    @cached(tags=['item:{item}'])
+    def optional_item(self, item=None):
+        TaggedCachingController.CALL_COUNT += 1
+        return 'Counter=%s' % TaggedCachingController.CALL_COUNT
+
+    @expose()
+    def beaker_item(self, item):
+        return _tagged_beaker_function(item)
+
+
+@beaker_cache(tags=['item:{item}'])
+def _tagged_beaker_function(item):
+    TaggedCachingController.CALL_COUNT += 1
+    return 'Counter=%s' % TaggedCachingController.CALL_COUNT
+
+
+class TestCacheTags(TestWSGIController):
+    def __init__(self, *args, **kargs):
+        TestWSGIController.__init__(self, *args, **kargs)
+        self.app = make_app(TaggedCachingController)
+
+    def setUp(self):
+        super(TestCacheTags, self).setUp()
+        self.app.get('/clear_cache')
+        TaggedCachingController.CALL_COUNT = 0
+
+    def test_invalidate_tag(self):
+        assert 'Counter=1' in self.app.get('/item/1')
+        assert 'Counter=2' in self.app.get('/item/2')
+        assert 'Counter=1' in self.app.get('/item/1')
+
+        assert 'Removed=1' in self.app.get('/invalidate/item:1')
+        assert 'Counter=3' in self.app.get('/item/1')
+        assert 'Counter=2' in self.app.get('/item/2')
+
+    def test_invalidate_shared_tag(self):
+        assert 'Counter=1' in self.app.get('/item/1')
+        assert 'Counter=2' in self.app.get('/item/2')
+
+        assert 'Removed=1' in self.app.get('/invalidate/items')
+        assert 'Counter=3' in self.app.get('/item/1')
+        assert 'Counter=4' in self.app.get('/item/2')
+        assert 'Removed=0' in self.app.get('/invalidate/missing')
+
+    def test_invalidate_cached_response(self):
+        assert 'Counter=1' in self.app.get('/item_response/1')
+        assert 'Counter=1' in self.app.get('/item_response/1')
+
+        assert 'Removed=1' in self.app.get('/invalidate/responses')
+        assert 'Counter=2' in self.app.get('/item_response/1')
+
+    def test_invalidate_beaker_cache(self):
+        assert 'Counter=1' in self.app.get('/beaker_item/1')
+        assert 'Counter=1' in self.app.get('/beaker_item/1')
+        assert 'Counter=2' in self.app.get('/item/1')
+
+        assert 'Removed=1' in self.app.get('/invalidate/item:1')
+        assert 'Counter=3' in self.app.get('/beaker_item/1')
+        assert 'Counter=4' in self.app.get('/item/1')
+
+    def test_invalidate_other_manager(self):
+        manager = MemoryCacheManager()
+        cache = manager.get_cache('namespace')
+
+        from tg.caching import _tagged_cache_key
+        key = _tagged_cache_key(manager, ['tag'], 'key')
+        assert _tagged_cache_key(manager, ['tag'], 'key') == key
+        cache.put(key, 'value')
+
+        assert invalidate_tags(['tag'], manager) == 1
+        assert _tagged_cache_key(manager, ['tag'], 'key') != key
+        assert invalidate_tags(['other'], manager) == 0
+
+    def test_missing_tag_placeholder(self):
+        assert 'Counter=1' in self.app.get('/optional_item')
+        assert 'Counter=1' in self.app.get('/optional_item')
+        assert 'Removed=1' in self.app.get('/invalidate/item:None')
+        assert 'Counter=2' in self.app.get('/optional_item')
+
+    def test_unknown_tag_placeholder(self):
+        def item(self, item):
+            pass
+
+        assert_raises(ValueError, cached(tags=['item:{other}']), item)
+        assert_raises(ValueError, cached_response(tags=['item:{other.id}']), item)
+        assert_raises(ValueError, beaker_cache(tags=['{}']), item)
+        cached(tags=['item:{item.id}'])(item)
+        beaker_cache(tags=['item:{other}'])(lambda **kw: None)
+
+
+class TestBeakerCacheIntrospection(object):
+    def test_annotated_function(self):
+        if not PY3:
+            raise SkipTest()
+
+        namespace = {}
+        exec('def f(self, a: int, *, b=1):\n    return a + b', namespace)
+        f = namespace['f']
+
+        assert beaker_cache(key=None)(f).__name__ == 'f'
+        assert beaker_cache()(f).__name__ == 'f'
+        assert _args_names(f) == ((1, 'a'), ), _args_names(f)
+
+    def test_not_introspectable(self):
+        # builtins provide no argument names, decorating them must not fail
+        assert beaker_cache()(max).__name__ == 'max'
+        assert beaker_cache(tags=['max'])(max).__name__ == 'max'
+
+
+class TestHashedCacheKeys(TestWSGIController):
+    def __init__(self, *args, **kargs):
+        TestWSGIController.__init__(self, *args, **kargs)
+        self.app = make_app(CachedController, config_options={
+            'cache.key_max_length': '40'
+        })
+
+    def test_long_keys_hashed(self):
+        r = self.app.get('/req_cache_key?arg=5')
+        assert 'tests.test_caching.CachedController ~ req_cache_key arg=5' in r, r
+
+        r = self.app.get('/req_cache_key', params={'arg': 'x' * 100})
+        key = r.text.split(' ~ ')[1]
+        assert key.startswith('req_cache_key '), key
+        assert len(key) == len('req_cache_key ') + 40, key
+
+
+class TestCacheMetrics(TestWSGIController):
+    def __init__(self, *args, **kargs):
+        TestWSGIController.__init__(self, *args, **kargs)
+        self.app = make_app(CachedController, config_options={
+            'application_wrappers': DependenciesList(
+                CacheApplicationWrapper,
+                SessionApplicationWrapper,
+                CacheMetricsApplicationWrapper
+            ),
+            'cache_metrics.enabled': True
+        })
+
+    def setUp(self):
+        TestWSGIController.setUp(self)
+        cache_metrics.reset()
+
+    def test_lookups_recorded(self):
+        self.app.get('/specified_cache_key?arg=metrics1')
+        self.app.get('/specified_cache_key?arg=metrics1')
+        self.app.get('/specified_cache_key?arg=metrics1')
+
+        stats = cache_metrics.stats()
+        metrics = stats['tests.test_caching.CachedController']
+        assert metrics['misses'] == 1, metrics
+        assert metrics['hits'] == 2, metrics
+        assert metrics['created_bytes'] > 0, metrics
+        assert metrics['creation_time'] >= 0, metrics
+        assert metrics['lookup_time'] >= metrics['creation_time'], metrics
+
+    def test_reset(self):
+        self.app.get('/specified_cache_key?arg=metrics2')
+        assert cache_metrics.stats()
+        cache_metrics.reset()
+        assert cache_metrics.stats() == {}
+
+    def test_metrics_endpoint(self):
+        self.app.get('/specified_cache_key?arg=metrics3')
+        self.app.get('/specified_cache_key?arg=metrics3')
+
+        r = self.app.get('/_cache_metrics')
+        assert r.content_type == 'text/plain', r.content_type
+        assert '# TYPE tg_cache_hits_total counter' in r, r
+        assert 'tg_cache_hits_total{namespace="tests.test_caching.CachedController"} 1' in r, r
+
+    def test_metrics_endpoint_disabled(self):
+        app = make_app(CachedController, config_options={
+            'application_wrappers': DependenciesList(
+                CacheApplicationWrapper,
+                CacheMetricsApplicationWrapper
+            )
+        })
+        app.get('/_cache_metrics', status=404)
+
+    def test_render_escapes_namespaces(self):
+        metrics = CacheMetrics()
+        ns_metrics = metrics.namespace('weird"name\\')
+        ns_metrics.lookups += 3
+        ns_metrics.measure(lambda: 'value')()
+
+        text = metrics.render()
+        assert 'tg_cache_hits_total{namespace="weird\\"name\\\\"} 2' in text, text
+        assert 'tg_cache_misses_total{namespace="weird\\"name\\\\"} 1' in text, text
+        assert 'tg_cache_lookup_seconds_total{namespace="weird\\"name\\\\"} 0.0' in text, text
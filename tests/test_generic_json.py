@@ -91,3 +91,53 @@ def test_builtin_override():
     assert '"Its Y2K! Panic!"' in result2
     result3 = encode(dict(date=d3), encoder=custom_date_encoder)
     assert  '"1/1/2012"' in result3
+
+
+class Employee(Person):
+    pass
+
+
+def test_custom_encoder_after_encoding():
+    p = Person('Jonathan', 'LaCour')
+    person_encoder = JSONEncoder()
+
+    result = loads(encode(p, encoder=person_encoder))
+    assert result['first_name'] == 'Jonathan'
+
+    # Registering a new encoder must replace the one resolved for Person
+    person_encoder.register_custom_encoder(Person, lambda p: dict(name=p.name))
+    result = loads(encode(p, encoder=person_encoder))
+    assert result == {'name': 'Jonathan LaCour'}, result
+
+
+def test_custom_encoder_most_specific_type():
+    person_encoder = JSONEncoder(custom_encoders={
+        Employee: lambda p: dict(employee=p.name)
+    })
+    person_encoder.register_custom_encoder(Person, lambda p: dict(person=p.name))
+
+    result = loads(encode(Employee('Jonathan', 'LaCour'), encoder=person_encoder))
+    assert result == {'employee': 'Jonathan LaCour'}, result
+
+    result = loads(encode(Person('Jonathan', 'LaCour'), encoder=person_encoder))
+    assert result == {'person': 'Jonathan LaCour'}, result
+
+
+def test_custom_encoder_abstract_type():
+    try:
+        from collections.abc import Set
+    except ImportError:  # pragma: no cover
+        from collections import Set
+
+    set_encoder = JSONEncoder(custom_encoders={Set: sorted})
+    result = loads(encode(dict(values=frozenset([3, 1, 2])), encoder=set_encoder))
+    assert result == {'values': [1, 2, 3]}, result
+
+
+def test_instance_json():
+    class Proxy(object):
+        def __init__(self, value):
+            self.__json__ = lambda: value
+
+    result = loads(encode(dict(first=Proxy(1), second=Proxy(2))))
+    assert result == {'first': 1, 'second': 2}, result
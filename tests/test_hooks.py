@@ -8,6 +8,7 @@ from tg import expose, TGController
 import tg
 from tg.configuration import milestones, AppConfig
 from tg.configuration.hooks import _TGGlobalHooksNamespace
+from tg._compat import default_im_func
 
 
 class TestGlobalHooks:
@@ -257,3 +258,76 @@ class TestGlobalHooks:
 
         assert len(hook1_has_been_called) == 2, hook1_has_been_called
         assert len(hook2_has_been_called) == 5, hook2_has_been_called
+
+    def test_compiled_pipeline_hooks(self):
+        hook_calls = []
+        def before_call_hook(remainder, params):
+            hook_calls.append('before_call')
+        def after_render_hook(response):
+            hook_calls.append('after_render')
+
+        class RootController(TGController):
+            @expose()
+            def test(self):
+                return 'HI!'
+
+        tg.hooks.register('before_call', before_call_hook)
+        tg.hooks.register('after_render', after_render_hook, controller=RootController.test)
+
+        conf = AppConfig(minimal=True, root_controller=RootController())
+        conf['dispatch.compiled_pipeline'] = True
+        app = conf.make_wsgi_app()
+        app = TestApp(app)
+
+        assert 'HI!' in app.get('/test')
+        assert hook_calls == ['before_call', 'after_render'], hook_calls
+
+        pipeline = RootController.test.decoration.get_pipeline(tg.hooks)
+        assert pipeline.before_validate == (), pipeline.before_validate
+        assert pipeline.before_render == (), pipeline.before_render
+        assert pipeline.before_call == (before_call_hook,), pipeline.before_call
+
+    def test_compiled_pipeline_disconnect_hooks(self):
+        hook_calls = []
+        def hook_listener(remainder, params):
+            hook_calls.append(True)
+
+        class RootController(TGController):
+            @expose()
+            def test(self):
+                return 'HI!'
+
+        tg.hooks.register('before_call', hook_listener)
+
+        conf = AppConfig(minimal=True, root_controller=RootController())
+        conf['dispatch.compiled_pipeline'] = True
+        app = conf.make_wsgi_app()
+        app = TestApp(app)
+
+        app.get('/test')
+        tg.hooks.disconnect('before_call', hook_listener)
+        app.get('/test')
+
+        assert len(hook_calls) == 1, hook_calls
+
+    def test_notify_handlers_updated_on_controller_hooks(self):
+        hook_calls = []
+        def hook_listener():
+            hook_calls.append(True)
+
+        class RootController(TGController):
+            @expose()
+            def test(self):
+                return 'HI!'
+
+        milestones._reach_all()
+        tg.hooks.notify('custom_hook', controller=RootController.test)
+        assert tg.hooks._get_handlers('custom_hook', default_im_func(RootController.test)) == ()
+
+        tg.hooks.register('custom_hook', hook_listener, controller=RootController.test)
+        tg.hooks.notify('custom_hook', controller=RootController.test)
+        assert len(hook_calls) == 1, hook_calls
+
+        tg.hooks.disconnect('custom_hook', hook_listener, controller=RootController.test)
+        tg.hooks.notify('custom_hook', controller=RootController.test)
+        assert len(hook_calls) == 1, hook_calls
@@ -2,6 +2,7 @@
 from nose.tools import raises
 from webtest import TestApp
 import gettext as _gettext
+import os
 
 import tg
 from tg import i18n, expose, TGController, config
@@ -62,13 +63,97 @@ def test_get_unaccessible_translator():
     def _fake_find(*args, **kwargs):
         return '/fake_file'
 
-    real_find = _gettext.find
-    _gettext.find = _fake_find
+    real_find = i18n._find_catalog
+    i18n._find_catalog = _fake_find
     try:
         i18n._get_translator(['de'], tg_config={'localedir': '',
                                                 'package': _FakePackage()})
     finally:
-        _gettext.find = real_find
+        i18n._find_catalog = real_find
+
+
+class TestTranslatorsCache(object):
+    conf = {'localedir': 'tests/i18n', 'package': _FakePackage()}
+
+    def setup(self):
+        i18n._TRANSLATORS_CHAINS.clear()
+
+    def test_catalogs_index(self):
+        index = i18n._catalogs_index('tests', 'tests/i18n')
+        assert sorted(index) == ['de', 'kr', 'ru'], index
+        assert i18n._catalogs_index('tests', 'tests/missing') == {}
+
+    def test_find_catalog_same_as_gettext(self):
+        for lang in ('de', 'de_DE', 'de_DE.UTF-8', 'it', 'C', 'ru_RU'):
+            expected = _gettext.find('tests', localedir='tests/i18n', languages=[lang])
+            found = i18n._find_catalog('tests', 'tests/i18n', lang)
+            assert found == expected, (lang, found, expected)
+
+    def test_translator_reused(self):
+        calls = []
+        real_find = i18n._find_catalog
+
+        def _counting_find(*args):
+            calls.append(args)
+            return real_find(*args)
+
+        i18n._find_catalog = _counting_find
+        try:
+            first = i18n._get_translator(['it', 'de'], tg_config=self.conf, fallback=True)
+            second = i18n._get_translator(['it', 'de'], tg_config=self.conf, fallback=True)
+        finally:
+            i18n._find_catalog = real_find
+
+        assert len(calls) == 2, calls
+        assert first is not second
+        assert second.tg_lang == ['it', 'de'], second.tg_lang
+        assert second.tg_supported_lang == ['de'], second.tg_supported_lang
+
+    def test_catalogs_index_without_localedir(self):
+        default_localedir = _gettext._default_localedir
+        _gettext._default_localedir = os.path.join(os.path.dirname(__file__), 'i18n')
+        i18n._CATALOGS_INDEX.pop(('tests', None), None)
+        try:
+            # Same directory gettext looks into when no localedir is given
+            catalogs = i18n._catalogs_index('tests', None)
+        finally:
+            _gettext._default_localedir = default_localedir
+            i18n._CATALOGS_INDEX.pop(('tests', None), None)
+        assert sorted(catalogs) == ['de', 'kr', 'ru'], catalogs
+
+    def test_formencode_translation_reused(self):
+        calls = []
+        real_translation = _gettext.translation
+
+        def _counting_translation(*args, **kwargs):
+            calls.append(args)
+            return real_translation(*args, **kwargs)
+
+        i18n._FORMENCODE_TRANSLATIONS.clear()
+        _gettext.translation = _counting_translation
+        try:
+            first = i18n._get_formencode_translation(['de'])
+            second = i18n._get_formencode_translation(['de'])
+            for i in range(2):
+                try:
+                    i18n._get_formencode_translation(['xx'])
+                    assert False
+                except i18n.LanguageError:
+                    pass
+        finally:
+            _gettext.translation = real_translation
+
+        assert first is second
+        assert len(calls) == 2, calls
+
+    def test_cached_translator_not_modified(self):
+        translator = i18n._get_translator(['de', 'ru'], tg_config=self.conf)
+        translator.add_fallback(i18n._get_translator('kr', tg_config=self.conf))
+        translator.tg_supported_lang.append('kr')
+
+        translator = i18n._get_translator(['de', 'ru'], tg_config=self.conf)
+        assert translator._fallback._fallback is None
+        assert translator.tg_supported_lang == ['de', 'ru'], translator.tg_supported_lang
 
 class i18nRootController(TGController):
     def _before(self, *args, **kw):
@@ -107,6 +192,12 @@ class i18nRootController(TGController):
                                         'Your applications are now running',
                                         2))
 
+    @expose('json')
+    def translator_created(self, **kw):
+        tgl = tg.request_local.context._current_obj()
+        return dict(created=tgl._translator is not None,
+                    detected=not callable(tgl._translator_lang))
+
     @expose()
     def force_german(self, **kw):
         i18n.set_lang('de')
@@ -195,6 +286,18 @@ class TestI18NStack(object):
         r = self.app.get('/get_lang?skip_lang=1', headers={'Cookie':cookie_value})
         assert 'de' in r
 
+    def test_translator_not_created(self):
+        r = self.app.get('/translator_created')
+        assert r.json['created'] is False, r.json
+
+        r = self.app.get('/translator_created?skip_lang=1')
+        assert r.json['created'] is False, r.json
+        assert r.json['detected'] is False, r.json
+
+    def test_translator_languages(self):
+        r = self.app.get('/hello?skip_lang=1', headers={'Accept-Language': 'ru'})
+        assert r.json['text'] != 'Your application is now running', r.json
+
     def test_get_lang_no_session(self):
         r = self.app.get('/get_lang?skip_lang=1', extra_environ={})
         assert '[]' in r, r.body
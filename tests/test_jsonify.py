@@ -158,4 +158,58 @@ def test_json_encode_lazy_string():
 
 def test_json_encode_generators():
     encoded = jsonify.encode({'values': (v for v in [1, 2, 3])})
-    assert encoded == '{"values": [1, 2, 3]}', encoded
\ No newline at end of file
+    assert encoded == '{"values": [1, 2, 3]}', encoded
+
+def test_encode_stream():
+    d = {'a': 1, 'values': (v for v in [1, 2, 3]), 'date': datetime(2017, 1, 1),
+         1: [Bar(1), {'b': None}], True: (), None: 'c'}
+    chunks = jsonify.encode_stream(d)
+    assert not isinstance(chunks, str)
+    encoded = ''.join(chunks)
+    expected = jsonify.encode(dict(d, values=[1, 2, 3]))
+    assert json.loads(encoded) == json.loads(expected), encoded
+
+def test_encode_stream_lazy():
+    consumed = []
+    def values():
+        for v in range(3):
+            consumed.append(v)
+            yield v
+
+    chunks = jsonify.encode_stream({'values': values()})
+    assert ''.join(next(chunks) for _ in range(4)) == '{"values": ['
+    assert consumed == []
+    assert ''.join(chunks) == '0, 1, 2]}'
+    assert consumed == [0, 1, 2]
+
+def test_encode_stream_options():
+    encoder = jsonify.JSONEncoder(sort_keys=True, separators=(',', ':'))
+    encoded = ''.join(jsonify.encode_stream({'b': [1, {'d': 2, 'c': 3}], 'a': 'x'}, encoder))
+    assert encoded == '{"a":"x","b":[1,{"c":3,"d":2}]}', encoded
+
+def test_encode_stream_indent():
+    encoder = jsonify.JSONEncoder(indent=2)
+    d = {'values': (v for v in [1, 2])}
+    encoded = ''.join(jsonify.encode_stream(d, encoder))
+    assert encoded == jsonify.encode({'values': [1, 2]}, encoder), encoded
+
+def test_encode_stream_string():
+    assert ''.join(jsonify.encode_stream('string')) == '"string"'
+
+@raises(TypeError)
+def test_encode_stream_invalid_key():
+    ''.join(jsonify.encode_stream({(1, 2): 'value'}))
+
+def test_encode_stream_skipkeys():
+    encoder = jsonify.JSONEncoder(skipkeys=True)
+    encoded = ''.join(jsonify.encode_stream({(1, 2): 'value', 'a': 1}, encoder))
+    assert encoded == '{"a": 1}', encoded
+
+@raises(jsonify.JsonEncodeError)
+def test_encode_stream_list():
+    jsonify.encode_stream((v for v in [1, 2, 3]))
+
+def test_encode_stream_allowed_list():
+    lists_encoder = jsonify.JSONEncoder(allow_lists=True)
+    encoded = ''.join(jsonify.encode_stream((v for v in [1, 2, 3]), lists_encoder))
+    assert encoded == '[1, 2, 3]', encoded
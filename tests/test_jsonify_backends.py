@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Checks that every JSON backend produces the same output of the standard library."""
+import datetime
+import decimal
+from collections import namedtuple
+
+from nose import SkipTest
+from nose.tools import raises, assert_raises
+from webob.multidict import MultiDict
+
+from tg import jsonify
+from tg.jsonify import JSONEncoder
+from tg.util import LazyString
+from tg._compat import u_
+
+from tests.test_jsonify_sqlalchemy import create_session, Test1, Test3, test2
+
+
+Point = namedtuple('Point', 'x y')
+
+
+class Money(object):
+    def __init__(self, amount):
+        self.amount = amount
+
+
+class Person(object):
+    def __json__(self):
+        return {'name': 'Jonathan', 'born': datetime.date(1979, 10, 12)}
+
+
+# Objects must be attached to a session to be encoded
+session = create_session()
+
+
+FIXTURES = [
+    ('string', lambda: {'value': 'text', 'quoted': '"/\\\n'}, {}),
+    ('unicode', lambda: {'value': u_('àèìòù ☃')}, {}),
+    ('numbers', lambda: {'int': 5, 'float': 1.5, 'negative': -3, 'bool': True, 'none': None}, {}),
+    ('nested', lambda: {'a': [1, [2, {'b': [], 'c': {}}]], 'd': (1, 2)}, {}),
+    ('namedtuple', lambda: {'point': Point(1, 2)}, {}),
+    ('nonstr_keys', lambda: {1: 'a', None: 'b', 2.5: 'c', False: 'd'}, {}),
+    ('sort_keys', lambda: {'b': 1, 'a': {'d': 2, 'c': 3}}, {'sort_keys': True}),
+    ('indent', lambda: {'a': [1, {'b': 2}], 'c': [], 'd': {}}, {'indent': 2}),
+    ('dates', lambda: {'date': datetime.date(2017, 1, 2),
+                       'datetime': datetime.datetime(2017, 1, 2, 3, 4, 5, 6),
+                       'time': datetime.time(3, 4, 5, 6)}, {}),
+    ('isodates', lambda: {'date': datetime.date(2017, 1, 2),
+                          'datetime': datetime.datetime(2017, 1, 2, 3, 4, 5, 6),
+                          'time': datetime.time(3, 4, 5, 6)}, {'isodates': True}),
+    ('decimal', lambda: {'value': decimal.Decimal('10.25')}, {}),
+    ('generator', lambda: {'values': (i for i in range(5))}, {}),
+    ('multidict', lambda: {'params': MultiDict([('a', 1), ('a', 2), ('b', 3)])}, {}),
+    ('lazystring', lambda: {'text': LazyString(lambda: 'lazy')}, {}),
+    ('json_method', lambda: {'person': Person()}, {}),
+    ('custom_encoder', lambda: {'money': Money(5)},
+     {'custom_encoders': {Money: lambda m: '%s EUR' % m.amount}}),
+    ('custom_date_encoder', lambda: {'date': datetime.date(2017, 1, 2)},
+     {'custom_encoders': {datetime.date: lambda d: d.year}}),
+    ('saobject', lambda: {'obj': session.query(Test1).get(1)}, {}),
+    ('saobject_json', lambda: {'obj': session.query(Test3).get(1)}, {}),
+    ('query_rows', lambda: {'rows': test2.select().execute()}, {}),
+    ('bigint', lambda: {'value': 2 ** 70}, {}),
+]
+
+
+def _reference_encoder(options):
+    separators = (',', ':') if options.get('indent') is None else (',', ': ')
+    return JSONEncoder(separators=separators, ensure_ascii=False, **options)
+
+
+def _check_conformance(backend, factory, options):
+    reference = jsonify.encode(factory(), _reference_encoder(options))
+    encoded = jsonify.encode(factory(), JSONEncoder(backend=backend, **options))
+    assert encoded == reference, (encoded, reference)
+
+    stream = ''.join(jsonify.encode_stream(factory(), JSONEncoder(backend=backend, **options)))
+    assert stream == reference, (stream, reference)
+
+
+def test_orjson_conformance():
+    if jsonify.orjson is None:
+        raise SkipTest('orjson not installed')
+
+    for name, factory, options in FIXTURES:
+        _check_conformance.description = 'orjson conformance: %s' % name
+        yield _check_conformance, 'orjson', factory, options
+
+
+def test_json_backend_is_default():
+    for name, factory, options in FIXTURES:
+        assert jsonify.encode(factory(), JSONEncoder(backend='json', **options)) == \
+               jsonify.encode(factory(), JSONEncoder(**options)), name
+
+
+class TestOrjsonBackend(object):
+    def setUp(self):
+        if jsonify.orjson is None:
+            raise SkipTest('orjson not installed')
+
+    def test_default_errors_preserved(self):
+        s = create_session()
+        obj = s.query(Test1).get(1)
+        s.expunge(obj)
+        for backend in ('json', 'orjson'):
+            assert_raises(ValueError, jsonify.encode, {'obj': obj}, JSONEncoder(backend=backend))
+
+    def test_unsupported_type(self):
+        for backend in ('json', 'orjson'):
+            assert_raises(TypeError, jsonify.encode, {'obj': object()}, JSONEncoder(backend=backend))
+
+    def test_unsupported_options(self):
+        encoder = JSONEncoder(backend='orjson', indent=4)
+        assert encoder._backend_encode is None
+        assert jsonify.encode({'a': 1}, encoder) == '{\n    "a": 1\n}'
+
+        encoder = JSONEncoder(backend='orjson', skipkeys=True)
+        assert encoder._backend_encode is None
+        assert jsonify.encode({'a': 1, (1, 2): 2}, encoder) == '{"a": 1}'
+
+    def test_reconfigure(self):
+        encoder = JSONEncoder()
+        assert jsonify.encode({'a': 1}, encoder) == '{"a": 1}'
+
+        encoder.configure(backend='orjson')
+        assert jsonify.encode({'a': 1}, encoder) == '{"a":1}'
+
+        encoder.configure(backend='json')
+        assert jsonify.encode({'a': 1}, encoder) == '{"a": 1}'
+
+    def test_auto(self):
+        encoder = JSONEncoder(backend='auto')
+        assert encoder._backend_encode is not None
+
+
+def test_auto_without_orjson():
+    orjson, jsonify.orjson = jsonify.orjson, None
+    try:
+        for backend in ('auto', 'orjson'):
+            encoder = JSONEncoder(backend=backend)
+            assert encoder._backend_encode is None
+            assert jsonify.encode({'a': 1}, encoder) == '{"a": 1}'
+    finally:
+        jsonify.orjson = orjson
+
+
+@raises(ValueError)
+def test_unknown_backend():
+    JSONEncoder(backend='unknown')
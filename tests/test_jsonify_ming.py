@@ -0,0 +1,96 @@
+from nose import SkipTest
+from tg import jsonify
+import json
+
+try:
+    import ming
+    from ming import create_datastore, Session, schema
+    from ming.odm import ODMSession, FieldProperty, Mapper
+    from ming.odm.declarative import MappedClass
+    from tg.util.ming import dictify, dictify_cursor
+except ImportError:  # pragma: no cover
+    ming = None
+
+
+class TestMingJSON(object):
+    @classmethod
+    def setupClass(cls):
+        if ming is None:
+            raise SkipTest('Ming not available...')
+
+        cls.basic_session = Session(create_datastore('mim:///jsonifytestdb'))
+        cls.s = ODMSession(cls.basic_session)
+
+        class Document(MappedClass):
+            class __mongometa__:
+                session = cls.s
+                name = 'jsonify_document'
+
+            _id = FieldProperty(int)
+            title = FieldProperty(str)
+            order = FieldProperty(int)
+            tags = FieldProperty([str])
+
+        cls.Document = Document
+        Mapper.compile_all()
+
+        Document(_id=1, title='First', order=1, tags=['a', 'b'])
+        Document(_id=2, title='Second', order=2, tags=[])
+        cls.s.flush()
+        cls.s.clear()
+
+        # Document without the order field stored.
+        cls.basic_session.db.jsonify_document.insert({'_id': 3, 'title': 'Third', 'tags': []})
+
+    def teardown(self):
+        self.s.clear()
+
+    def _expected(self):
+        return [{'_id': 1, 'title': 'First', 'order': 1, 'tags': ['a', 'b']},
+                {'_id': 2, 'title': 'Second', 'order': 2, 'tags': []},
+                {'_id': 3, 'title': 'Third', 'order': None, 'tags': []}]
+
+    def test_dictify(self):
+        doc = self.Document.query.get(_id=1)
+        assert dictify(doc) == {'_id': 1, 'title': 'First', 'order': 1, 'tags': ['a', 'b']}
+
+    def test_dictify_cursor(self):
+        cursor = self.Document.query.find().sort('_id')
+        result = [dict(d) for d in dictify_cursor(cursor)]
+        assert result == self._expected(), result
+
+        # Documents were converted without creating the objects.
+        assert self.s.imap.get(self.Document, 1) is None
+
+    def test_dictify_cursor_same_as_objects(self):
+        objs = [dictify(obj) for obj in self.Document.query.find().sort('_id')]
+        self.s.clear()
+        docs = list(dictify_cursor(self.Document.query.find().sort('_id')))
+        assert json.loads(jsonify.encode({'r': docs})) == json.loads(jsonify.encode({'r': objs}))
+
+    def test_dictify_cursor_without_ming_internals(self):
+        import tg.util.ming
+
+        tg.util.ming._CREATE_REMAKE = False
+        try:
+            result = [dict(d) for d in dictify_cursor(self.Document.query.find().sort('_id'))]
+        finally:
+            tg.util.ming._CREATE_REMAKE = True
+        assert result == self._expected(), result
+        # Converted from the objects
+        assert self.s.imap.get(self.Document, 1) is not None
+
+    def test_dictify_cursor_pending_changes(self):
+        doc = self.Document.query.get(_id=2)
+        doc.title = 'Changed'
+        result = list(dictify_cursor(self.Document.query.find({'_id': 2})))
+        assert result[0]['title'] == 'Changed', result
+
+    def test_encode_cursor(self):
+        encoded = jsonify.encode({'documents': self.Document.query.find().sort('_id')})
+        assert json.loads(encoded) == {'documents': self._expected()}, encoded
+
+    def test_encode_stream_cursor(self):
+        chunks = jsonify.encode_stream({'documents': self.Document.query.find().sort('_id')})
+        encoded = ''.join(chunks)
+        assert json.loads(encoded) == {'documents': self._expected()}, encoded
@@ -132,3 +132,59 @@ else:
         encoded = json.loads(encoded)
         expected = json.loads(expected)
         assert encoded == expected, encoded
+
+    def test_stream_query():
+        s = create_session()
+        query = s.query(Test2).order_by(Test2.id)
+        encoded = ''.join(jsonify.encode_stream(dict(results=query)))
+        expected = json.loads('''{"results": [{"test1id": 1, "id": 1, "val": "fred"}, {"test1id": 1, "id": 2, "val": "alice"}]}''')
+        result = json.loads(encoded)
+        assert result == expected, encoded
+
+    def test_stream_select_rows():
+        t = test2.select().execute()
+        encoded = ''.join(jsonify.encode_stream(dict(results=t)))
+        expected = jsonify.encode(dict(results=test2.select().execute()))
+        assert json.loads(encoded) == json.loads(expected), encoded
+
+    def test_dictify_all():
+        from tg.util.sqlalchemy import dictify, dictify_all
+        s = create_session()
+        objs = s.query(Test2).order_by(Test2.id).all()
+        assert dictify_all(objs) == [dictify(o) for o in objs]
+        assert dictify_all(iter(objs), columns=['val']) == [{'val': 'fred'}, {'val': 'alice'}]
+        assert dictify_all([objs[0], 5]) == [dictify(objs[0]), 5]
+
+    def test_dictify_changed_attributes():
+        from tg.util.sqlalchemy import dictify
+        s = create_session()
+        t = s.query(Test4).get(1)
+        assert dictify(t) == {'id': 1, 'val': 'alberto'}
+        t.extra = 'value'
+        try:
+            assert dictify(t) == {'id': 1, 'val': 'alberto', 'extra': 'value'}
+        finally:
+            del t.extra
+        assert dictify(t) == {'id': 1, 'val': 'alberto'}
+
+    def test_dictify_all_detached():
+        from tg.util.sqlalchemy import dictify_all
+        s = create_session()
+        t = s.query(Test1).get(1)
+        s.expunge(t)
+        assert_raises(ValueError, dictify_all, [t])
+
+    def test_query():
+        s = create_session()
+        query = s.query(Test2).order_by(Test2.id)
+        encoded = jsonify.encode(dict(results=query))
+        expected = json.loads('''{"results": [{"test1id": 1, "id": 1, "val": "fred"}, {"test1id": 1, "id": 2, "val": "alice"}]}''')
+        result = json.loads(encoded)
+        assert result == expected, encoded
+
+    def test_explicit_saobj_generator():
+        s = create_session()
+        encoded = jsonify.encode(dict(results=(t for t in s.query(Test3))))
+        expected = json.loads('{"results": [{"id": 1, "val": "bob", "customized": true}]}')
+        result = json.loads(encoded)
+        assert result == expected, encoded
@@ -1,16 +1,26 @@
+# -*- coding: utf-8 -*-
 """
 Testing for TG2 Configuration
 """
+from nose import SkipTest
 from nose.tools import raises
 from webtest import TestApp
 
+import os
+import sys
+import shutil
 import tg
-from tg.render import MissingRendererError, _get_tg_vars
+from tg.render import MissingRendererError, _get_tg_vars, warmup_templates, stream_chunks
+from tg.renderers.base import RendererFactory
+from tg.renderers.json import JSONRenderer
 from tests.base import setup_session_dir, teardown_session_dir
 
-from tg.configuration import AppConfig
+from tg.configuration import AppConfig, milestones
+from tg.controllers import TGController
+from tg.decorators import expose
 from mako.exceptions import TemplateLookupException
 from tg.util.webtest import test_context
+from tg._compat import u_
 
 
 def setup():
@@ -61,6 +71,27 @@ def test_jinja_lookup_nonexisting_template():
         pass
 
 
+def test_stream_chunks_buffered():
+    chunks = list(stream_chunks(['a' * 5, 'b' * 5, 'c' * 5, 'd'], encoding='utf-8', buffer_size=10))
+    assert chunks == [b'aaaaabbbbb', b'cccccd'], chunks
+
+
+def test_stream_chunks_encoding():
+    chunks = list(stream_chunks([u_('àè')], encoding='latin-1'))
+    assert chunks == [u_('àè').encode('latin-1')], chunks
+
+    assert list(stream_chunks([], encoding='utf-8')) == []
+
+
+def test_stream_chunks_resolves_encoding_eagerly():
+    with test_context(None):
+        tg.response.content_type = 'text/html; charset=latin-1'
+        chunks = stream_chunks([u_('àè')])
+
+    # Iterated once the response is no longer available
+    assert list(chunks) == [u_('àè').encode('latin-1')]
+
+
 class TestKajikiSupport(object):
     def setup(self):
         conf = AppConfig(minimal=True)
@@ -95,6 +126,92 @@ class TestKajikiSupport(object):
             raise AssertionError('Should have raised IOError')
 
 
+class TestKajikiCompiledTemplates(object):
+    def setup(self):
+        from tg.renderers.kajiki import _compiled_templates_supported
+        if not _compiled_templates_supported():
+            raise SkipTest('Kajiki version not supported by compiled templates')
+
+        import tempfile
+        self.templates_dir = tempfile.mkdtemp()
+        self.compiled_dir = os.path.join(self.templates_dir, 'compiled')
+        os.makedirs(self.compiled_dir)
+
+    def teardown(self):
+        shutil.rmtree(self.templates_dir)
+
+    def _load(self, template, force_mode='html5', extension='.xhtml'):
+        from tg.renderers.kajiki import KajikiTemplateLoader
+        loader = KajikiTemplateLoader(self.templates_dir, dotted_finder=None,
+                                      force_mode=force_mode, template_extension=extension,
+                                      compiled_templates_dir=self.compiled_dir)
+        return loader.load(template)
+
+    def _write(self, template, content, mtime):
+        filename = os.path.join(self.templates_dir, template)
+        with open(filename, 'w') as f:
+            f.write(content)
+        os.utime(filename, (mtime, mtime))
+
+    def test_compiled_reused(self):
+        self._write('page.xhtml', '<div>${value}</div>', 1000)
+        tmpl = self._load('page.xhtml')
+        assert tmpl(dict(value='Hi')).render().endswith('<div>Hi</div>')
+        assert len(os.listdir(self.compiled_dir)) == 1
+
+        tmpl = self._load('page.xhtml')
+        assert tmpl(dict(value='Hi')).render().endswith('<div>Hi</div>')
+        assert len(os.listdir(self.compiled_dir)) == 1
+
+    def test_modified_template_recompiled(self):
+        self._write('page.xhtml', '<div>${value}</div>', 1000)
+        tmpl = self._load('page.xhtml')
+        assert tmpl(dict(value='Hi')).render().endswith('<div>Hi</div>')
+
+        self._write('page.xhtml', '<span>${value}</span>', 2000)
+        tmpl = self._load('page.xhtml')
+        assert tmpl(dict(value='Hi')).render().endswith('<span>Hi</span>')
+        assert len(os.listdir(self.compiled_dir)) == 2
+
+    def test_unsupported_kajiki_fallback(self):
+        import kajiki
+
+        self._write('page.xhtml', '<div>${value}</div>', 1000)
+        version = kajiki.__version__
+        # Kajiki 1.0 and newer don't provide a version
+        del kajiki.__version__
+        try:
+            tmpl = self._load('page.xhtml')
+        finally:
+            kajiki.__version__ = version
+
+        assert tmpl(dict(value='Hi')).render().endswith('<div>Hi</div>')
+        assert os.listdir(self.compiled_dir) == []
+
+    def test_text_template(self):
+        self._write('page.txt', 'Hello ${value}', 1000)
+        tmpl = self._load('page.txt', force_mode=None, extension='.txt')
+        assert tmpl(dict(value='World')).render() == 'Hello World'
+
+        tmpl = self._load('page.txt', force_mode=None, extension='.txt')
+        assert tmpl(dict(value='World')).render() == 'Hello World'
+        assert len(os.listdir(self.compiled_dir)) == 1
+
+    def test_template_lines_preserved(self):
+        self._write('page.xhtml', '<div>\n<p>${value}</p>\n${1/0}\n</div>', 1000)
+        for attempt in range(2):
+            tmpl = self._load('page.xhtml')
+            try:
+                tmpl(dict(value='Hi')).render()
+            except ZeroDivisionError:
+                import traceback
+                frame = traceback.extract_tb(sys.exc_info()[2])[-1]
+                assert frame[0].endswith('page.xhtml'), frame
+                assert frame[1] == 3, frame
+            else:
+                raise AssertionError('Should have raised ZeroDivisionError')
+
+
 class TestMakoLookup(object):
     def setup(self):
         conf = AppConfig(minimal=True)
@@ -200,4 +317,217 @@ class TestMakoLookup(object):
         with test_context(None, '/'):
             vars = _get_tg_vars()
             assert vars.tg.errors == {}, vars.tg
-            assert vars.tg.inputs == {}, vars.tg
\ No newline at end of file
+            assert vars.tg.inputs == {}, vars.tg
+
+    def test_lazy_request_vars_in_templates(self):
+        with test_context(None, '/', {'HTTP_ACCEPT_LANGUAGE': 'it'}):
+            vars = _get_tg_vars()
+            assert 'locale' in vars.tg
+            assert 'locale' not in vars.tg._values, vars.tg._values
+            assert vars.tg.locale == ['it'], vars.tg.locale
+            assert vars.tg['auth_stack_enabled'] is False
+            assert sorted(vars.tg.keys()) == sorted([
+                'config', 'flash_obj', 'quote_plus', 'url', 'identity', 'session',
+                'locale', 'errors', 'inputs', 'request', 'auth_stack_enabled', 'predicates'
+            ]), vars.tg.keys()
+
+    def test_static_vars_follow_helpers(self):
+        with test_context(None, '/'):
+            config = tg.config._current_obj()
+            assert _get_tg_vars().h is config['helpers']
+
+            helpers = config['helpers']
+            config['helpers'] = object()
+            try:
+                assert _get_tg_vars().h is config['helpers']
+            finally:
+                config['helpers'] = helpers
+
+class WarmupRenderer(RendererFactory):
+    engines = {'warmup': {'content_type': 'text/html'}}
+    compiled = []
+    fail = False
+
+    @classmethod
+    def create(cls, config, app_globals):
+        return {'warmup': cls()}
+
+    def __call__(self, template_name, template_vars, **render_params):
+        return template_name
+
+    def compile_template(self, template_name, **render_params):
+        if self.fail and template_name == 'broken':
+            raise ValueError('broken template')
+        self.compiled.append((template_name, render_params))
+
+
+class TestTemplatesWarmup(object):
+    def setup(self):
+        milestones._reset_all()
+        WarmupRenderer.compiled = []
+
+    def teardown(self):
+        milestones._reset_all()
+        WarmupRenderer.fail = False
+
+    def _make_app(self, root_controller, **options):
+        conf = AppConfig(minimal=True, root_controller=root_controller)
+        conf.register_rendering_engine(WarmupRenderer)
+        conf.renderers.append('warmup')
+        conf['templating.warmup'] = True
+        for key, value in options.items():
+            conf[key] = value
+        return conf.make_wsgi_app()
+
+    def test_exposed_templates_compiled(self):
+        class RootController(TGController):
+            @expose('warmup:index')
+            def index(self):
+                return {}
+
+            @expose('warmup:doc', render_params={'fragment': True})
+            @expose('warmup:custom', custom_format='custom')
+            def doc(self):
+                return {}
+
+            @expose('json')
+            def data(self):
+                return {}
+
+        self._make_app(RootController())
+        compiled = WarmupRenderer.compiled
+        assert ('custom', {}) in compiled, compiled
+        assert ('doc', {'fragment': True}) in compiled, compiled
+        assert ('index', {}) in compiled, compiled
+        assert len(compiled) == len(set(t for t, p in compiled)), compiled
+
+    def test_only_mounted_controllers(self):
+        class SubController(TGController):
+            @expose('warmup:sub')
+            def index(self):
+                return {}
+
+        class UnmountedController(TGController):
+            @expose('warmup:unmounted')
+            def index(self):
+                return {}
+
+        class RootController(TGController):
+            sub = SubController()
+
+            @expose('warmup:index')
+            def index(self):
+                return {}
+
+        self._make_app(RootController())
+        compiled = [t for t, p in WarmupRenderer.compiled]
+        assert sorted(compiled) == ['index', 'sub'], compiled
+
+    def test_extra_templates(self):
+        class RootController(TGController):
+            @expose('warmup:index')
+            def index(self):
+                return {}
+
+        self._make_app(RootController(),
+                       **{'templating.warmup_templates': 'warmup:override missing:other'})
+        compiled = WarmupRenderer.compiled
+        assert ('index', {}) in compiled, compiled
+        assert ('override', {}) in compiled, compiled
+        assert 'other' not in [t for t, p in compiled], compiled
+
+    def test_workers(self):
+        class RootController(TGController):
+            @expose('warmup:first')
+            def first(self):
+                return {}
+
+            @expose('warmup:second')
+            def second(self):
+                return {}
+
+            @expose('warmup:third')
+            def third(self):
+                return {}
+
+        self._make_app(RootController(), **{'templating.warmup_workers': 2})
+        compiled = WarmupRenderer.compiled
+        for template in ('first', 'second', 'third'):
+            assert (template, {}) in compiled, compiled
+
+    def test_disabled(self):
+        class RootController(TGController):
+            @expose('warmup:index')
+            def index(self):
+                return {}
+
+        self._make_app(RootController(), **{'templating.warmup': False})
+        assert WarmupRenderer.compiled == [], WarmupRenderer.compiled
+
+    def test_broken_template_fails(self):
+        class RootController(TGController):
+            @expose('warmup:broken')
+            def index(self):
+                return {}
+
+        WarmupRenderer.fail = True
+        for workers in (0, 2):
+            milestones._reset_all()
+            try:
+                self._make_app(RootController(), **{'templating.warmup_workers': workers})
+            except ValueError as e:
+                assert 'broken template' in str(e)
+            else:
+                raise AssertionError('Should have raised ValueError')
+
+    def test_compile_times_reported(self):
+        conf = tg.util.Bunch(render_functions={'warmup': WarmupRenderer()})
+        compiled = warmup_templates(conf, extra_templates=['warmup:a', 'json:b'])
+        times = dict(((engine, template), elapsed) for engine, template, elapsed in compiled)
+        assert times[('warmup', 'a')] >= 0, compiled
+        assert ('json', 'b') not in times, compiled
+
+    def test_engines_compile_templates(self):
+        conf = AppConfig(minimal=True)
+        conf.use_dotted_templatenames = True
+        conf.renderers.extend(['genshi', 'mako', 'jinja', 'kajiki'])
+        conf.package = FakePackage()
+        conf.make_wsgi_app()
+
+        for engine, template in (('genshi', 'genshi_doctype'),
+                                 ('mako', 'mako_noop'),
+                                 ('jinja', 'jinja_noop'),
+                                 ('kajiki', 'kajiki_i18n')):
+            template_name = 'tests.test_stack.rendering.templates.' + template
+            compiled = conf.render_functions[engine].compile_template(template_name)
+            assert compiled is not None, engine
+
+
+class TestJSONConfiguredEncoders(object):
+    def setUp(self):
+        JSONRenderer._encoders.clear()
+
+    def test_encoder_reused(self):
+        encoder = JSONRenderer._get_configured_encoder({'isodates': True, 'cache_expire': 5})
+        assert encoder is JSONRenderer._get_configured_encoder({'isodates': True})
+        assert encoder is not JSONRenderer._get_configured_encoder({'isodates': False})
+
+    def test_no_options(self):
+        assert JSONRenderer._get_configured_encoder({'cache_key': 'key'}) is None
+
+    def test_unhashable_options(self):
+        options = {'custom_encoders': {FakePackage: repr}}
+        encoder = JSONRenderer._get_configured_encoder(dict(options))
+        assert encoder is not JSONRenderer._get_configured_encoder(dict(options))
+        assert not JSONRenderer._encoders
+
+    def test_cache_bounded(self):
+        for indent in range(100):
+            JSONRenderer._get_configured_encoder({'indent': indent})
+        assert 0 < len(JSONRenderer._encoders) <= 64, len(JSONRenderer._encoders)
+
+    def test_render_output(self):
+        with test_context(None):
+            for _ in range(2):
+                output = JSONRenderer.render_json(None, {'a': 1, 'b': 2}, sort_keys=True)
+                assert output == '{"a": 1, "b": 2}', output
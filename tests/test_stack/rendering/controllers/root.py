@@ -300,6 +300,32 @@ class RootController(TGController):
     def mako_inherits(self):
         return {}
 
+    @expose('genshi:genshi_doctype.html', render_params={'stream': True})
+    def genshi_stream(self):
+        return {}
+
+    @expose('jinja:jinja_buildins.jinja', render_params={'stream': True})
+    def jinja_stream(self):
+        return {}
+
+    @expose('jinja:jinja_stream_error.jinja', render_params={'stream': True})
+    def jinja_stream_error(self):
+        def fail():
+            raise ValueError('failed while streaming')
+        return dict(fail=fail)
+
+    @expose('kajiki:index.xhtml', render_params={'stream': True})
+    def kajiki_stream(self):
+        return {}
+
+    @expose('mako:mako_noop.mak', render_params={'stream': True})
+    def mako_stream(self):
+        return {}
+
+    @expose('jinja:jinja_buildins.jinja', render_params={'stream': True})
+    def jinja_stream_cached(self):
+        return dict(tg_cache={'key': 'stream', 'expire': 20, 'type': 'memory'})
+
     @expose('chameleon_genshi:tests.test_stack.rendering.templates.index')
     def chameleon_index_dotted(self):
         return {}
@@ -449,6 +475,20 @@ class RootController(TGController):
         return dict(tg_cache={'key':'TEMPLATE_CACHE_TEST2',
                               'expire':'never'})
 
+    @expose('genshi:index.html')
+    def template_caching_tags(self):
+        from datetime import datetime
+        tmpl_context.now = datetime.utcnow
+        return dict(tg_cache={'key':'TEMPLATE_CACHE_TAGS',
+                              'type':'memory',
+                              'expire':'never',
+                              'tags':['template']})
+
+    @expose()
+    def invalidate_template_caching_tags(self):
+        from tg.caching import invalidate_tags
+        return str(invalidate_tags(['template']))
+
     @expose('json')
     def template_caching_options(self, **kwargs):
         _cache_options = {}
@@ -504,6 +544,18 @@ class RootController(TGController):
     def json_return_list(self):
         return dict(values=[1,2,3])
 
+    @expose('json', render_params={'stream': True})
+    def get_json_stream(self, **kwargs):
+        return dict(values=(i for i in range(5000)), isodates=datetime.datetime(2017, 1, 1))
+
+    @expose('jsonp', render_params={'callback_param': 'call', 'stream': True})
+    def get_jsonp_stream(self, **kwargs):
+        return {'value': 5}
+
+    @expose('json', render_params={'stream': True, 'key': 'values'})
+    def json_stream_return_list(self):
+        return dict(values=(i for i in range(3)))
+
     @expose('json')
     @decode_params('json')
     def echo_json(self, **kwargs):
@@ -36,6 +36,15 @@ class TestTGController(object):
         assert '''"name": "John Carter"''' in resp
         assert '''"title": "officer"''' in resp
 
+    def test_multi_dispatch_accept_negotiation_cached(self):
+        from tests.test_stack.rendering.controllers.root import JsonController
+        deco = Decoration.get_decoration(JsonController.xml_or_json)
+
+        for i in range(2):
+            resp = self.app.get('/j/xml_or_json', headers={'accept': 'application/json'})
+            assert resp.content_type == 'application/json', resp.content_type
+            assert deco._accept_cache['application/json'] == 'application/json'
+
     def test_json_with_object(self):
         resp = self.app.get('/j/json_with_object')
         assert '''"Json": "Rocks"''' in str(resp.body)
@@ -191,3 +200,35 @@ class TestExposeLazyInheritance(object):
         assert deco.engines['text/html'][1] == 'new3_template.html', deco.engines
         assert deco.engines['text/plain'][1] == 'new_template.html', deco.engines
         assert deco.engines['text/javascript'][1] == 'new2_template.html', deco.engines
+
+
+class TestDecorationAcceptNegotiation(object):
+    BROWSER_ACCEPT = 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
+    CURL_ACCEPT = '*/*'
+    API_ACCEPT = 'application/json'
+
+    def setup(self):
+        def func():
+            pass
+        self.deco = Decoration.get_decoration(func)
+        self.deco.register_template_engine('text/html', None, 'index.html', [], {})
+        self.deco.register_template_engine('application/json', None, None, [], {})
+
+    def test_negotiation(self):
+        assert self.deco._negotiate_content_type(self.BROWSER_ACCEPT) == 'text/html'
+        assert self.deco._negotiate_content_type(self.CURL_ACCEPT) == 'text/html'
+        assert self.deco._negotiate_content_type(self.API_ACCEPT) == 'application/json'
+        assert len(self.deco._accept_cache) == 3, self.deco._accept_cache
+
+    def test_negotiation_cache_reset_on_new_engine(self):
+        assert self.deco._negotiate_content_type('text/plain') == 'text/html'
+
+        self.deco.register_template_engine('text/plain', None, 'index.txt', [], {})
+        assert self.deco._accept_cache == {}
+        assert self.deco._negotiate_content_type('text/plain') == 'text/plain'
+
+    def test_negotiation_cache_is_bounded(self):
+        from tg.decorators import _ACCEPT_CACHE_SIZE
+        for i in range(_ACCEPT_CACHE_SIZE + 1):
+            self.deco._negotiate_content_type('application/x-test-%s' % i)
+        assert len(self.deco._accept_cache) <= _ACCEPT_CACHE_SIZE
@@ -60,6 +60,28 @@ def test_default_kajiki_renderer():
     assert "Welcome" in resp, resp
     assert "TurboGears" in resp, resp
 
+def test_kajiki_renderer_compiled():
+    import os, shutil
+    from tg.renderers.kajiki import _compiled_templates_supported
+    if not _compiled_templates_supported():
+        raise SkipTest('Kajiki version not supported by compiled templates')
+
+    def set_compiled_dir(app_config):
+        app_config['templating.kajiki.compiled_templates_dir'] = '_tg_tests_kajiki_compiled'
+
+    try:
+        app = setup_noDB(set_compiled_dir)
+        resp = app.get('/kajiki_index_dotted')
+        assert "Welcome" in resp, resp
+        assert os.listdir('_tg_tests_kajiki_compiled')
+
+        # A new application loads the compiled template
+        app = setup_noDB(set_compiled_dir)
+        cached_resp = app.get('/kajiki_index_dotted')
+        assert cached_resp.text == resp.text, cached_resp
+    finally:
+        shutil.rmtree('_tg_tests_kajiki_compiled', True)
+
 def test_kajiki_i18n():
     app = setup_noDB()
     resp = app.get('/kajiki_i18n')
@@ -2,6 +2,7 @@
 from nose import SkipTest
 import shutil, os
 import json
+import logging
 import tg
 from tg.configuration import milestones
 #tg.configuration.reqlocal_config.push_process_config({})
@@ -9,6 +10,7 @@ from tg.configuration import milestones
 from tests.test_stack import TestConfig, app_from_config
 from tg.configuration.hooks import _TGGlobalHooksNamespace
 from tg.util import Bunch
+from webob import Request
 from tg._compat import PY3, im_func
 from tg.renderers.genshi import GenshiRenderer
 from tg import expose
@@ -460,6 +462,102 @@ def test_mako_renderer_compiled_no_access_parent():
     os.makedirs('_tg_tests_mako_compiled', mode=0o400)
     test_mako_renderer_compiled()
 
+def test_jinja_renderer_compiled():
+    options = {'templating.jinja.compiled_templates_dir': '_tg_tests_jinja_compiled'}
+    try:
+        app = setup_noDB(extra=options)
+        resp = app.get('/jinja_buildins')
+        assert 'HELLO JINJA!' in resp, resp
+        assert os.listdir('_tg_tests_jinja_compiled')
+
+        # A new application loads the compiled template
+        app = setup_noDB(extra=options)
+        resp = app.get('/jinja_buildins')
+        assert 'HELLO JINJA!' in resp, resp
+    finally:
+        shutil.rmtree('_tg_tests_jinja_compiled', True)
+
+def test_jinja_renderer_compiled_no_access():
+    os.makedirs('_tg_tests_jinja_compiled', mode=0o400)
+    try:
+        app = setup_noDB(extra={
+            'templating.jinja.compiled_templates_dir': '_tg_tests_jinja_compiled/dest'
+        })
+        resp = app.get('/jinja_buildins')
+        assert 'HELLO JINJA!' in resp, resp
+    finally:
+        shutil.rmtree('_tg_tests_jinja_compiled', True)
+
+def test_genshi_stream():
+    app = setup_noDB()
+    resp = app.get('/genshi_stream')
+    assert not isinstance(resp.response.app_iter, list), resp.response.app_iter
+    assert resp.text == app.get('/auto_doctype').text, resp
+    assert 'charset=utf-8' in resp.headers['Content-Type'], resp.headers
+
+def test_jinja_stream():
+    app = setup_noDB()
+    resp = app.get('/jinja_stream')
+    assert not isinstance(resp.response.app_iter, list), resp.response.app_iter
+    assert resp.text == app.get('/jinja_buildins').text, resp
+
+def test_jinja_stream_cached_not_streamed():
+    app = setup_noDB()
+    resp = app.get('/jinja_stream_cached')
+    assert isinstance(resp.response.app_iter, list), resp.response.app_iter
+    assert 'HELLO JINJA!' in resp, resp
+
+def test_jinja_stream_without_registry_streaming():
+    app = setup_noDB(extra={'registry_streaming': False})
+    resp = app.get('/jinja_stream')
+    assert isinstance(resp.response.app_iter, list), resp.response.app_iter
+    assert resp.text == app.get('/jinja_buildins').text, resp
+
+def test_jinja_stream_error_logged():
+    class RecordingHandler(logging.Handler):
+        def __init__(self):
+            logging.Handler.__init__(self)
+            self.records = []
+
+        def emit(self, record):
+            self.records.append(record)
+
+    handler = RecordingHandler()
+    logger = logging.getLogger('tg.render')
+    logger.addHandler(handler)
+    try:
+        app = setup_noDB()
+        status, headers, app_iter = Request.blank('/jinja_stream_error').call_application(app.app)
+        assert status == '200 OK', status
+
+        body = []
+        try:
+            for chunk in app_iter:
+                body.append(chunk)
+        except ValueError as e:
+            assert 'failed while streaming' in str(e), e
+        else:
+            assert False, 'Should have raised ValueError'
+        finally:
+            app_iter.close()
+    finally:
+        logger.removeHandler(handler)
+
+    errors = [r for r in handler.records if r.levelno == logging.ERROR]
+    assert len(errors) == 1, handler.records
+    assert errors[0].exc_info[0] is ValueError, errors[0].exc_info
+
+def test_kajiki_stream():
+    app = setup_noDB()
+    resp = app.get('/kajiki_stream')
+    assert not isinstance(resp.response.app_iter, list), resp.response.app_iter
+    assert 'Welcome' in resp, resp
+
+def test_mako_stream_ignored():
+    app = setup_noDB()
+    resp = app.get('/mako_stream')
+    assert resp.text == app.get('/mako_index').text, resp
+
 def test_mako_inheritance():
     app = setup_noDB()
     resp = app.get('/mako_inherits')
@@ -718,6 +816,19 @@ class TestTemplateCaching(object):
         resp = self.app.get('/template_caching_default_type')
         assert current_date in resp, (current_date, resp.body)
 
+    def test_tags_invalidation(self):
+        resp = self.app.get('/template_caching_tags')
+        current_date = resp.text.split('NOW:')[1].split('\n')[0].strip()
+
+        resp = self.app.get('/template_caching_tags')
+        assert current_date in resp, (current_date, resp.body)
+
+        resp = self.app.get('/invalidate_template_caching_tags')
+        assert resp.text == '1', resp.text
+
+        resp = self.app.get('/template_caching_tags')
+        assert current_date not in resp, (current_date, resp.body)
+
     def test_template_caching_options(self):
         resp = self.app.get('/template_caching_options', params={'cache_type':'memory'})
         resp = json.loads(resp.text)
@@ -757,6 +868,26 @@ class TestJSONRendering(object):
         resp = self.app.get('/get_jsonp_with_key', params={'call': 'callme'})
         assert 'callme({"value": 5});' in resp.text, resp
 
+    def test_jsonp_stream(self):
+        resp = self.app.get('/get_jsonp_stream', params={'call': 'callme'})
+        assert not isinstance(resp.response.app_iter, list), resp.response.app_iter
+        assert resp.text == 'callme({"value": 5});', resp
+        assert resp.headers['Content-Type'] == 'application/javascript; charset=utf-8', resp
+
+    def test_json_stream(self):
+        resp = self.app.get('/get_json_stream')
+        assert not isinstance(resp.response.app_iter, list), resp.response.app_iter
+        assert resp.json_body['values'] == list(range(5000)), resp
+        assert resp.json_body['isodates'] == '2017-01-01T00:00:00', resp
+        assert resp.content_type == 'application/json', resp
+
+    def test_json_stream_return_list(self):
+        try:
+            self.app.get('/json_stream_return_list')
+            assert False
+        except Exception as e:
+            assert 'Your Encoded object must be dict-like' in str(e), e
+
     def test_jsonp_missing_callback(self):
         resp = self.app.get('/get_jsonp', status=400)
         assert 'JSONP requires a "call" parameter with callback name' in resp.text, resp
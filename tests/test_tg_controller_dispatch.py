@@ -6,6 +6,8 @@ from nose.tools import raises
 from tests.test_validation import validators
 
 from webob import Response, Request
+from crank.dispatchstate import DispatchState
+from tg.controllers.dispatchtable import MountIndex
 from tg._compat import unicode_text, u_
 
 try:
@@ -931,3 +933,162 @@ class TestNestedWSGIAppWithoutSeekable(TestWSGIController):
     @raises(RuntimeError)
     def test_missing_body_seekable_trapped(self):
         self.app.get('/mounted_app')
+
+
+class TestTGControllerCompiledRoutes(TestTGController):
+    def setUp(self, *args, **kargs):
+        TestWSGIController.setUp(self, *args, **kargs)
+        self.root_controller = BasicTGController()
+        self.app = make_app(BasicTGController, config_options={
+            'make_body_seekable': True,
+            'tg.root_controller': self.root_controller,
+            'dispatch.compiled_routes': True
+        })
+
+    def test_routes_compiled(self):
+        routes = self.app.app.application.config['tg.dispatch_routes']
+        assert routes.root is self.root_controller
+        assert 'index' in routes._root_node.actions
+        assert 'sub' in routes._root_node.children
+        assert 'lookup' not in routes._root_node.children
+
+    def test_routes_resolve_static_path(self):
+        routes = self.app.app.application.config['tg.dispatch_routes']
+        state = DispatchState(Request.blank('/'), self.root_controller, {},
+                              '/sub/hello/Frank', [])
+        state = routes.resolve(state)
+        assert state.action == self.root_controller.sub.hello, state.action
+        assert state.remainder == ['Frank'], state.remainder
+
+        r = self.app.get('/sub/hello/Frank')
+        assert 'Why hello, Frank!' in r, r
+
+    def test_routes_resolve_index(self):
+        routes = self.app.app.application.config['tg.dispatch_routes']
+        state = DispatchState(Request.blank('/'), self.root_controller, {}, '/', [])
+        state = routes.resolve(state)
+        assert state.action == self.root_controller.index, state.action
+
+    def test_routes_leave_dynamic_paths_to_dispatch(self):
+        routes = self.app.app.application.config['tg.dispatch_routes']
+        state = DispatchState(Request.blank('/'), self.root_controller, {},
+                              '/lookup/EYE', [])
+        assert routes.resolve(state) is None
+        assert state.action is None
+
+        r = self.app.get('/lookup/EYE')
+        assert 'EYE' in r, r
+
+
+class CacheableLookupController(TGController):
+    _dispatch_cacheable = True
+
+    @expose()
+    def _lookup(self, a, *args):
+        return LookupHelper(a), args
+
+
+class DispatchCacheRootController(TGController):
+    lookup = LookupController()
+    cacheable_lookup = CacheableLookupController()
+    sub = SubController()
+
+    @expose()
+    def index(self):
+        return 'index'
+
+
+class TestTGControllerDispatchCache(TestTGController):
+    def setUp(self, *args, **kargs):
+        TestWSGIController.setUp(self, *args, **kargs)
+        self.app = make_app(BasicTGController, config_options={
+            'make_body_seekable': True,
+            'tg.root_controller': BasicTGController(),
+            'dispatch.cache_size': 100
+        })
+
+
+class TestDispatchCache(TestWSGIController):
+    def setUp(self, *args, **kargs):
+        TestWSGIController.setUp(self, *args, **kargs)
+        self.app = make_app(DispatchCacheRootController, config_options={
+            'tg.root_controller': DispatchCacheRootController(),
+            'dispatch.cache_size': 100
+        })
+        self.dispatch_cache = self.app.app.application.config['tg.dispatch_cache']
+
+    def test_cache_hits(self):
+        for i in range(3):
+            r = self.app.get('/sub/hello/Frank')
+            assert 'Why hello, Frank!' in r, r
+
+        stats = self.dispatch_cache.stats()
+        assert stats['hits'] == 2, stats
+        assert stats['misses'] == 1, stats
+        assert stats['entries'] == 1, stats
+
+    def test_cache_keeps_visiting_controllers(self):
+        for i in range(2):
+            r = self.app.get('/sub/newbefore/visited')
+            assert 'visited' in r, r
+        assert self.dispatch_cache.hits == 1, self.dispatch_cache.stats()
+
+    def test_cache_by_parameters(self):
+        r = self.app.get('/sub/hello/Frank')
+        assert 'Why hello, Frank!' in r, r
+
+        r = self.app.get('/sub/hello', params={'name': 'John'})
+        assert 'Why hello, John!' in r, r
+        assert self.dispatch_cache.hits == 0, self.dispatch_cache.stats()
+
+    def test_lookup_not_cached(self):
+        for i in range(2):
+            r = self.app.get('/lookup/EYE')
+            assert 'EYE' in r, r
+
+        stats = self.dispatch_cache.stats()
+        assert stats['hits'] == 0, stats
+        assert stats['entries'] == 0, stats
+
+    def test_lookup_cached_when_cacheable(self):
+        for i in range(2):
+            r = self.app.get('/cacheable_lookup/EYE')
+            assert 'EYE' in r, r
+
+        stats = self.dispatch_cache.stats()
+        assert stats['hits'] == 1, stats
+        assert stats['entries'] == 1, stats
+
+    def test_cache_clear(self):
+        self.app.get('/')
+        self.app.get('/')
+        self.dispatch_cache.clear()
+
+        stats = self.dispatch_cache.stats()
+        assert stats['hits'] == 0, stats
+        assert stats['entries'] == 0, stats
+
+
+class TestMountIndex(object):
+    def setup(self):
+        self.root = BasicTGController()
+        self.mount_index = MountIndex(self.root)
+
+    def test_mount_point(self):
+        assert self.mount_index.mount_point(self.root.lookup) == '/lookup'
+        assert self.mount_index.mount_steps(self.root.lookup) == [('/', self.root),
+                                                                  ('lookup', self.root.lookup)]
+
+    def test_root_mount_point(self):
+        assert self.mount_index.mount_point(self.root) == ''
+        assert self.mount_index.mount_steps(self.root) == []
+
+    def test_unmounted_controller(self):
+        assert self.mount_index.mount_point(LookupController()) == ''
+        assert self.mount_index.mount_steps(LookupController()) == []
+
+    def test_controller_at(self):
+        assert self.mount_index.controller_at('/lookup') is self.root.lookup
+        assert self.mount_index.controller_at('lookup/') is self.root.lookup
+        assert self.mount_index.controller_at('/') is self.root
+        assert self.mount_index.controller_at('/missing') is None
@@ -6,9 +6,11 @@ from tg.util import *
 from tg.configuration.utils import get_partial_dict
 from nose.tools import eq_, raises, assert_raises
 import os
+import copy
+import pickle
 from tg.controllers.util import *
 from tg.util.dates import get_fixed_timezone, utctz, parse_datetime
-from tg.util.files import safe_filename
+from tg.util.files import safe_filename, atomic_write
 from tg.util.html import script_json_encode
 from tg.util.misc import unless
 from tg.util.webtest import test_context
@@ -284,6 +286,32 @@ class TestFilesUtils(object):
         assert safe_filename('../../../etc/passwd') == 'etc_passwd'
         assert safe_filename(u_('i contain cool ümläuts.txt')) == 'i_contain_cool_umlauts.txt'
 
+    def test_atomic_write(self):
+        import tempfile, shutil
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'data')
+            atomic_write(filename, b'first')
+            atomic_write(filename, b'second')
+
+            with open(filename, 'rb') as f:
+                assert f.read() == b'second'
+            assert os.listdir(tmpdir) == ['data'], os.listdir(tmpdir)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_atomic_write_failure_cleanup(self):
+        import tempfile, shutil
+        tmpdir = tempfile.mkdtemp()
+        try:
+            atomic_write(os.path.join(tmpdir, 'data'), u_('not bytes'))
+        except TypeError:
+            assert os.listdir(tmpdir) == [], os.listdir(tmpdir)
+        else:
+            raise AssertionError('Should have raised TypeError')
+        finally:
+            shutil.rmtree(tmpdir)
+
 
 class TestWebTestUtilities(object):
     def test_test_context(self):
@@ -365,4 +393,53 @@ class TestMiscUtils(object):
         assert_raises(TGValidationError, Convert(getunless).to_python, '5')
 
         x = Convert(getunless).to_python('1')
-        assert x.val == 'bob', x
\ No newline at end of file
+        assert x.val == 'bob', x
+
+class TestLazyBunch(object):
+    def test_computed_once(self):
+        calls = []
+        b = LazyBunch({'value': lambda: calls.append(1) or 5}, other=1)
+        assert calls == []
+        assert b.value == 5
+        assert b['value'] == 5
+        assert calls == [1], calls
+
+    def test_mapping_methods(self):
+        b = LazyBunch({'a': lambda: 1}, b=2)
+        assert 'a' in b
+        assert b.get('a') == 1
+        assert b.get('c', 3) == 3
+        assert len(LazyBunch({'a': lambda: 1}, b=2)) == 2
+        assert sorted(LazyBunch({'a': lambda: 1}, b=2).items()) == [('a', 1), ('b', 2)]
+        assert dict(LazyBunch({'a': lambda: 1}, b=2)) == {'a': 1, 'b': 2}
+        assert LazyBunch({'a': lambda: 1}).copy() == {'a': 1}
+
+    def test_replace_and_delete(self):
+        b = LazyBunch({'a': lambda: 1, 'b': lambda: 2})
+        b.a = 5
+        del b['b']
+        assert b == {'a': 5}, b
+        assert_raises(KeyError, b.__getitem__, 'b')
+        assert_raises(AttributeError, b.__delattr__, 'b')
+
+    def test_copy_and_pickle(self):
+        for dup in (copy.copy, copy.deepcopy, lambda b: pickle.loads(pickle.dumps(b))):
+            b = LazyBunch({'a': lambda: [1]}, b=2)
+            c = dup(b)
+            assert type(c) is Bunch, type(c)
+            assert c == {'a': [1], 'b': 2}, c
+            assert c.a == [1]
+
+    def test_merge_into_dict(self):
+        def f(**kwargs):
+            return kwargs
+
+        d = {'c': 3}
+        d.update(LazyBunch({'a': lambda: 1}, b=2))
+        assert d == {'a': 1, 'b': 2, 'c': 3}, d
+        assert f(**LazyBunch({'a': lambda: 1}, b=2)) == {'a': 1, 'b': 2}
+
+    def test_uninitialized_instance(self):
+        b = LazyBunch.__new__(LazyBunch)
+        assert_raises(AttributeError, getattr, b, '_lazy')
+        assert_raises(AttributeError, getattr, b, 'value')
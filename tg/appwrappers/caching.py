@@ -1,5 +1,9 @@
 import logging
+from ..configuration.utils import coerce_config
 from ..support.converters import asbool
+from ..support.cache import MemoryCacheManager, LayeredCacheManager
+from ..caching import cache_metrics
+from ..request_local import Response
 from .base import ApplicationWrapper
 
 try:
@@ -20,6 +24,17 @@ class CacheApplicationWrapper(ApplicationWrapper):
 
     Supported options which can be provided by config are:
         - ``cache.enabled``: Whenever caching is enabled or not.
+        - ``cache.stale_grace``: Seconds for which expired values are still served
+          while a single thread creates the new value.
+        - ``cache.tags_expire``: Seconds the version of each tag is kept,
+          see :func:`tg.caching.invalidate_tags`. One day by default.
+        - ``cache.type``: ``tg_memory`` uses the :class:`.MemoryCacheManager`
+          provided by TurboGears instead of Beaker, see its documentation
+          for the supported options.
+          ``tg_layered`` uses the :class:`.LayeredCacheManager`, the local
+          caches are configured by the ``cache.l1.`` options (same as
+          ``tg_memory`` ones) and the shared cache by the Beaker options
+          with ``cache.l2.type`` as its type (``file`` by default).
         - Beaker Options prefixed with ``cache.``, see
           https://beaker.readthedocs.org/en/latest/configuration.html#cache-options
 
@@ -27,6 +42,15 @@ class CacheApplicationWrapper(ApplicationWrapper):
     def __init__(self, handler, config):
         super(CacheApplicationWrapper, self).__init__(handler, config)
 
+        if config.get('cache.type') == 'tg_memory':
+            self.options = dict((key[6:], value) for key, value in config.items()
+                                if key.startswith('cache.'))
+            self.enabled = asbool(self.options.pop('enabled', True))
+            self.options.pop('type')
+            self.cache_manager = MemoryCacheManager(**self.options)
+            log.debug('Caching enabled: %s -> %s', self.enabled, self.options)
+            return
+
         if CacheManager is None:  # pragma: no cover
             self.enabled = False
             log.debug('Beaker not available, caching disabled')
@@ -35,8 +59,19 @@ class CacheApplicationWrapper(ApplicationWrapper):
         from beaker.util import parse_cache_config_options
         self.options = parse_cache_config_options(config)
 
-        self.cache_manager = CacheManager(**self.options)
-        self.enabled = asbool(self.options.pop('enabled', True))
+        if self.options['type'] == 'tg_layered':
+            self.enabled = asbool(self.options.pop('enabled', True))
+            local_options = {}
+            for key in list(self.options):
+                if key.startswith('l1.'):
+                    local_options[key[3:]] = self.options.pop(key)
+            self.options['type'] = self.options.pop('l2.type', 'file')
+            self.cache_manager = LayeredCacheManager(CacheManager(**self.options),
+                                                     **local_options)
+            self.options['l1'] = local_options
+        else:
+            self.cache_manager = CacheManager(**self.options)
+            self.enabled = asbool(self.options.pop('enabled', True))
 
         log.debug('Caching enabled: %s -> %s',
                   self.enabled, self.options)
@@ -52,3 +87,46 @@ class CacheApplicationWrapper(ApplicationWrapper):
             environ['paste.testing_variables']['cache'] = context.cache
 
         return self.next_handler(controller, environ, context)
+
+
+class CacheMetricsApplicationWrapper(ApplicationWrapper):
+    """Exposes the cache metrics recorded by ``tg.caching.cache_metrics``.
+
+    Requests for the configured path are answered with the metrics
+    in the Prometheus plain text format instead of being dispatched
+    to the controllers.
+
+    Supported options which can be provided by config are:
+        - ``cache_metrics.enabled``: Whenever the metrics are exposed or not,
+          by default they are not.
+        - ``cache_metrics.path``: Path where the metrics are exposed.
+          By default ``/_cache_metrics``.
+
+    """
+    def __init__(self, handler, config):
+        super(CacheMetricsApplicationWrapper, self).__init__(handler, config)
+
+        options = {
+            'enabled': False,
+            'path': '/_cache_metrics'
+        }
+        options.update(coerce_config(config, 'cache_metrics.', {
+            'enabled': asbool
+        }))
+
+        self.enabled = options['enabled']
+        self.path = options['path']
+
+        log.debug('CacheMetricsApplicationWrapper enabled: %s -> %s',
+                  self.enabled, options)
+
+    @property
+    def injected(self):
+        return self.enabled
+
+    def __call__(self, controller, environ, context):
+        if context.request.path_info != self.path:
+            return self.next_handler(controller, environ, context)
+
+        return Response(content_type='text/plain', charset='utf-8',
+                        text=cache_metrics.render())
@@ -1,5 +1,5 @@
 import logging
-from ..i18n import sanitize_language_code, set_request_lang
+from ..i18n import sanitize_language_code, _set_request_lang_resolver
 from .._compat import string_type
 from ..support.converters import asbool
 from ..configuration.utils import coerce_config
@@ -23,7 +23,9 @@ class I18NApplicationWrapper(ApplicationWrapper):
           (``tg_lang`` by default).
         - ``i18n.no_session_touch``: Avoid causing a session save when reading it to retrieve the
           favourite user language. This is ``False`` by default, setting it to ``False`` causes
-          TurboGears to save and update the session for each request.
+          TurboGears to save and update the session for each request that translates something.
+
+    Languages are only detected when something gets translated in the request.
 
     """
     def __init__(self, handler, config):
@@ -49,6 +51,10 @@ class I18NApplicationWrapper(ApplicationWrapper):
         return self.enabled
 
     def __call__(self, controller, environ, context):
+        _set_request_lang_resolver(self._detect_languages, tgl=context)
+        return self.next_handler(controller, environ, context)
+
+    def _detect_languages(self, context):
         session_ = context.session
         if session_:
             session_existed = session_.accessed()
@@ -66,6 +72,4 @@ class I18NApplicationWrapper(ApplicationWrapper):
             languages = []
 
         languages.extend(map(sanitize_language_code, context.request.languages))
-        set_request_lang(languages, tgl=context)
-
-        return self.next_handler(controller, environ, context)
+        return languages
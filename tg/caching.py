@@ -1,8 +1,9 @@
 """Caching decorator, took as is from pylons"""
-import tg, inspect, time
-from tg.support.converters import asbool
+import tg, inspect, time, sys, threading, hashlib, random, re, string
+from tg.support.converters import asbool, asint
+from tg.support.cache import _sizeof
 from tg.support import NoDefault, EmptyContext
-from tg._compat import im_func, im_class
+from tg._compat import im_func, im_class, reraise, unicode_text, PY3
 from functools import wraps
 
 
@@ -48,10 +49,365 @@ class cached_property(object):
             return self._get_value(obj)
 
 
+class _InFlightCall(object):
+    __slots__ = ('thread', 'done', 'result', 'exc_info')
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.done = threading.Event()
+        self.result = None
+        self.exc_info = None
+
+
+class _SingleFlight(object):
+    """Performs only one call at time for each key.
+
+    Threads requesting a call for a key that is already being
+    performed by another thread wait for it to complete and
+    receive its result instead of performing the call again.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def running(self, key):
+        """Whenever a call for ``key`` is currently being performed."""
+        return key in self._calls
+
+    def call(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _InFlightCall()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            if call.thread is threading.current_thread():
+                # Recursive call for the same key, waiting would deadlock.
+                return func()
+
+            call.done.wait()
+            if call.exc_info is not None:
+                reraise(*call.exc_info)
+            return call.result
+
+        try:
+            call.result = func()
+        except:
+            call.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+_single_flight = _SingleFlight()
+
+
+class _NamespaceMetrics(object):
+    __slots__ = ('lookups', 'misses', 'lookup_time', 'creation_time', 'created_bytes')
+
+    def __init__(self):
+        self.lookups = 0
+        self.misses = 0
+        self.lookup_time = 0.0
+        self.creation_time = 0.0
+        self.created_bytes = 0
+
+    def measure(self, createfunc):
+        """Wraps ``createfunc`` so that its calls are recorded as misses."""
+        def measured_createfunc():
+            start = time.time()
+            value = createfunc()
+            self.creation_time += time.time() - start
+            self.created_bytes += _sizeof(value)
+            self.misses += 1
+            return value
+        return measured_createfunc
+
+
+class CacheMetrics(object):
+    """Process local registry of the usage of each cache namespace.
+
+    Records the lookups performed by :class:`tg.decorators.cached`,
+    :class:`tg.decorators.cached_response`, :func:`beaker_cache` and
+    by template caching, the time spent serving them, the values that had
+    to be created, the time spent creating them and their approximate size.
+
+    Counters are updated without locking, so under heavy concurrency
+    they might slightly underestimate the real values. The registry
+    of the application is available as ``tg.caching.cache_metrics``.
+    """
+    def __init__(self):
+        self._namespaces = {}
+
+    def namespace(self, name):
+        """Metrics of the ``name`` namespace, created if they don't exist."""
+        metrics = self._namespaces.get(name)
+        if metrics is None:
+            metrics = self._namespaces.setdefault(name, _NamespaceMetrics())
+        return metrics
+
+    def stats(self):
+        """Returns the counters of each namespace indexed by namespace name."""
+        stats = {}
+        for name, metrics in list(self._namespaces.items()):
+            stats[name] = dict(hits=metrics.lookups - metrics.misses,
+                               misses=metrics.misses,
+                               lookup_time=metrics.lookup_time,
+                               creation_time=metrics.creation_time,
+                               created_bytes=metrics.created_bytes)
+        return stats
+
+    def reset(self):
+        """Forgets all the recorded metrics."""
+        self._namespaces = {}
+
+    def render(self):
+        """Returns the metrics in the Prometheus plain text format."""
+        metrics = (
+            ('tg_cache_hits_total', 'counter', 'hits',
+             'Lookups served by the cache.'),
+            ('tg_cache_misses_total', 'counter', 'misses',
+             'Lookups that created the value.'),
+            ('tg_cache_lookup_seconds_total', 'counter', 'lookup_time',
+             'Time spent serving lookups, creation of the values included.'),
+            ('tg_cache_creation_seconds_total', 'counter', 'creation_time',
+             'Time spent creating values.'),
+            ('tg_cache_created_bytes_total', 'counter', 'created_bytes',
+             'Approximate size of the created values.'),
+        )
+
+        stats = self.stats()
+        namespaces = sorted(stats)
+
+        lines = []
+        for metric, metric_type, stat, description in metrics:
+            lines.append('# HELP %s %s' % (metric, description))
+            lines.append('# TYPE %s %s' % (metric, metric_type))
+            for name in namespaces:
+                label = name.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                lines.append('%s{namespace="%s"} %s' % (metric, label, stats[name][stat]))
+        return '\n'.join(lines) + '\n'
+
+cache_metrics = CacheMetrics()
+
+
+class _StaleGraceEntry(tuple):
+    """A cached value stored together with its creation time.
+
+    Used for the values cached with ``stale_grace``, so that they
+    can be told apart from the values stored as they are.
+    """
+    __slots__ = ()
+
+    def __new__(cls, created, value):
+        return tuple.__new__(cls, (created, value))
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+
+def _get_cached_value(cache, key, createfunc, expiretime=None, starttime=None,
+                      stale_grace=None):
+    """Gets ``key`` from ``cache``, creating it with ``createfunc`` when missing.
+
+    Only one thread at time runs ``createfunc`` for the same key,
+    concurrent requests for the key wait for it and share its result.
+
+    When ``stale_grace`` is provided, values are kept for that many seconds
+    after they expired. During this time the expired value is served
+    to concurrent requests while a single thread creates the new one.
+    Those values are stored with their creation time, the values stored
+    with and without ``stale_grace`` can be read by both.
+    """
+    metrics = cache_metrics.namespace(cache.namespace_name)
+    metrics.lookups += 1
+
+    start = time.time()
+    try:
+        return _lookup_cached_value(cache, key, metrics.measure(createfunc),
+                                    expiretime, starttime, stale_grace)
+    finally:
+        metrics.lookup_time += time.time() - start
+
+
+def _lookup_cached_value(cache, key, createfunc, expiretime, starttime, stale_grace):
+    flight_key = (cache.namespace_name, key)
+
+    if expiretime is not None:
+        expiretime = float(expiretime)
+
+    if not stale_grace or expiretime is None:
+        def create_value():
+            return _single_flight.call(flight_key, createfunc)
+
+        def recreate_value():
+            value = createfunc()
+            cache.put(key, value, expiretime=expiretime, starttime=starttime)
+            return value
+
+        value = cache.get_value(key, createfunc=create_value,
+                                expiretime=expiretime, starttime=starttime)
+        if isinstance(value, _StaleGraceEntry):
+            # Stored while stale_grace was enabled, the cache keeps it for longer.
+            created, value = value
+            if expiretime is not None and time.time() - created >= expiretime:
+                value = _single_flight.call(flight_key, recreate_value)
+        return value
+
+    entry_expiretime = expiretime + stale_grace
+
+    def get_entry():
+        try:
+            entry = cache.get(key, expiretime=entry_expiretime, starttime=starttime)
+        except KeyError:
+            return None
+
+        if not isinstance(entry, _StaleGraceEntry):
+            # Stored without stale_grace, when it was created is unknown.
+            return None
+        return entry
+
+    def create_entry():
+        entry = get_entry()
+        if entry is not None and time.time() - entry[0] < expiretime:
+            # Created by another thread in the mean time.
+            return entry
+
+        entry = _StaleGraceEntry(time.time(), createfunc())
+        cache.put(key, entry, expiretime=entry_expiretime, starttime=starttime)
+        return entry
+
+    entry = get_entry()
+    if entry is not None:
+        created, value = entry
+        if time.time() - created < expiretime or _single_flight.running(flight_key):
+            return value
+
+    return _single_flight.call(flight_key, create_entry)[1]
+
+
+# Namespace where the current version of each tag is stored
+_TAGS_NAMESPACE = 'tg.caching.tags'
+_TAGS_EXPIRE = 86400
+_tags_formatter = string.Formatter()
+
+
+class _TagParams(dict):
+    def __missing__(self, key):
+        return None
+
+
+def _tags_placeholders(tags):
+    """Names of the arguments used by the ``{name}`` placeholders of ``tags``."""
+    for tag in tags:
+        for _, field_name, _, _ in _tags_formatter.parse(tag):
+            if field_name is not None:
+                yield re.split(r'[.\[]', field_name, 1)[0]
+
+
+def _check_tags_placeholders(tags, func):
+    """Raises ``ValueError`` when ``tags`` use placeholders ``func`` can't provide."""
+    try:
+        argspec = _getargspec(func)
+    except (TypeError, ValueError):
+        return
+
+    if argspec[2]:
+        # Accepts any keyword argument
+        return
+
+    args_names = set(argspec[0]) | set(getattr(argspec, 'kwonlyargs', ()))
+    for name in _tags_placeholders(tags):
+        if name not in args_names:
+            raise ValueError('Cache tags of %s use {%s} placeholder, but it is '
+                             'not an argument of the function' % (func.__name__, name))
+
+
+def _format_tags(tags, params):
+    """Replaces the ``{name}`` placeholders in ``tags`` with ``params``.
+
+    Placeholders of arguments that were not provided are replaced with ``None``.
+    """
+    params = _TagParams(params)
+    return [_tags_formatter.vformat(tag, (), params) for tag in tags]
+
+
+def _tagged_cache_key(cache_manager, tags, cache_key):
+    """Binds ``cache_key`` to the current version of each one of ``tags``.
+
+    Entries are never tracked by tag, invalidating a tag replaces its version
+    so the keys of the entries created before point to values nobody looks up
+    anymore and that expire or get evicted as any other unused value.
+    Versions are only written when a tag has none, so concurrent processes
+    sharing the cache never overwrite each other's invalidations.
+    """
+    tags_cache = cache_manager.get_cache(_TAGS_NAMESPACE)
+    tags_expire = asint(tg.config.get('cache.tags_expire', _TAGS_EXPIRE))
+
+    versions = []
+    for tag in tags:
+        try:
+            version = tags_cache.get(tag, expiretime=tags_expire)
+        except KeyError:
+            version = '%x' % random.getrandbits(64)
+            tags_cache.put(tag, version, expiretime=tags_expire)
+        versions.append(version)
+
+    return '%s tags:%s' % (cache_key, '.'.join(versions))
+
+
+def invalidate_tags(tags, cache_manager=None):
+    """Invalidates all the cache entries tagged with any of ``tags``.
+
+    Tags can be attached to the entries created by :class:`tg.decorators.cached`,
+    :class:`tg.decorators.cached_response`, :func:`beaker_cache` and by the
+    ``tg_cache`` option of templates through their ``tags`` option::
+
+        @expose('myproject.templates.product')
+        @cached(tags=['product:{product_id}'])
+        def product(self, product_id):
+            return dict(product=Product.get(product_id))
+
+        @expose()
+        def update_product(self, product_id, **kw):
+            Product.get(product_id).update(**kw)
+            invalidate_tags(['product:%s' % product_id])
+
+    The current version of each tag is stored in the ``tg.caching.tags``
+    namespace of the cache and is part of the key of the tagged entries,
+    invalidating a tag discards its version so that the entries are created
+    again. Versions are kept for ``cache.tags_expire`` seconds (one day by
+    default), the entries of tags whose version expired are created again too.
+    With the ``tg_layered`` cache the other processes see the invalidation
+    once their local copy of the version expires.
+
+    ``cache_manager`` defaults to ``tg.cache``, returns the number of tags
+    that had entries.
+    """
+    if cache_manager is None:
+        cache_manager = tg.cache._current_obj()
+
+    tags_cache = cache_manager.get_cache(_TAGS_NAMESPACE)
+
+    invalidated = 0
+    for tag in tags:
+        if tag in tags_cache:
+            invalidated += 1
+        tags_cache.remove_value(tag)
+
+    return invalidated
+
+
 def _cached_call(func, args, kwargs, namespace, cache_key,
                  expire="never", type=None, starttime=None,
                  cache_headers=('content-type', 'content-length'),
-                 cache_response=True, cache_extra_args=None):
+                 cache_response=True, cache_extra_args=None, stale_grace=None,
+                 tags=None):
     """
     Optional arguments:
 
@@ -85,6 +441,13 @@ def _cached_call(func, args, kwargs, namespace, cache_key,
         .. note::
             When cache_response is set to False, the cache_headers
             argument is ignored as none of the response is cached.
+    ``stale_grace``
+        Seconds for which an expired value is still served while
+        a single thread creates the new one. Defaults to the
+        ``cache.stale_grace`` option, when not set concurrent requests
+        wait for the new value.
+    ``tags``
+        List of tags attached to the cached value, see :func:`invalidate_tags`.
 
     If cache.enabled is set to False in the .ini file, then cache is
     disabled globally.
@@ -107,11 +470,17 @@ def _cached_call(func, args, kwargs, namespace, cache_key,
 
     my_cache = cache_obj.get_cache(namespace, **cache_extra_args)
 
+    if tags:
+        cache_key = _tagged_cache_key(cache_obj, tags, cache_key)
+
     if expire == "never":
         cache_expire = None
     else:
         cache_expire = expire
 
+    if stale_grace is None:
+        stale_grace = asint(tg_locals.config.get('cache.stale_grace', 0))
+
     def create_func():
         result = func(*args, **kwargs)
         glob_response = tg_locals.response
@@ -121,10 +490,10 @@ def _cached_call(func, args, kwargs, namespace, cache_key,
                              cookies=None, content=result)
         return full_response
 
-    response = my_cache.get_value(cache_key,
-                                  createfunc=create_func,
-                                  expiretime=cache_expire,
-                                  starttime=starttime)
+    response = _get_cached_value(my_cache, cache_key, create_func,
+                                 expiretime=cache_expire,
+                                 starttime=starttime,
+                                 stale_grace=stale_grace)
     if cache_response:
         glob_response = tg_locals.response
         glob_response.headerlist = [header for header in response['headers']
@@ -138,7 +507,7 @@ def beaker_cache(key="cache_default", expire="never", type=None,
                  query_args=False,
                  cache_headers=('content-type', 'content-length'),
                  invalidate_on_startup=False,
-                 cache_response=True, **b_kwargs):
+                 cache_response=True, stale_grace=None, tags=None, **b_kwargs):
     """Cache decorator utilizing Beaker. Caches a
     function that returns a pickle-able object as a result.
 
@@ -170,6 +539,13 @@ def beaker_cache(key="cache_default", expire="never", type=None,
         .. note::
             When cache_response is set to False, the cache_headers
             argument is ignored as none of the response is cached.
+    ``stale_grace``
+        Seconds for which an expired value is still served while
+        a single thread creates the new one. Defaults to the
+        ``cache.stale_grace`` option.
+    ``tags``
+        List of tags attached to the cached value, see :func:`invalidate_tags`.
+        ``{name}`` placeholders are replaced with the function arguments.
 
     If cache.enabled is set to False in the .ini file, then cache is
     disabled globally.
@@ -182,11 +558,22 @@ def beaker_cache(key="cache_default", expire="never", type=None,
     cache_headers = set(cache_headers)
 
     def beaker_cache_decorate(func):
+        if tags:
+            _check_tags_placeholders(tags, func)
+
+        args_names = None
+        if key or tags:
+            try:
+                args_names = _args_names(func)
+            except (TypeError, ValueError):
+                # Not introspectable now, retried when the function is called.
+                pass
+
         @wraps(func)
         def beaker_cached_call(*args, **kwargs):
             if key:
                 key_dict = kwargs.copy()
-                key_dict.update(_make_dict_from_args(func, args, kwargs))
+                key_dict.update(_make_dict_from_args(func, args, kwargs, args_names))
                 if query_args:
                     key_dict.update(tg.request.GET.mixed())
 
@@ -198,22 +585,31 @@ def beaker_cache(key="cache_default", expire="never", type=None,
             else:
                 key_dict = None
 
+            if tags:
+                names = args_names if args_names is not None else _args_names(func)
+                tag_params = dict((arg, args[i]) for i, arg in names if i < len(args))
+                tag_params.update(kwargs)
+                cache_tags = _format_tags(tags, tag_params)
+            else:
+                cache_tags = None
+
             self = None
             if args:
                 self = args[0]
-            namespace, cache_key = create_cache_key(func, key_dict, self)
+            namespace, cache_key = create_cache_key(func, key_dict, self,
+                                                    _key_max_length(tg.config))
 
             return _cached_call(func, args, kwargs, namespace, cache_key,
                                 expire, type, starttime,
                                 cache_headers, cache_response,
-                                b_kwargs)
+                                b_kwargs, stale_grace, cache_tags)
 
         return beaker_cached_call
 
     return beaker_cache_decorate
 
 
-def create_cache_key(func, key_dict=None, self=None):
+def create_cache_key(func, key_dict=None, self=None, key_max_length=None):
     """Get a cache namespace and key used by the beaker_cache decorator.
 
     Example::
@@ -222,6 +618,11 @@ def create_cache_key(func, key_dict=None, self=None):
         namespace, key = create_cache_key(MyController.some_method)
         cache.get_cache(namespace).remove(key)
 
+    The arguments in ``key_dict`` are added to the key sorted by name.
+    When ``key_max_length`` is provided, keys longer than it are replaced
+    by the function name followed by the SHA1 digest of the key.
+    The decorators use the ``cache.key_max_length`` option for it.
+
     """
     kls = None
     imfunc = im_func(func)
@@ -232,8 +633,10 @@ def create_cache_key(func, key_dict=None, self=None):
     else:
         cache_key = func.__name__
     if key_dict:
-        cache_key += " " + " ".join("%s=%s" % (k, v)
-                                    for k, v in key_dict.items())
+        cache_key += " " + " ".join("%s=%s" % (k, key_dict[k])
+                                    for k in sorted(key_dict))
+    if key_max_length and len(cache_key) > key_max_length:
+        cache_key = _hash_cache_key(func.__name__, cache_key)
 
     if not kls and self:
         kls = getattr(self, '__class__', None)
@@ -244,13 +647,38 @@ def create_cache_key(func, key_dict=None, self=None):
         return func.__module__, cache_key
 
 
-def _make_dict_from_args(func, args, kwargs):
+def _hash_cache_key(name, cache_key):
+    """Replaces a cache key with a fixed size digest of it."""
+    if isinstance(cache_key, unicode_text):
+        cache_key = cache_key.encode('utf-8')
+    return '%s %s' % (name, hashlib.sha1(cache_key).hexdigest())
+
+
+def _key_max_length(config):
+    return asint(config.get('cache.key_max_length', 0))
+
+
+if PY3:  # pragma: no cover
+    _getargspec = inspect.getfullargspec
+else:  # pragma: no cover
+    _getargspec = inspect.getargspec
+
+
+def _args_names(func):
+    """Position and name of the arguments of ``func``, excluding ``self``"""
+    return tuple((i, arg) for i, arg in enumerate(_getargspec(func)[0])
+                 if arg != "self")
+
+
+def _make_dict_from_args(func, args, kwargs, args_names=None):
     """Inspects function for name of args"""
+    if args_names is None:
+        args_names = _args_names(func)
+
     args_keys = {}
-    for i, arg in enumerate(inspect.getargspec(func)[0]):
-        if arg != "self":
-            try:
-                args_keys[arg] = args[i]
-            except IndexError:
-                args_keys[arg] = kwargs[arg]
+    for i, arg in args_names:
+        try:
+            args_keys[arg] = args[i]
+        except IndexError:
+            args_keys[arg] = kwargs[arg]
     return args_keys
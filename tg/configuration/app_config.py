@@ -26,7 +26,7 @@ from tg.renderers.mako import MakoRenderer
 from tg.renderers.kajiki import KajikiRenderer
 
 from tg.appwrappers.i18n import I18NApplicationWrapper
-from tg.appwrappers.caching import CacheApplicationWrapper
+from tg.appwrappers.caching import CacheApplicationWrapper, CacheMetricsApplicationWrapper
 from tg.appwrappers.session import SessionApplicationWrapper
 from tg.appwrappers.errorpage import ErrorPageApplicationWrapper
 from tg.appwrappers.transaction_manager import TransactionApplicationWrapper
@@ -168,7 +168,7 @@ class AppConfig(Bunch):
         - ``use_dotted_templatenames`` -> Use template names as packages in @expose instead of file paths.
           This is usually the default unless TG is started in Minimal Mode. **Can be set from .ini file**
         - ``registry_streaming`` -> Enable streaming of responses, this is enabled by default.
-          **Can be set from .ini file**
+          The ``stream`` render param is ignored when disabled. **Can be set from .ini file**
         - ``paths`` -> Dictionary of directories where templates, static files and controllers are found::
 
             {
@@ -200,6 +200,13 @@ class AppConfig(Bunch):
         - ``default_renderer`` -> When not specified, use this renderer for templates.
         - ``auto_reload_templates`` -> Automatically reload templates when modified (disable this on production
           for a performance gain). **Can be set from .ini file**
+        - ``templating.warmup`` -> Compile all the templates exposed by the controllers when the
+          application starts, instead of compiling them on first request. Fails if any template
+          doesn't compile. **Can be set from .ini file**
+        - ``templating.warmup_workers`` -> Number of threads used to compile templates on warmup,
+          by default they are compiled by the main thread. **Can be set from .ini file**
+        - ``templating.warmup_templates`` -> List of additional ``engine:template`` names to compile
+          on warmup, like templates that are only used through ``override_template``.
         - ``use_ming`` -> Enable/Disable Ming as Models storage.
         - ``ming.url`` -> Url of the MongoDB database
         - ``ming.db`` -> If Database is not provided in ``ming.url`` it can be specified here.
@@ -208,15 +215,34 @@ class AppConfig(Bunch):
         - ``use_sqlalchemy`` -> Enable/Disable SQLalchemy as Models storage.
         - ``sqlalchemy.url`` -> Url of the SQLAlchemy database. Refer to :ref:`sqla_master_slave` for
           configuring master-slave urls.
+        - ``dispatch.compiled_routes`` -> Precompile the static routes of the root controller
+          when the application starts, so that requests for them don't have to traverse
+          the controllers tree. **Can be set from .ini file**
+        - ``dispatch.cache_size`` -> Number of dispatched paths for which the dispatch result
+          is cached, ``0`` disables the cache. Paths dispatched through ``_lookup``, ``_default``
+          or a custom ``_dispatch`` are cached only for controllers that set ``_dispatch_cacheable``.
+          The controllers returned by ``_lookup`` are cached too and shared by all the following
+          requests for the same path, so ``_lookup`` of cacheable controllers must return
+          stateless controllers that don't depend on the request (like an object loaded
+          from the database in ``_lookup``). **Can be set from .ini file**
+        - ``dispatch.compiled_pipeline`` -> Call actions through a pipeline precomputed from their hooks,
+          validators and controller wrappers, skipping the stages that have nothing registered.
+          **Can be set from .ini file**
     """
     CONFIG_OPTIONS = {
         'debug': asbool,
         'serve_static': asbool,
         'auto_reload_templates': asbool,
+        'templating.warmup': asbool,
+        'templating.warmup_workers': asint,
+        'templating.warmup_templates': aslist,
         'use_dotted_templatenames': asbool,
         'registry_streaming': asbool,
         'use_toscawidgets2': asbool,
-        'prefer_toscawidgets2': asbool
+        'prefer_toscawidgets2': asbool,
+        'dispatch.compiled_routes': asbool,
+        'dispatch.cache_size': asint,
+        'dispatch.compiled_pipeline': asbool
     }
 
     def __init__(self, minimal=False, root_controller=None):
@@ -291,6 +317,7 @@ class AppConfig(Bunch):
         self.register_wrapper(IdentityApplicationWrapper, after=True)
         self.register_wrapper(SessionApplicationWrapper, after=True)
         self.register_wrapper(CacheApplicationWrapper, after=True)
+        self.register_wrapper(CacheMetricsApplicationWrapper, after=True)
         self.register_wrapper(MingApplicationWrapper, after=True)
         self.register_wrapper(TransactionApplicationWrapper, after=True)
         self.register_wrapper(ErrorPageApplicationWrapper, after=True)
@@ -22,8 +22,39 @@ class HooksNamespace(object):
     """Manages hooks registrations and notifications"""
     def __init__(self):
         self._hooks = dict()
+        # Increased whenever hooks change, to invalidate precomputed pipelines.
+        self._generation = 0
+
+        # Handlers to notify for each (hook_name, controller)
+        self._handlers = dict()
+        self._handlers_generation = Decoration._hooks_generation
+
         atexit.register(self._atexit)
 
+    def _hooks_changed(self):
+        self._generation += 1
+        self._handlers = dict()
+
+    def _get_handlers(self, hook_name, controller):
+        if self._handlers_generation != Decoration._hooks_generation:
+            # Hooks of some controller changed, forget cached handlers.
+            self._handlers = dict()
+            self._handlers_generation = Decoration._hooks_generation
+
+        handlers_cache = self._handlers
+        try:
+            return handlers_cache[(hook_name, controller)]
+        except KeyError:
+            pass
+
+        handlers = tuple(self._hooks.get(hook_name, ()))
+        if controller is not None:
+            deco = Decoration.get_decoration(controller)
+            handlers += tuple(deco.hooks.get(hook_name, ()))
+
+        handlers_cache[(hook_name, controller)] = handlers
+        return handlers
+
     def _atexit(self):
         for func in self._hooks.get('shutdown', tuple()):
             func()
@@ -78,6 +109,8 @@ class HooksNamespace(object):
             registrations.remove(func)
         except ValueError:
             pass
+        else:
+            self._hooks_changed()
 
     def notify(self, hook_name, args=None, kwargs=None, controller=None,
                context_config=None, trap_exceptions=False):
@@ -97,22 +130,17 @@ class HooksNamespace(object):
                             controller=RootController.index)
 
         """
-        args = args or []
-        kwargs = kwargs or {}
-
-        try:
-            syswide_hooks = self._hooks[hook_name]
-        except KeyError:  # pragma: no cover
-            pass
-        else:
-            for func in syswide_hooks:
-                self._call_handler(hook_name, trap_exceptions, func, args, kwargs)
-
         if controller is not None:
             controller = default_im_func(controller)
-            deco = Decoration.get_decoration(controller)
-            for func in deco.hooks.get(hook_name, []):
-                self._call_handler(hook_name, trap_exceptions, func, args, kwargs)
+
+        handlers = self._get_handlers(hook_name, controller)
+        if not handlers:
+            return
+
+        args = args or []
+        kwargs = kwargs or {}
+        for func in handlers:
+            self._call_handler(hook_name, trap_exceptions, func, args, kwargs)
 
     def notify_with_value(self, hook_name, value, controller=None, context_config=None):
         """Notifies a TurboGears hook which is expected to return a value.
@@ -164,6 +192,7 @@ class _ApplicationHookRegistration(object):
         else:
             hooks = self.hooks_namespace._hooks
             hooks.setdefault(self.hook_name, []).append(self.func)
+            self.hooks_namespace._hooks_changed()
 
 
 class _ControllerHookRegistration(object):
@@ -21,6 +21,7 @@ from tg.validation import (_navigate_tw2form_children,
                            TGValidationError, _ValidationStatus)
 
 from tg._compat import unicode_text, with_metaclass, im_self, url2pathname, default_im_func
+from tg.configuration.app_config import call_controller
 from functools import partial
 
 strip_string = operator.methodcaller('strip')
@@ -77,8 +78,6 @@ class DecoratedController(with_metaclass(_DecoratedControllerMeta, object)):
             #compatibility with old code that didn't pass request locals explicitly
             context = tg.request.environ['tg.locals']
 
-        hooks = tg.hooks
-        context_config = tg.config._current_obj()
         context.request._fast_setattr('validation', _ValidationStatus())
 
         # This is necessary to prevent spurious Content Type header which would
@@ -93,35 +92,31 @@ class DecoratedController(with_metaclass(_DecoratedControllerMeta, object)):
         else:
             remainder = tuple()
 
+        response_cache = action.decoration.response_cache
+        if response_cache is not None:
+            return response_cache._cached_call(self._call_action, action, params,
+                                               remainder, context)
+
+        return self._call_action(action, params, remainder, context)
+
+    def _call_action(self, action, params, remainder, context):
+        """Validates the parameters, calls the action and renders its output."""
+        hooks = tg.hooks
+        context_config = tg.config._current_obj()
+
+        if context_config.get('dispatch.compiled_pipeline', False):
+            return self._call_pipeline(hooks, action, params, remainder,
+                                       context, context_config)
+
         hooks.notify('before_validate', args=(remainder, params),
                      controller=action, context_config=context_config)
 
         validate_params = get_params_with_argspec(action, params, remainder)
         context.request.args_params = validate_params  # Update args_params with positional args
 
-        try:
-            params = self._perform_validate(action, validate_params, context)
-        except validation_errors as inv:
-            instance, error_handler, chain_validation = self._process_validation_errors(
-                action, remainder, params, inv, context=context
-            )
-            while chain_validation:
-                # The validation asked for chained validation,
-                # go on and validate the error_handler too.
-                try:
-                    params = self._perform_validate(error_handler, validate_params, context)
-                except validation_errors as inv:
-                    instance, error_handler, chain_validation = self._process_validation_errors(
-                        error_handler, remainder, params, inv, context=context
-                    )
-                else:
-                    chain_validation = False
-            action = error_handler
-            bound_controller_callable = partial(error_handler, instance)
-        else:
-            bound_controller_callable = action
-            context.request.validation.values = params
-            remainder, params = flatten_arguments(action, params, remainder)
+        action, bound_controller_callable, remainder, params = self._validate_call(
+            action, remainder, params, validate_params, context
+        )
 
         hooks.notify('before_call', args=(remainder, params),
                      controller=action, context_config=context_config)
@@ -141,6 +136,84 @@ class DecoratedController(with_metaclass(_DecoratedControllerMeta, object)):
 
         return response['response']
 
+    def _call_pipeline(self, hooks, action, params, remainder, context, context_config):
+        """Run the controller through its precomputed pipeline.
+
+        Behaves like :meth:`_call`, but hooks, validators and controller
+        wrappers are looked up from the pipeline of the action decoration,
+        stages that have nothing registered are skipped.
+        """
+        pipeline = action.decoration.get_pipeline(hooks)
+
+        for func in pipeline.before_validate:
+            func(remainder, params)
+
+        validate_params = get_params_with_argspec(action, params, remainder)
+        context.request.args_params = validate_params  # Update args_params with positional args
+
+        if pipeline.validations:
+            validated_action, bound_controller_callable, remainder, params = self._validate_call(
+                action, remainder, params, validate_params, context
+            )
+            if validated_action is not action:
+                # Validation failed and the error handler will be called, use its pipeline.
+                from tg.decorators import Decoration
+                action = validated_action
+                pipeline = Decoration.get_decoration(action).get_pipeline(hooks)
+        else:
+            bound_controller_callable = action
+            context.request.validation.values = validate_params
+            remainder, params = flatten_arguments(action, validate_params, remainder)
+
+        for func in pipeline.before_call:
+            func(remainder, params)
+
+        # call controller method with applied wrappers
+        controller_caller = pipeline.controller_caller
+        if controller_caller is None:
+            controller_caller = context_config.get('controller_caller', call_controller)
+        output = controller_caller(context_config, bound_controller_callable, remainder, params)
+
+        for func in pipeline.before_render:
+            func(remainder, params, output)
+
+        response = self._render_response(context, action, output)
+
+        for func in pipeline.after_render:
+            func(response)
+
+        return response['response']
+
+    def _validate_call(self, action, remainder, params, validate_params, context):
+        """Validates the parameters of the action.
+
+        Returns the action that should be called (which is the error handler
+        in case of validation errors) and the callable, remainder and
+        parameters it should be called with.
+        """
+        try:
+            params = self._perform_validate(action, validate_params, context)
+        except validation_errors as inv:
+            instance, error_handler, chain_validation = self._process_validation_errors(
+                action, remainder, params, inv, context=context
+            )
+            while chain_validation:
+                # The validation asked for chained validation,
+                # go on and validate the error_handler too.
+                try:
+                    params = self._perform_validate(error_handler, validate_params, context)
+                except validation_errors as inv:
+                    instance, error_handler, chain_validation = self._process_validation_errors(
+                        error_handler, remainder, params, inv, context=context
+                    )
+                else:
+                    chain_validation = False
+            return error_handler, partial(error_handler, instance), remainder, params
+
+        context.request.validation.values = params
+        remainder, params = flatten_arguments(action, params, remainder)
+        return action, action, remainder, params
+
     @classmethod
     def _perform_validate(cls, controller, params, context=None):
         """Run validation for the controller with the given parameters.
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of dispatch results.
+
+Resolving a request walks the controllers tree performing the same
+steps for every request with the same path. The :class:`DispatchCache`
+records the steps performed while resolving a path and replays them
+for following requests instead of dispatching the path again.
+
+Replaying the steps still calls ``_visit`` and ``_check_security`` of
+each traversed controller, only the search for the action is skipped.
+Paths resolved through ``_lookup``, ``_default`` or a custom
+``_dispatch`` (like :class:`.RestController` does) are only cached when
+the controller providing them sets ``_dispatch_cacheable = True``, which
+means that its dispatch always leads to the same controllers and action
+for the same path. The controller instances returned by ``_lookup`` are
+stored in the cache and reused by the following requests for the same
+path, ``_lookup`` of cacheable controllers must return stateless controllers
+that can be shared, not ones built around request data.
+
+"""
+from crank.dispatchstate import DispatchState
+from repoze.lru import LRUCache
+
+from tg.controllers.dispatchtable import _is_object_dispatcher
+
+_STEP_CONTROLLER = 0
+_STEP_ENTER = 1
+_STEP_NOTFOUND = 2
+
+
+class TracingDispatchState(DispatchState):
+    """DispatchState that records the steps performed to resolve it.
+
+    The recorded steps are the controllers added to the state,
+    the controllers entered by the dispatchers and the ``_lookup`` or
+    ``_default`` methods used when no action was found.
+    """
+    def __init__(self, *args, **kwargs):
+        self._dispatch_steps = []
+        super(TracingDispatchState, self).__init__(*args, **kwargs)
+
+    def add_controller(self, location, controller):
+        self._dispatch_steps.append((_STEP_CONTROLLER, location, controller))
+        super(TracingDispatchState, self).add_controller(location, controller)
+
+    def _record_enter(self, dispatcher, remainder):
+        self._dispatch_steps.append((_STEP_ENTER, dispatcher, remainder))
+
+    def _record_notfound(self, method):
+        self._dispatch_steps.append((_STEP_NOTFOUND, method, None))
+
+
+class _DispatchCacheEntry(object):
+    __slots__ = ('root', 'steps', 'action', 'remainder', 'routing_args', 'http_method')
+
+    def __init__(self, root, steps, action, remainder, routing_args, http_method):
+        self.root = root
+        self.steps = steps
+        self.action = action
+        self.remainder = remainder
+        self.routing_args = routing_args
+        self.http_method = http_method
+
+
+class DispatchCache(object):
+    """Bounded LRU cache of resolved dispatch states.
+
+    Entries are identified by the key provided by the dispatcher,
+    ``hits`` and ``misses`` count the lookups performed on the cache
+    and can be used to tune its ``size``.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = LRUCache(size)
+
+    def stats(self):
+        """Returns a dictionary with the cache counters."""
+        return dict(size=self.size,
+                    entries=len(self._entries.data),
+                    hits=self.hits,
+                    misses=self.misses,
+                    evictions=self._entries.evictions)
+
+    def clear(self):
+        """Removes all the cached dispatch results and resets counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, key, state):
+        """Resolves the ``state`` from the cached entry identified by ``key``.
+
+        Returns ``None`` when there is no entry for the key, in such case
+        the state has to be resolved by the dispatcher.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry.root is not state.root_dispatcher:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if entry.http_method is not None:
+            # Replicate the HTTP method detection performed by REST dispatch.
+            state.params.pop('_method', None)
+            state.http_method = entry.http_method
+
+        for step, target, value in entry.steps:
+            if step == _STEP_CONTROLLER:
+                state.add_controller(target, value)
+            else:
+                target._enter_controller(state, value)
+
+        state.routing_args.update(entry.routing_args)
+        state.set_action(entry.action, list(entry.remainder))
+        return state
+
+    def store(self, key, state):
+        """Stores the steps recorded by a resolved :class:`TracingDispatchState`.
+
+        Returns ``False`` when the state got resolved through
+        dynamic dispatch that didn't opt-in for caching.
+        """
+        steps = []
+        for step, target, value in state._dispatch_steps[1:]:
+            if step == _STEP_NOTFOUND:
+                if not getattr(getattr(target, '__self__', None), '_dispatch_cacheable', False):
+                    return False
+                continue
+
+            if step == _STEP_CONTROLLER and getattr(value, '_dispatch', None) is not None:
+                if not _is_object_dispatcher(value) and \
+                        not getattr(value, '_dispatch_cacheable', False):
+                    return False
+
+            steps.append((step, target, value))
+
+        root = state.root_dispatcher
+        if not _is_object_dispatcher(root) and not getattr(root, '_dispatch_cacheable', False):
+            return False
+
+        self._entries.put(key, _DispatchCacheEntry(root, tuple(steps),
+                                                   state.action, state.remainder,
+                                                   dict(state.routing_args),
+                                                   getattr(state, 'http_method', None)))
+        return True
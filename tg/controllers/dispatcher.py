@@ -18,18 +18,38 @@ class which provides the ordinary TurboGears mechanism.
 import tg
 from webob.exc import HTTPException
 from tg._compat import unicode_text
-from tg.decorators import cached_property
 from crank.dispatchstate import DispatchState
+from tg.controllers.dispatchcache import TracingDispatchState
+from tg.controllers.dispatchtable import MountIndex
 from tg.request_local import WebObResponse
 import mimetypes as default_mimetypes
+import threading
 import weakref
 from ..wsgiapp import TGApp
 
 
+_mount_index_lock = threading.Lock()
+
+
+def _get_mount_index(conf):
+    mount_index = conf.get('tg.mount_index')
+    if mount_index is None:
+        with _mount_index_lock:
+            mount_index = conf.get('tg.mount_index')
+            if mount_index is None:
+                if 'tg.root_controller' in conf:
+                    root_controller = conf['tg.root_controller']
+                else:
+                    root_controller = TGApp.lookup_controller(conf, 'root')
+                mount_index = conf['tg.mount_index'] = MountIndex(root_controller)
+    return mount_index
+
+
 def dispatched_controller():
     state = tg.request._controller_state
+    mount_index = _get_mount_index(tg.config)
     for location, cont in reversed(state.controller_path):
-        if cont.mount_point:
+        if mount_index.mount_point(cont):
             return cont
 
 
@@ -38,6 +58,12 @@ class CoreDispatcher(object):
     _use_lax_params = True
     _use_index_fallback = False
 
+    # Set to True when _lookup, _default and _dispatch always lead to
+    # the same action for the same path, so that the result can be cached.
+    # The controllers returned by _lookup are cached and shared between
+    # requests too, so they must not keep any per request state.
+    _dispatch_cacheable = False
+
     def _get_dispatchable(self, context, url_path):
         """
         Returns a tuple (controller, remainder, params)
@@ -52,7 +78,13 @@ class CoreDispatcher(object):
         enable_request_extensions = not conf.get('disable_request_extensions', False)
         dispatch_path_translator = conf.get('dispatch_path_translator', True)
 
-        state = DispatchState(weakref.proxy(req), self, req.args_params, url_path.split('/'),
+        dispatch_cache = conf.get('tg.dispatch_cache')
+        if dispatch_cache is not None:
+            state_factory = TracingDispatchState
+        else:
+            state_factory = DispatchState
+
+        state = state_factory(weakref.proxy(req), self, req.args_params, url_path.split('/'),
                               conf.get('ignore_parameters', []),
                               strip_extension=enable_request_extensions,
                               path_translator=dispatch_path_translator)
@@ -70,7 +102,23 @@ class CoreDispatcher(object):
                 req._fast_setattr('_response_type', mime_type)
             req._fast_setattr('_response_ext', ext)
 
-        state = state.resolve()
+        resolved_state = None
+        if dispatch_cache is not None:
+            params = state.params
+            dispatch_cache_key = (req.method, params.get('_method'), url_path,
+                                  state.extension, tuple(sorted(params)))
+            resolved_state = dispatch_cache.resolve(dispatch_cache_key, state)
+
+        routes = conf.get('tg.dispatch_routes')
+        if resolved_state is None and routes is not None and routes.root is self:
+            # Static routes are resolved by the precompiled dispatch table
+            resolved_state = routes.resolve(state)
+
+        if resolved_state is None:
+            resolved_state = state.resolve()
+            if dispatch_cache is not None:
+                dispatch_cache.store(dispatch_cache_key, resolved_state)
+        state = resolved_state
 
         # Save the dispatch state for possible use within the controller methods
         req._fast_setattr('_controller_state', state)
@@ -84,11 +132,21 @@ class CoreDispatcher(object):
         return state
 
     def _enter_controller(self, state, remainder):
+        if isinstance(state, TracingDispatchState):
+            state._record_enter(self, remainder)
+
         if hasattr(state.controller, '_visit'):
             state.controller._visit(*remainder, **state.params)
 
         return super(CoreDispatcher, self)._enter_controller(state, remainder)
 
+    def _dispatch_first_found_default_or_lookup(self, state, remainder):
+        if state._notfound_stack and isinstance(state, TracingDispatchState):
+            state._record_notfound(state._notfound_stack[-1][1])
+
+        return super(CoreDispatcher, self)._dispatch_first_found_default_or_lookup(state,
+                                                                                   remainder)
+
     def _perform_call(self, context):
         """
         This function is called by __call__ to actually perform the controller
@@ -154,32 +212,10 @@ class CoreDispatcher(object):
 
         return py_response
 
-    @cached_property
+    @property
     def mount_point(self):
-        if not self.mount_steps:
-            return ''
-        return '/' + '/'.join((x[0] for x in self.mount_steps[1:]))
+        return _get_mount_index(tg.config).mount_point(self)
 
-    @cached_property
+    @property
     def mount_steps(self):
-        def find_url(root, item, parents):
-            for i in dir(root):
-                if i.startswith('_') or i in ('mount_steps', 'mount_point'):
-                    continue
-
-                controller = getattr(root, i)
-                if controller is item:
-                    return parents + [(i, item)]
-                if hasattr(controller, '_dispatch'):
-                    v = find_url(controller.__class__,
-                        item, parents + [(i, controller)])
-                    if v:
-                        return v
-            return []
-
-        if 'tg.root_controller' in tg.config:
-            root_controller = tg.config['tg.root_controller']
-        else:
-            root_controller = TGApp.lookup_controller(tg.config, 'root')
-
-        return find_url(root_controller, self, [('/', root_controller)])
+        return _get_mount_index(tg.config).mount_steps(self)
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Precompiled dispatch tables for Object Dispatch controller trees.
+
+Object Dispatch resolves each request by walking the controller tree
+one URL segment at a time. The :class:`DispatchTable` walks the static
+part of the tree once, when the application is created, and records
+it in a trie of URL segments so that requests for static routes can
+skip the traversal entirely.
+
+Only controllers dispatched by the standard Object Dispatch are compiled,
+controllers providing their own ``_dispatch`` (like :class:`.RestController`)
+and any URL that doesn't exactly match a compiled route are resolved
+by the usual dispatch process, so ``_lookup`` and ``_default`` keep working
+as they always did.
+
+The :class:`MountIndex` records where each controller of the tree is
+mounted, so that :attr:`.CoreDispatcher.mount_point` doesn't need to
+search the whole tree for the controller.
+
+"""
+import inspect
+
+from crank.objectdispatcher import ObjectDispatcher
+from crank.util import method_matches_args
+
+from tg._compat import default_im_func
+
+_OBJECT_DISPATCH = default_im_func(ObjectDispatcher._dispatch)
+
+
+def _is_object_dispatcher(controller):
+    """Checks if the controller is dispatched through standard Object Dispatch"""
+    dispatch = getattr(controller, '_dispatch', None)
+    return dispatch is not None and default_im_func(dispatch) is _OBJECT_DISPATCH
+
+
+def _static_attribute(obj, name):
+    """Looks up an attribute without triggering descriptors"""
+    if inspect.isclass(obj):
+        mro = inspect.getmro(obj)
+    else:
+        try:
+            return obj.__dict__[name]
+        except (AttributeError, KeyError):
+            pass
+        mro = inspect.getmro(obj.__class__)
+
+    for klass in mro:
+        try:
+            return klass.__dict__[name]
+        except KeyError:
+            pass
+
+    return None
+
+
+def _has_exposed_methods(obj):
+    for klass in inspect.getmro(obj.__class__):
+        for value in klass.__dict__.values():
+            if inspect.isfunction(value) and hasattr(value, 'decoration'):
+                return True
+    return False
+
+
+class _RouteNode(object):
+    __slots__ = ('controller', 'dispatcher', 'children', 'actions')
+
+    def __init__(self, controller, dispatcher):
+        self.controller = controller
+        self.dispatcher = dispatcher
+        self.children = {}
+        self.actions = {}
+
+
+class DispatchTable(object):
+    """Trie of the static routes of a controller tree.
+
+    Each node of the trie is a controller, its children are the
+    sub controllers mounted on it and its actions are the exposed
+    methods, both indexed by the URL segment that leads to them.
+
+    """
+    def __init__(self, root_controller):
+        self.root = root_controller
+        self._root_node = self._compile(root_controller, root_controller, [])
+
+    @classmethod
+    def create(cls, root_controller):
+        """Creates a DispatchTable for ``root_controller``.
+
+        Returns ``None`` when the root controller is not dispatched
+        through Object Dispatch and so cannot be compiled.
+
+        """
+        if not _is_object_dispatcher(root_controller):
+            return None
+        return cls(root_controller)
+
+    def _compile(self, controller, dispatcher, parents):
+        node = _RouteNode(controller, dispatcher)
+        parents = parents + [controller]
+
+        for name in dir(controller):
+            if name.startswith('_'):
+                continue
+
+            value = _static_attribute(controller, name)
+            if value is None:
+                continue
+
+            if inspect.isfunction(value):
+                if dispatcher._is_exposed(controller, name):
+                    node.actions[name] = getattr(controller, name)
+                continue
+
+            if hasattr(value, '__get__') or inspect.isclass(value) or \
+                    inspect.ismodule(value) or inspect.isroutine(value):
+                # Properties and other descriptors are computed at runtime
+                # while classes, modules and functions are not controllers.
+                continue
+
+            if any(value is parent for parent in parents):
+                continue
+
+            if _is_object_dispatcher(value):
+                child = self._compile(value, value, parents)
+            elif getattr(value, '_dispatch', None) is None and _has_exposed_methods(value):
+                # Plain objects are dispatched by the closest dispatcher.
+                child = self._compile(value, dispatcher, parents)
+            else:
+                continue
+
+            if child.children or child.actions:
+                node.children[name] = child
+
+        return node
+
+    def resolve(self, state):
+        """Resolves a :class:`crank.dispatchstate.DispatchState` using the compiled routes.
+
+        Returns the resolved state or ``None`` when the requested path
+        is not a static route and must be resolved by Object Dispatch.
+
+        """
+        path = state.path
+        if '' in path:
+            return None
+
+        params = state.params
+        translate = state.translate_path_piece
+
+        node = self._root_node
+        traversed = []
+        action = None
+        remainder = []
+
+        for position, piece in enumerate(path):
+            piece = translate(piece)
+
+            action = node.actions.get(piece)
+            if action is not None:
+                remainder = path[position+1:]
+                break
+
+            node = node.children.get(piece)
+            if node is None:
+                return None
+            traversed.append((piece, node, position+1))
+        else:
+            action = node.actions.get('index')
+            if action is None:
+                return None
+
+        if not method_matches_args(action, params, remainder,
+                                   node.dispatcher._use_lax_params):
+            return None
+
+        # Perform the same controller visiting steps that Object Dispatch would.
+        root_node = self._root_node
+        root_node.dispatcher._enter_controller(state, path)
+        for location, child, position in traversed:
+            state.add_controller(location, child.controller)
+            child.dispatcher._enter_controller(state, path[position:])
+
+        state.set_action(action, remainder)
+        return state
+
+
+class MountIndex(object):
+    """Index of the mount points of the controllers in a controllers tree.
+
+    Controllers are indexed by identity, for each one the steps
+    (as ``(location, controller)`` tuples starting from the root controller)
+    and the mount point are recorded. When a controller is reachable from
+    multiple paths the first one in traversal order is used.
+
+    """
+    def __init__(self, root_controller):
+        self.root = root_controller
+        self._steps = {}
+        self._mount_points = {}
+        self._controllers = {}
+        self._index(root_controller, [('/', root_controller)])
+
+    def _index(self, controller, parents):
+        for name in dir(controller):
+            if name.startswith('_'):
+                continue
+
+            value = _static_attribute(controller, name)
+            if value is None or inspect.isclass(value) or \
+                    not hasattr(value, '_dispatch') or value is self.root:
+                continue
+
+            if id(value) in self._steps:
+                # Already mounted somewhere else, which comes first.
+                continue
+
+            steps = parents + [(name, value)]
+            mount_point = '/' + '/'.join(step[0] for step in steps[1:])
+
+            self._steps[id(value)] = (value, tuple(steps))
+            self._mount_points[id(value)] = mount_point
+            self._controllers.setdefault(mount_point, value)
+
+            self._index(value.__class__, steps)
+
+    def controllers(self):
+        """All the controllers of the tree, the root one first."""
+        return [self.root] + [indexed for indexed, steps in self._steps.values()]
+
+    def mount_steps(self, controller):
+        """Steps that lead from the root controller to ``controller``.
+
+        Returns an empty list for the root controller and for
+        controllers that are not part of the tree.
+        """
+        try:
+            indexed, steps = self._steps[id(controller)]
+        except KeyError:
+            return []
+
+        if indexed is not controller:
+            return []
+        return list(steps)
+
+    def mount_point(self, controller):
+        """Path where ``controller`` is mounted, empty for the root and unknown controllers."""
+        if self.mount_steps(controller):
+            return self._mount_points[id(controller)]
+        return ''
+
+    def controller_at(self, mount_point):
+        """Controller mounted at ``mount_point``, ``None`` if there is none."""
+        if mount_point in ('', '/'):
+            return self.root
+        return self._controllers.get('/' + mount_point.strip('/'))
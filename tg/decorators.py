@@ -14,6 +14,7 @@ import time
 from functools import partial
 from .exceptions import HTTPUnauthorized, HTTPMethodNotAllowed, HTTPMovedPermanently
 from tg.support import NoDefault
+from tg.support.converters import asbool
 from tg.support.paginate import Page
 from tg.configuration import config
 from tg.configuration.app_config import _DeprecatedControllerWrapper, call_controller
@@ -22,10 +23,15 @@ from tg import tmpl_context, request, response
 from tg.util import Bunch
 from tg.configuration.sqla.balanced_session import force_request_engine
 from tg.flash import flash
+from tg.i18n import get_lang
 from tg.caching import beaker_cache, cached_property, _cached_call, create_cache_key
+from tg.caching import _format_tags, _tagged_cache_key, _check_tags_placeholders, \
+    _hash_cache_key, _key_max_length
+from tg.caching import cache_metrics
 from tg.predicates import NotAuthorizedError
 from tg._compat import default_im_func, unicode_text
 from webob.acceptparse import Accept
+from crank.util import get_params_with_argspec
 from .validation import _ValidationIntent
 from tg.configuration import milestones
 import tg
@@ -44,12 +50,54 @@ def _decorated_controller_caller(tg_config, controller, remainder, params):
     return application_controller_caller(tg_config, controller, remainder, params)
 
 
+# Number of different Accept headers memorized by each Decoration
+_ACCEPT_CACHE_SIZE = 64
+
+
+class _DecorationPipeline(object):
+    """Precomputed request pipeline of an exposed action.
+
+    Collects the hooks registered for the action together with the
+    application wide ones, so that stages without any handler, validator
+    or controller wrapper can be skipped when calling the action.
+    """
+    __slots__ = ('hooks_namespace', 'generation', 'before_validate', 'before_call',
+                 'before_render', 'after_render', 'validations', 'controller_caller')
+
+    def __init__(self, decoration, hooks_namespace):
+        self.hooks_namespace = hooks_namespace
+        self.generation = hooks_namespace._generation
+
+        for hook_name in ('before_validate', 'before_call', 'before_render', 'after_render'):
+            setattr(self, hook_name, hooks_namespace._get_handlers(hook_name,
+                                                                   decoration.controller))
+
+        self.validations = bool(decoration.validations)
+
+        # When no controller wrapper was registered on the action
+        # the application controller caller can be used directly.
+        if decoration.controller_caller is _decorated_controller_caller:
+            self.controller_caller = None
+        else:
+            self.controller_caller = decoration.controller_caller
+
+    def is_current(self, hooks_namespace):
+        return (self.hooks_namespace is hooks_namespace and
+                self.generation == hooks_namespace._generation)
+
+
 class Decoration(object):
     """ Simple class to support 'simple registration' type decorators
     """
+    # Increased whenever the hooks of a decoration change,
+    # to invalidate the handlers cached by hooks namespaces.
+    _hooks_generation = 0
+
     def __init__(self, controller):
         self.controller = controller
         self.controller_caller = _decorated_controller_caller
+        self._pipeline = None
+        self._accept_cache = {}
         self._expositions = []
         self.engines = {}
         self.engines_keys = []
@@ -59,6 +107,7 @@ class Decoration(object):
         self.validations = []
         self.inherit = False
         self.requirements = []
+        self.response_cache = None
         self.hooks = dict(before_validate=[],
                           before_call=[],
                           before_render=[],
@@ -75,6 +124,36 @@ class Decoration(object):
             dec = func.decoration = cls(func)
         return dec
 
+    def exposed_templates(self):
+        """Returns the templates exposed by the decorated action.
+
+        Provides a list of ``(engine, template, render_params)`` tuples
+        for each template registered through ``@expose``, including
+        custom formats. Engines that don't use a template are omitted.
+        """
+        if milestones.renderers_ready.reached:
+            self._resolve_expositions()
+
+        templates = []
+        for engine, template, exclude_names, render_params in self.engines.values():
+            if engine and template:
+                templates.append((engine, template, render_params))
+        for __, engine, template, exclude_names, render_params in self.custom_engines.values():
+            if engine and template:
+                templates.append((engine, template, render_params))
+        return templates
+
+    def get_pipeline(self, hooks_namespace):
+        """Returns the :class:`_DecorationPipeline` of the decorated action.
+
+        The pipeline is compiled on first use and compiled again whenever
+        hooks, validators or controller wrappers are registered.
+        """
+        pipeline = self._pipeline
+        if pipeline is None or not pipeline.is_current(hooks_namespace):
+            pipeline = self._pipeline = _DecorationPipeline(self, hooks_namespace)
+        return pipeline
+
     def _register_exposition(self, exposition, inherit=False, before=False):
         """Register an exposition for later application"""
 
@@ -127,6 +206,7 @@ class Decoration(object):
         # This merges already registered template engines
         self.engines = dict(tuple(deco.engines.items()) + tuple(self.engines.items()))
         self.engines_keys = sorted(self.engines, reverse=True)
+        self._accept_cache = {}
         self.custom_engines = dict(tuple(deco.custom_engines.items()) + tuple(self.custom_engines.items()))
 
         # This merges yet to register template engines
@@ -137,9 +217,14 @@ class Decoration(object):
         # parent hooks before current hooks so that they get called before
         for hook_name, hooks in deco.hooks.items():
             self.hooks[hook_name] = hooks + self.hooks[hook_name]
+        Decoration._hooks_generation += 1
 
         # Inherit al validators registered on parent.
         self.validations = deco.validations + self.validations
+        self._pipeline = None
+
+        if self.response_cache is None:
+            self.response_cache = deco.response_cache
 
     def run_hooks(self, tgl, hook, *l, **kw):
         warnings.warn("Decoration.run_hooks is deprecated, "
@@ -209,6 +294,7 @@ class Decoration(object):
         # precedent to text/html, and so sorting engine keys alphabetically reversed
         # should make text/html the first choice when no other better choices are available.
         self.engines_keys = sorted(self.engines, reverse=True)
+        self._accept_cache = {}
 
     def register_custom_template_engine(self, custom_format,
             content_type, engine, template, exclude_names, render_params):
@@ -268,7 +354,7 @@ class Decoration(object):
                     accept_types = request._response_type
                 else:
                     accept_types = request.headers.get('accept', '*/*')
-                content_type = Accept(accept_types).best_match(self.engines_keys, self.engines_keys[0])
+                content_type = self._negotiate_content_type(accept_types)
             else:
                 content_type = 'text/html'
 
@@ -282,6 +368,24 @@ class Decoration(object):
 
         return content_type, engine, template, exclude_names, render_params
 
+    def _negotiate_content_type(self, accept_types):
+        """Picks the registered content type that best matches ``accept_types``.
+
+        Results are memorized as the same few Accept headers are
+        usually received over and over.
+        """
+        accept_cache = self._accept_cache
+        try:
+            return accept_cache[accept_types]
+        except KeyError:
+            pass
+
+        content_type = Accept(accept_types).best_match(self.engines_keys, self.engines_keys[0])
+        if len(accept_cache) >= _ACCEPT_CACHE_SIZE:
+            accept_cache.clear()
+        accept_cache[accept_types] = content_type
+        return content_type
+
     def _register_hook(self, hook_name, func):
         """Registers the specified function as a hook.
 
@@ -295,6 +399,8 @@ class Decoration(object):
         cycle.)
         """
         self.hooks.setdefault(hook_name, []).append(func)
+        self._pipeline = None
+        Decoration._hooks_generation += 1
 
     def _register_requirement(self, requirement):
         self._register_hook('before_call', requirement._check_authorization)
@@ -306,9 +412,11 @@ class Decoration(object):
         except TypeError:
             self.controller_caller = _DeprecatedControllerWrapper(wrapper, tg.config,
                                                                   self.controller_caller)
+        self._pipeline = None
 
     def _register_validation(self, validation):
         self.validations.insert(0, validation)
+        self._pipeline = None
 
 
 class _hook_decorator(object):
@@ -401,6 +509,17 @@ class expose(object):
 
         render_params={'method': 'xml', 'doctype': None}
 
+    Rendering engines that support it (Genshi, Jinja and Kajiki) send
+    the page while it is being rendered when ``stream`` is provided::
+
+        @expose('kajiki:myproject.templates.report', render_params={'stream': True})
+
+    As request locals must be available while the page is sent,
+    ``stream`` is ignored when ``registry_streaming`` is disabled.
+    Errors raised while a streamed page is rendered happen after the
+    ``200 OK`` status and the headers have been sent, so no error page
+    can be served: the error is logged and the response is truncated.
+
     Expose decorator can be stacked like this::
 
         @expose('json', exclude_names='d')
@@ -980,21 +1099,33 @@ class cached(object):
         .. note::
             When cache_response is set to False, the cache_headers
             argument is ignored as none of the response is cached.
+    ``stale_grace``
+        Seconds for which an expired value is still served while
+        a single request creates the new one. Defaults to the
+        ``cache.stale_grace`` option, when not set concurrent requests
+        wait for the new value.
+    ``tags``
+        List of tags attached to the cached value, see :func:`tg.caching.invalidate_tags`.
+        ``{name}`` placeholders are replaced with the controller parameters.
     """
     def __init__(self, key=NoDefault, expire="never", type=None,
                  query_args=None,  # Backward compatibility, actually ignored
                  cache_headers=('content-type', 'content-length'),
                  invalidate_on_startup=False, cache_response=True,
-                 **b_kwargs):
+                 stale_grace=None, tags=None, **b_kwargs):
         self.key = key
         self.expire = expire
         self.type = type
         self.cache_headers = cache_headers
         self.invalidate_on_startup = invalidate_on_startup
         self.cache_response = cache_response
+        self.stale_grace = stale_grace
+        self.tags = tags
         self.beaker_options = b_kwargs
 
     def __call__(self, func):
+        if self.tags:
+            _check_tags_placeholders(self.tags, func)
         decoration = Decoration.get_decoration(func)
 
         def controller_wrapper(__, next_caller):
@@ -1009,13 +1140,19 @@ class cached(object):
                     key_dict = req.args_params
                     if self.key != NoDefault:
                         if isinstance(self.key, (list, tuple)):
-                            key_dict = dict((k, key_dict[k]) for k in key_dict)
+                            key_dict = dict((k, key_dict[k]) for k in self.key)
                         else:
                             key_dict = {self.key: key_dict[self.key]}
                 else:
                     key_dict = {}
 
-                namespace, cache_key = create_cache_key(func, key_dict, req.controller_state.controller)
+                namespace, cache_key = create_cache_key(func, key_dict,
+                                                        req.controller_state.controller,
+                                                        _key_max_length(tg.config))
+                if self.tags:
+                    tags = _format_tags(self.tags, req.args_params)
+                else:
+                    tags = None
                 req._fast_setattr('caching', Bunch(namespace=namespace,
                                                    key=cache_key))
 
@@ -1024,9 +1161,198 @@ class cached(object):
                                     expire=self.expire, type=self.type,
                                     starttime=starttime, cache_headers=self.cache_headers,
                                     cache_response=self.cache_response,
-                                    cache_extra_args=self.beaker_options)
+                                    cache_extra_args=self.beaker_options,
+                                    stale_grace=self.stale_grace,
+                                    tags=tags)
 
             return cached_call_controller
 
         decoration._register_controller_wrapper(controller_wrapper)
         return func
+
+
+class cached_response(object):
+    """Decorator to cache the whole response of the controller.
+
+    While :class:`cached` only caches the value returned by the controller,
+    this caches the rendered response body together with its status and
+    the headers listed in ``cache_headers``. When the response is found
+    in cache the validation, the hooks, the controller and the template
+    rendering are all skipped, only the requirements registered through
+    :class:`require` are checked.
+
+    The namespace and cache key used to cache the response are available
+    as ``request.caching.namespace`` and ``request.caching.key``.
+    Only ``200 OK`` responses that passed validation are cached.
+
+    The following parameters are accepted:
+
+    ``key`` - Specifies the controller parameters used to generate the cache key.
+        NoDefault - Uses all the parameters and the url remainder as the key (default)
+
+        None - No variable key, uses only function name as key
+
+        string - Use function name and only "key" parameter
+
+        list - Use function name and all parameters listed
+    ``vary``
+        Tuple of the request properties the response depends on.
+        ``'content_type'`` is the content type that will be used to
+        render the response, ``'lang'`` the languages returned by
+        :func:`tg.i18n.get_lang` and ``'identity'`` the user currently
+        logged in. Callables are also accepted, they will receive the
+        request context and must return the value to use in the key.
+        Defaults to all of ``content_type``, ``lang`` and ``identity``.
+    ``expire``
+        Time in seconds before cache expires, or the string "never".
+        Defaults to "never"
+    ``type``
+        Type of cache to use: dbm, memory, file, memcached, or None for
+        Beaker's default
+    ``cache_headers``
+        A tuple of header names indicating response headers that
+        will also be cached.
+    ``invalidate_on_startup``
+        If True, the cache will be invalidated each time the application
+        starts or is restarted.
+    ``tags``
+        List of tags attached to the cached response, see :func:`tg.caching.invalidate_tags`.
+        ``{name}`` placeholders are replaced with the controller parameters.
+    """
+    VARY_PROPERTIES = ('content_type', 'lang', 'identity')
+
+    def __init__(self, key=NoDefault, vary=VARY_PROPERTIES, expire="never", type=None,
+                 cache_headers=('content-type', 'content-length'),
+                 invalidate_on_startup=False, tags=None, **b_kwargs):
+        for vary_by in vary:
+            if not callable(vary_by) and vary_by not in self.VARY_PROPERTIES:
+                raise ValueError("'%s' is not a valid vary property" % (vary_by, ))
+
+        self.key = key
+        self.vary = tuple(vary)
+        self.expire = expire
+        self.type = type
+        self.cache_headers = set(h.lower() for h in cache_headers)
+        self.tags = tags
+        self.beaker_options = b_kwargs
+
+        if invalidate_on_startup:
+            self.starttime = time.time()
+        else:
+            self.starttime = None
+
+    def __call__(self, func):
+        if self.tags:
+            _check_tags_placeholders(self.tags, func)
+        decoration = Decoration.get_decoration(func)
+        decoration.response_cache = self
+        return func
+
+    def _vary_value(self, vary_by, decoration, context):
+        if vary_by == 'content_type':
+            return decoration.lookup_template_engine(context)[0]
+        elif vary_by == 'lang':
+            return get_lang(all=False)
+        elif vary_by == 'identity':
+            identity = context.request.environ.get('repoze.who.identity')
+            return identity and identity.get('repoze.who.userid')
+        return vary_by(context)
+
+    def _create_cache_key(self, action, params, remainder, context):
+        if self.key:
+            key_dict = params
+            if self.key is not NoDefault:
+                if isinstance(self.key, (list, tuple)):
+                    key_dict = dict((k, params.get(k)) for k in self.key)
+                else:
+                    key_dict = {self.key: params.get(self.key)}
+        else:
+            key_dict = {}
+
+        namespace, cache_key = create_cache_key(action)
+
+        key_parts = [cache_key]
+        if self.key is NoDefault and remainder:
+            key_parts.append('/'.join(remainder))
+        key_parts.extend('%s=%s' % (k, key_dict[k]) for k in sorted(key_dict))
+
+        decoration = action.decoration
+        for vary_by in self.vary:
+            vary_name = getattr(vary_by, '__name__', vary_by)
+            key_parts.append('%s:%s' % (vary_name, self._vary_value(vary_by, decoration,
+                                                                     context)))
+
+        cache_key = ' '.join(key_parts)
+        key_max_length = _key_max_length(context.config)
+        if key_max_length and len(cache_key) > key_max_length:
+            cache_key = _hash_cache_key(key_parts[0], cache_key)
+        return namespace, cache_key
+
+    def _cached_call(self, call, action, params, remainder, context):
+        """Calls the action through ``call`` or serves its response from cache."""
+        if not asbool(context.config.get('cache.enabled', True)):
+            return call(action, params, remainder, context)
+
+        cache_obj = getattr(context, 'cache', None)
+        if not cache_obj:  # pragma: no cover
+            raise Exception('TurboGears Cache object not found, ensure cache.enabled=True')
+
+        req = context.request
+        namespace, cache_key = self._create_cache_key(action, params, remainder, context)
+        if self.tags:
+            tag_params = get_params_with_argspec(action, params, remainder)
+            cache_key = _tagged_cache_key(cache_obj, _format_tags(self.tags, tag_params),
+                                          cache_key)
+        req._fast_setattr('caching', Bunch(namespace=namespace, key=cache_key))
+
+        cache_extra_args = dict(self.beaker_options)
+        if self.type:
+            cache_extra_args['type'] = self.type
+        my_cache = cache_obj.get_cache(namespace, **cache_extra_args)
+
+        if self.expire == "never":
+            expiretime = None
+        else:
+            expiretime = self.expire
+
+        metrics = cache_metrics.namespace(namespace)
+        metrics.lookups += 1
+
+        start = time.time()
+        try:
+            return self._lookup_response(my_cache, cache_key, expiretime,
+                                         metrics.measure(partial(call, action, params,
+                                                                 remainder, context)),
+                                         action, params, remainder, context)
+        finally:
+            metrics.lookup_time += time.time() - start
+
+    def _lookup_response(self, cache, cache_key, expiretime, createfunc,
+                         action, params, remainder, context):
+        """Serves the response from ``cache``, creating it with ``createfunc`` when missing."""
+        req = context.request
+        resp = context.response
+        try:
+            cached_response = cache.get(cache_key, expiretime=expiretime,
+                                        starttime=self.starttime)
+        except KeyError:
+            pass
+        else:
+            for requirement in action.decoration.requirements:
+                requirement._check_authorization(remainder, params)
+
+            resp.status = cached_response['status']
+            for name, value in cached_response['headers']:
+                resp.headers[name] = value
+            return cached_response['content']
+
+        content = createfunc()
+
+        if resp.status_int == 200 and not req.validation.errors and \
+                isinstance(content, (bytes, unicode_text)):
+            headers = [header for header in resp.headerlist
+                       if header[0].lower() in self.cache_headers]
+            cache.put(cache_key, dict(status=resp.status, headers=headers, content=content),
+                      expiretime=expiretime, starttime=self.starttime)
+
+        return content
@@ -3,6 +3,7 @@ import logging, os
 import gettext as _gettext
 from gettext import NullTranslations, GNUTranslations
 import warnings
+from repoze.lru import LRUCache
 import tg
 from tg.util import lazify
 from tg._compat import PY3, string_type
@@ -146,6 +147,57 @@ def _translator_from_mofiles(domain, mofiles, class_=None, fallback=False):
     return result
 
 
+_CATALOGS_INDEX = {}
+def _catalogs_index(domain, localedir):
+    """Index of the catalogs available for ``domain`` in ``localedir``.
+
+    Maps each language directory to the path of its ``.mo`` file, the
+    directory is scanned only the first time, so catalogs added
+    afterwards won't be detected until the process is restarted.
+    """
+    key = (domain, localedir)
+    index = _CATALOGS_INDEX.get(key)
+    if index is None:
+        index = {}
+        directory = localedir or _gettext._default_localedir
+        try:
+            entries = os.listdir(directory)
+        except OSError:
+            entries = []
+
+        for entry in entries:
+            mofile = os.path.join(directory, entry, 'LC_MESSAGES', '%s.mo' % domain)
+            if os.path.exists(mofile):
+                index[entry] = mofile
+        index = _CATALOGS_INDEX.setdefault(key, index)
+    return index
+
+
+def _find_catalog(domain, localedir, lang):
+    """Same as ``gettext.find`` for a single language, using the catalogs index."""
+    catalogs = _catalogs_index(domain, localedir)
+    for candidate in _gettext._expand_lang(lang):
+        if candidate == 'C':
+            break
+
+        mofile = catalogs.get(candidate)
+        if mofile is not None:
+            return mofile
+    return None
+
+
+def _copy_translator(translator):
+    # Translators are modified when fallbacks are added, so each one
+    # in the chain is copied to avoid affecting the cached chain.
+    result = translator = copy.copy(translator)
+    while translator._fallback is not None:
+        translator._fallback = copy.copy(translator._fallback)
+        translator = translator._fallback
+    return result
+
+
+_TRANSLATORS_CHAINS_CACHE_SIZE = 256
+_TRANSLATORS_CHAINS = LRUCache(_TRANSLATORS_CHAINS_CACHE_SIZE)
 def _get_translator(lang, tgl=None, tg_config=None, **kwargs):
     """Utility method to get a valid translator object from a language name"""
     if tg_config:
@@ -170,21 +222,31 @@ def _get_translator(lang, tgl=None, tg_config=None, **kwargs):
     if not isinstance(lang, list):
         lang = [lang]
 
-    mofiles = []
-    supported_languages = []
-    for l in lang:
-        mo = _gettext.find(app_domain, localedir=localedir, languages=[l], all=False)
-        if mo is not None:
-            mofiles.append(mo)
-            supported_languages.append(l)
+    # Translators chains are cached for each combination of languages,
+    # so that catalogs don't have to be looked up on every request.
+    cache_key = (app_domain, localedir, tuple(lang),
+                 kwargs.get('class_'), kwargs.get('fallback', False))
+    cached = _TRANSLATORS_CHAINS.get(cache_key)
+    if cached is None:
+        mofiles = []
+        supported_languages = []
+        for l in lang:
+            mo = _find_catalog(app_domain, localedir, l)
+            if mo is not None:
+                mofiles.append(mo)
+                supported_languages.append(l)
 
-    try:
-        translator = _translator_from_mofiles(app_domain, mofiles, **kwargs)
-    except IOError as ioe:
-        raise LanguageError('IOError: %s' % ioe)
+        try:
+            cached = _translator_from_mofiles(app_domain, mofiles, **kwargs)
+        except IOError as ioe:
+            raise LanguageError('IOError: %s' % ioe)
+
+        cached.tg_supported_lang = supported_languages
+        _TRANSLATORS_CHAINS.put(cache_key, cached)
 
+    translator = _copy_translator(cached)
     translator.tg_lang = lang
-    translator.tg_supported_lang = supported_languages
+    translator.tg_supported_lang = list(cached.tg_supported_lang)
 
     return translator
 
@@ -253,29 +315,58 @@ def set_request_lang(languages, tgl=None):
     languages should be a string or a list of strings.
     First lang will be used as main lang, others as fallbacks.
 
+    The translator for the languages is only created when
+    something gets translated in the request.
+
     """
-    # the logging to the screen was removed because
-    # the printing to the screen for every problem causes serious slow down.
     if not tgl:
         tgl = tg.request_local.context._current_obj()
 
+    tgl._translator_lang = languages
+    tgl._translator = None
+
+
+def _set_request_lang_resolver(resolver, tgl):
+    """Set a function detecting the current request language(s).
+
+    ``resolver`` is called with the request context the first time
+    something gets translated in the request and must return the
+    languages as :func:`set_request_lang` expects them.
+
+    """
+    tgl._translator_lang = resolver
+    tgl._translator = None
+
+
+def _get_request_translator(tgl):
+    """Create the translator for the languages set through :func:`set_request_lang`."""
+    languages = tgl._translator_lang
+    if callable(languages):
+        languages = tgl._translator_lang = languages(tgl)
+
+    if languages is None:
+        # No languages set for the request, use the application language.
+        return _get_translator(tgl.request._language, tgl=tgl)
+
     # Should only raise exceptions in case of IO errors,
     # so we let them propagate to the developer.
-    tgl.translator = _get_translator(languages, tgl=tgl, fallback=True)
+    translator = _get_translator(languages, tgl=tgl, fallback=True)
 
     # If the application has a set of supported translation
     # limit the formencode translations to those so that
     # we don't get the application in a language and
     # the errors in another one
-    supported_languages = get_lang(all=False)
+    supported_languages = getattr(translator, 'tg_supported_lang', [])
     if supported_languages:
         languages = supported_languages
 
     try:
-        set_formencode_translation(languages, tgl=tgl)
+        translator._formencode_translation = _get_formencode_translation(languages)
     except LanguageError:
         pass
 
+    return translator
+
 
 def set_temporary_lang(*args, **kwargs):
     warnings.warn("i18n.set_temporary_lang has been deprecated in favor of"
@@ -302,12 +393,12 @@ def set_lang(languages, **kwargs):
 FormEncodeMissing = '_MISSING_FORMENCODE'
 formencode = None
 _localdir = None
+_FORMENCODE_TRANSLATIONS = LRUCache(_TRANSLATORS_CHAINS_CACHE_SIZE)
 
-def set_formencode_translation(languages, tgl=None):
-    """Set request specific translation of FormEncode."""
+def _get_formencode_translation(languages):
     global formencode, _localdir
     if formencode is FormEncodeMissing:  # pragma: no cover
-        return
+        return None
 
     if formencode is None:
         try:
@@ -315,17 +406,33 @@ def set_formencode_translation(languages, tgl=None):
             _localdir = formencode.api.get_localedir()
         except ImportError:  # pragma: no cover
             formencode = FormEncodeMissing
-            return
+            return None
+
+    # Translations are cached for each combination of languages, the error
+    # message is cached when there is none so that it isn't looked up again.
+    key = tuple(languages)
+    translation = _FORMENCODE_TRANSLATIONS.get(key)
+    if translation is None:
+        try:
+            translation = _gettext.translation('FormEncode', languages=languages,
+                                               localedir=_localdir)
+        except IOError as error:
+            translation = 'IOError: %s' % error
+        _FORMENCODE_TRANSLATIONS.put(key, translation)
+
+    if isinstance(translation, string_type):
+        raise LanguageError(translation)
+    return translation
+
+
+def set_formencode_translation(languages, tgl=None):
+    """Set request specific translation of FormEncode."""
+    formencode_translation = _get_formencode_translation(languages)
+    if formencode_translation is None:  # pragma: no cover
+        return
 
     if not tgl:  # pragma: no cover
         tgl = tg.request_local.context._current_obj()
-
-    try:
-        formencode_translation = _gettext.translation('FormEncode',
-                                                      languages=languages,
-                                                      localedir=_localdir)
-    except IOError as error:
-        raise LanguageError('IOError: %s' % error)
     tgl.translator._formencode_translation = formencode_translation
 
 
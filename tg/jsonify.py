@@ -2,16 +2,26 @@
 
 import datetime
 import decimal
+import inspect
+import numbers
+import sys
 import types
 
 from json import JSONEncoder as _JSONEncoder
 from tg.support.converters import asbool
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 from webob.multidict import MultiDict
-from tg._compat import string_type
+from tg._compat import string_type, reraise
 from tg.configuration.utils import GlobalConfigurable
-from tg.util.sqlalchemy import dictify as dictify_sqla, is_saobject, is_query_result, is_query_row
-from tg.util.ming import dictify as dictify_ming, is_mingobject, is_objectid
+from tg.util.sqlalchemy import dictify as dictify_sqla, dictify_all, is_saobject, is_query
+from tg.util.sqlalchemy import Query as SAQuery, ResultProxy as SAResultProxy, RowProxy as SARowProxy
+from tg.util.ming import dictify as dictify_ming, is_mingobject, ObjectId
+from tg.util.ming import dictify_cursor as dictify_ming_cursor, is_odm_cursor, ODMCursor
 
 import logging
 log = logging.getLogger(__name__)
@@ -37,6 +47,10 @@ class JSONEncoder(_JSONEncoder, GlobalConfigurable):
     the ability to register custom encoder for specific types using
     :meth:`.JSONEncoder.register_custom_encoder`.
 
+    Encoding can be performed by the ``orjson`` library instead of the
+    standard library ``json`` module, see the ``backend`` option
+    of :meth:`.JSONEncoder.configure`.
+
     """
     CONFIG_NAMESPACE = 'json.'
     CONFIG_OPTIONS = {'isodates': asbool,
@@ -45,11 +59,16 @@ class JSONEncoder(_JSONEncoder, GlobalConfigurable):
     def __init__(self, **kwargs):
         self._registered_types_map = {}
         self._registered_types_list = tuple()
+        self._type_encoders = {}
+        self._backend_encode = None
 
         kwargs = self.configure(**kwargs)
         super(JSONEncoder, self).__init__(**kwargs)
+        self._json_format = (self.item_separator, self.key_separator, self.ensure_ascii)
+        self._setup_backend()
 
-    def configure(self, isodates=False, custom_encoders=None, allow_lists=False, **kwargs):
+    def configure(self, isodates=False, custom_encoders=None, allow_lists=False,
+                  backend='json', **kwargs):
         """JSON encoder can be configured through :class:`.AppConfig` (``app_cfg.base_config``)
         using the following options:
 
@@ -59,15 +78,102 @@ class JSONEncoder(_JSONEncoder, GlobalConfigurable):
         - ``json.allow_lists`` -> Allows lists to be encoded, this is usually disabled for
           security reasons due to JSON hijacking. See http://stackoverflow.com/questions/16289894
           for additional details.
+        - ``json.backend`` -> Library used to encode JSON: ``json`` (the default) uses the
+          standard library, ``orjson`` uses the orjson library and ``auto`` uses orjson
+          when it is installed. The standard library is used when orjson is not available
+          or for options it doesn't support (``skipkeys`` and ``indent`` other than ``2``).
+
+        Output encoded by ``orjson`` is the same the standard library produces with
+        ``separators=(',', ':')`` and ``ensure_ascii=False``, so those are enforced when
+        it's enabled. Objects not natively supported are still encoded through
+        :meth:`.JSONEncoder.default`, apart from UUIDs and Enums which orjson
+        encodes natively. Floats in exponential notation (``1e16`` instead
+        of ``1e+16``) and ``NaN`` (encoded as ``null``) also differ.
 
         """
+        if backend not in ('json', 'orjson', 'auto'):
+            raise ValueError('Unsupported JSON backend: %s' % backend)
+
         self._isodates = isodates
         self._allow_lists = allow_lists
+        self._backend = backend
         if custom_encoders is not None:
             for type_, encoder in custom_encoders.items():
                 self.register_custom_encoder(type_, encoder)
+
+        if hasattr(self, '_json_format'):
+            # Reconfigured after being initialized, when options are loaded from configuration.
+            self._setup_backend()
         return kwargs
 
+    def _setup_backend(self):
+        self.item_separator, self.key_separator, self.ensure_ascii = self._json_format
+        self._backend_encode = None
+
+        if self._backend == 'json':
+            return
+
+        if orjson is None:
+            if self._backend == 'orjson':
+                log.warning('orjson JSON backend is not available, using json')
+            return
+
+        if self.skipkeys or self.indent not in (None, 2):
+            log.debug('JSON encoder options not supported by orjson, using json')
+            return
+
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        option |= getattr(orjson, 'OPT_PASSTHROUGH_DATACLASS', 0)
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+
+        if self.indent is None:
+            self.item_separator, self.key_separator = ',', ':'
+        else:
+            option |= orjson.OPT_INDENT_2
+            self.item_separator, self.key_separator = ',', ': '
+        self.ensure_ascii = False
+
+        self._backend_option = option
+        self._backend_encode = self._orjson_encode
+
+    def encode(self, o):
+        if self._backend_encode is not None:
+            return self._backend_encode(o)
+        return super(JSONEncoder, self).encode(o)
+
+    def iterencode(self, o, _one_shot=False):
+        if self._backend_encode is not None:
+            return iter((self._backend_encode(o), ))
+        return super(JSONEncoder, self).iterencode(o, _one_shot)
+
+    def _orjson_encode(self, o):
+        errors = []
+        consumed = []
+
+        def default(obj):
+            try:
+                if isinstance(obj, _LAZY_TYPES):
+                    consumed.append(obj)
+                return self.default(obj)
+            except Exception:
+                errors.append(sys.exc_info())
+                raise
+
+        try:
+            return orjson.dumps(o, default=default, option=self._backend_option).decode('utf-8')
+        except orjson.JSONEncodeError:
+            if errors:
+                # orjson doesn't preserve errors raised by default.
+                reraise(*errors[0])
+            elif consumed:
+                # Encoding again would miss the values already consumed.
+                raise
+
+        # Values that orjson can't encode, like integers bigger than 64bits,
+        # the standard library uses the same format.
+        return ''.join(_JSONEncoder.iterencode(self, o, _one_shot=True))
+
     def register_custom_encoder(self, objtype, encoder):
         """Register a custom encoder for the given type.
 
@@ -82,45 +188,135 @@ class JSONEncoder(_JSONEncoder, GlobalConfigurable):
         self._registered_types_map[objtype] = encoder
         # Append to head, so we find first the last registered types
         self._registered_types_list = (objtype, ) + self._registered_types_list
+        # Encoders resolved for already seen types might have changed.
+        self._type_encoders = {}
 
     def default(self, obj):
-        if isinstance(obj, self._registered_types_list):
-            # Minor optimization, enter loop only when we are instance of a supported type.
-            for type_, encoder in self._registered_types_map.items():
-                if isinstance(obj, type_):
-                    return encoder(obj)
-        elif hasattr(obj, '__json__') and callable(obj.__json__):
+        return self._type_encoder(obj.__class__)(obj)
+
+    def _type_encoder(self, objtype):
+        try:
+            return self._type_encoders[objtype]
+        except KeyError:
+            encoder = self._type_encoders[objtype] = self._resolve_encoder(objtype)
+            return encoder
+
+    def _resolve_encoder(self, objtype):
+        """Looks up the function that encodes instances of ``objtype``.
+
+        The result is cached by :meth:`default` for each type, so that the
+        checks are performed only the first time a type is encountered.
+        """
+        if issubclass(objtype, (tuple, list)):
+            # Subclasses encoded natively by json, but not by orjson.
+            return self._encode_sequence
+        elif issubclass(objtype, float):
+            return float
+
+        mro = inspect.getmro(objtype)
+        for type_ in mro:
+            # Most specific registered type wins.
+            if type_ in self._registered_types_map:
+                return self._registered_types_map[type_]
+
+        for type_ in self._registered_types_list:
+            # Registered types not in the MRO, like abstract base classes.
+            if issubclass(objtype, type_):
+                return self._registered_types_map[type_]
+
+        if callable(getattr(objtype, '__json__', None)):
+            return _encode_json
+        elif issubclass(objtype, (datetime.date, datetime.time)):
+            return self._encode_date
+        elif issubclass(objtype, decimal.Decimal):
+            return float
+        elif is_saobject(objtype):
+            return dictify_sqla
+        elif SAResultProxy is not None and issubclass(objtype, SAResultProxy):
+            return _encode_query_result
+        elif SARowProxy is not None and issubclass(objtype, SARowProxy):
+            return _encode_query_row
+        elif ObjectId is not None and issubclass(objtype, ObjectId):
+            return str
+        elif issubclass(objtype, MultiDict):
+            return _encode_multidict
+        elif issubclass(objtype, types.GeneratorType):
+            return self._encode_sequence
+        elif SAQuery is not None and issubclass(objtype, SAQuery):
+            return self._encode_sequence
+        elif ODMCursor is not None and issubclass(objtype, ODMCursor):
+            return _encode_odm_cursor
+        else:
+            # Ming objects and ``__json__`` provided by the instance itself
+            # can only be detected looking at the object.
+            return self._encode_instance
+
+    def _encode_date(self, obj):
+        if self._isodates:
+            if isinstance(obj, (datetime.datetime, datetime.time)):
+                obj = obj.replace(microsecond=0)
+            return obj.isoformat()
+        else:
+            return str(obj)
+
+    def _encode_sequence(self, objs):
+        objs = list(objs)
+        if objs:
+            # Lists of SQLAlchemy instances of the same class are converted at once.
+            objtype = objs[0].__class__
+            if self._type_encoder(objtype) is dictify_sqla:
+                for obj in objs:
+                    if obj.__class__ is not objtype:
+                        break
+                else:
+                    return dictify_all(objs)
+        return objs
+
+    def _encode_instance(self, obj):
+        if hasattr(obj, '__json__') and callable(obj.__json__):
             return obj.__json__()
-        elif isinstance(obj, (datetime.date, datetime.datetime, datetime.time)):
-            if self._isodates:
-                if isinstance(obj, (datetime.datetime, datetime.time)):
-                    obj = obj.replace(microsecond=0)
-                return obj.isoformat()
-            else:
-                return str(obj)
-        elif isinstance(obj, decimal.Decimal):
-            return float(obj)
         elif is_saobject(obj):
             return dictify_sqla(obj)
         elif is_mingobject(obj):
             return dictify_ming(obj)
-        elif is_query_result(obj):
-            return dict(rows=list(obj), count=obj.rowcount)
-        elif is_query_row(obj):
-            return dict(rows=dict(obj), count=1)
-        elif is_objectid(obj):
-            return str(obj)
-        elif isinstance(obj, MultiDict):
-            return obj.mixed()
-        elif isinstance(obj, types.GeneratorType):
-            return list(obj)
         else:
             return _JSONEncoder.default(self, obj)
 
 
+def _encode_json(obj):
+    return obj.__json__()
+
+
+def _encode_query_result(obj):
+    return dict(rows=list(obj), count=obj.rowcount)
+
+
+def _encode_query_row(obj):
+    return dict(rows=dict(obj), count=1)
+
+
+def _encode_multidict(obj):
+    return obj.mixed()
+
+
+def _encode_odm_cursor(obj):
+    return list(dictify_ming_cursor(obj))
+
+
 _default_encoder = JSONEncoder.create_global()
 
 
+def _check_dict_like(obj, encoder):
+    if encoder._allow_lists is False:
+        try:
+            value = obj['test']
+        except TypeError:
+            if not hasattr(obj, '__json__') and not is_saobject(obj) and not is_mingobject(obj):
+                raise JsonEncodeError('Your Encoded object must be dict-like.')
+        except:
+            pass
+
+
 def encode(obj, encoder=None, iterencode=False):
     """Return a JSON string representation of a Python object."""
     if encoder is None:
@@ -133,18 +329,145 @@ def encode(obj, encoder=None, iterencode=False):
     if isinstance(obj, string_type):
         return encode_func(obj)
 
-    if encoder._allow_lists is False:
-        try:
-            value = obj['test']
-        except TypeError:
-            if not hasattr(obj, '__json__') and not is_saobject(obj) and not is_mingobject(obj):
-                raise JsonEncodeError('Your Encoded object must be dict-like.')
-        except:
-            pass
-
+    _check_dict_like(obj, encoder)
     return encode_func(obj)
 
 
 def encode_iter(obj, encoder=None):
     """Encode object, yielding each string representation as available."""
     return encode(obj, encoder=encoder, iterencode=True)
+
+
+def encode_stream(obj, encoder=None):
+    """Encode object, yielding chunks while lazy values are iterated.
+
+    Unlike :func:`encode_iter` generators, SQLAlchemy queries and
+    query results and Ming queries found in dictionaries and lists are
+    not converted to lists before being encoded, their items are encoded
+    one by one while they are iterated. Use ``Query.yield_per`` to
+    avoid loading all the rows of a SQLAlchemy query in memory at once.
+
+    Indentation is not supported, when the encoder has an ``indent``
+    the result is the same of :func:`encode_iter`.
+    """
+    if encoder is None:
+        encoder = _default_encoder
+
+    if encoder.indent is not None:
+        return encode(obj, encoder=encoder, iterencode=True)
+
+    if not isinstance(obj, string_type):
+        # Check is performed in advance, so that errors are
+        # reported before the response starts being sent.
+        _check_dict_like(obj, encoder)
+
+    return _iterencode_lazy(encoder, obj)
+
+
+def _encode_key(encoder, key):
+    if isinstance(key, string_type):
+        return encoder.encode(key)
+    elif key is None or isinstance(key, (bool, numbers.Integral, float)):
+        # Same conversion performed by json for non string keys.
+        return encoder.encode(encoder.encode(key))
+    elif encoder.skipkeys:
+        return None
+    raise TypeError('key %r is not a string' % (key, ))
+
+
+_LAZY_TYPES = tuple(t for t in (types.GeneratorType, SAQuery, SAResultProxy, ODMCursor)
+                    if t is not None)
+
+
+def _contains_lazy(obj):
+    if isinstance(obj, dict):
+        values = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        values = obj
+    else:
+        return isinstance(obj, _LAZY_TYPES)
+
+    for value in values:
+        if isinstance(value, _LAZY_TYPES):
+            return True
+        if isinstance(value, (dict, list, tuple)) and _contains_lazy(value):
+            return True
+    return False
+
+
+def _iterencode_lazy(encoder, obj):
+    if not _contains_lazy(obj):
+        # Nothing to iterate, encode everything at once as it's faster.
+        yield encoder.encode(obj)
+    elif isinstance(obj, dict):
+        items = obj.items()
+        if encoder.sort_keys:
+            items = sorted(items)
+
+        yield '{'
+        first = True
+        for key, value in items:
+            key = _encode_key(encoder, key)
+            if key is None:
+                continue
+
+            if first:
+                first = False
+            else:
+                yield encoder.item_separator
+
+            yield key
+            yield encoder.key_separator
+            for chunk in _iterencode_lazy(encoder, value):
+                yield chunk
+        yield '}'
+    elif isinstance(obj, (list, tuple, types.GeneratorType)) or is_query(obj):
+        for chunk in _iterencode_lazy_list(encoder, obj):
+            yield chunk
+    elif is_odm_cursor(obj):
+        for chunk in _iterencode_lazy_list(encoder, dictify_ming_cursor(obj)):
+            yield chunk
+    else:
+        # Same format used by JSONEncoder.default for query results.
+        rowcount = obj.rowcount
+        yield '{%s%s' % (encoder.encode('rows'), encoder.key_separator)
+        for chunk in _iterencode_lazy_list(encoder, obj):
+            yield chunk
+        yield '%s%s%s%s}' % (encoder.item_separator, encoder.encode('count'),
+                             encoder.key_separator, encoder.encode(rowcount))
+
+
+def _iterencode_lazy_list(encoder, iterable, batch_size=128):
+    # Items are encoded in batches, as encoding each one on its
+    # own is far slower than encoding a list of them.
+    yield '['
+    first = True
+    batch = []
+    for value in iterable:
+        if _contains_lazy(value):
+            if batch:
+                if not first:
+                    yield encoder.item_separator
+                yield encoder.encode(encoder._encode_sequence(batch))[1:-1]
+                batch = []
+                first = False
+
+            if not first:
+                yield encoder.item_separator
+            for chunk in _iterencode_lazy(encoder, value):
+                yield chunk
+            first = False
+        else:
+            batch.append(value)
+            if len(batch) >= batch_size:
+                if not first:
+                    yield encoder.item_separator
+                yield encoder.encode(encoder._encode_sequence(batch))[1:-1]
+                batch = []
+                first = False
+
+    if batch:
+        if not first:
+            yield encoder.item_separator
+        yield encoder.encode(encoder._encode_sequence(batch))[1:-1]
+    yield ']'
@@ -3,12 +3,22 @@ try:
 except ImportError: #pragma: no cover
     from urllib.parse import quote_plus
 
-from tg.support.converters import asbool
+import sys
+import inspect
+import time
+import threading
+import logging
+
+from tg.support.converters import asbool, asint
+from tg._compat import reraise
 from markupsafe import Markup
 
 import tg
 from tg import predicates
-from tg.util import Bunch
+from tg.util import Bunch, LazyBunch
+from tg.caching import _get_cached_value, _tagged_cache_key
+
+log = logging.getLogger(__name__)
 
 
 class MissingRendererError(Exception):
@@ -24,6 +34,9 @@ class MissingRendererError(Exception):
 def _get_tg_vars():
     """Create a Bunch of variables that should be available in all templates.
 
+    The variables depending on the request (locale, inputs, errors and
+    auth_stack_enabled) are only computed when the template accesses them.
+
     These variables are:
 
     WARNING: This function should not be called from outside of the render()
@@ -61,49 +74,32 @@ def _get_tg_vars():
     conf = tgl.config
     tmpl_context = tgl.tmpl_context
     app_globals = tgl.app_globals
-    translator = tgl.translator
-    response = tgl.response
     session = tgl.session
-    helpers = conf['helpers']
-
-    try:
-        validation = req.validation
-    except AttributeError:
-        validation = {}
+    static_tg_vars, static_root_vars = _get_static_tg_vars(conf)
 
     # TODO: Implement user_agent and other missing features.
-    tg_vars = Bunch(
-        config=tg.config,
-        flash_obj=tg.flash,
-        quote_plus=quote_plus,
-        url=tg.url,
+    tg_vars = LazyBunch(
+        dict(locale=lambda: req.plain_languages,
+             errors=lambda: _get_validation(req, 'errors'),
+             inputs=lambda: _get_validation(req, 'values'),
+             auth_stack_enabled=lambda: 'repoze.who.plugins' in req.environ),
+        static_tg_vars,
         # this will be None if no identity
-        identity = req.environ.get('repoze.who.identity'),
-        session = session,
-        locale = req.plain_languages,
-        errors = validation and validation.errors,
-        inputs = validation and validation.values,
-        request = req,
-        auth_stack_enabled = 'repoze.who.plugins' in req.environ,
-        predicates = predicates)
+        identity=req.environ.get('repoze.who.identity'),
+        session=session,
+        request=req)
 
     root_vars = Bunch(
+        static_root_vars,
         c=tmpl_context,
         tmpl_context=tmpl_context,
-        response=response,
+        response=tgl.response,
         request=req,
         config=conf,
         app_globals=app_globals,
         g=app_globals,
         session=session,
-        url=tg.url,
-        helpers=helpers,
-        h=helpers,
-        tg=tg_vars,
-        translator=translator,
-        ungettext=tg.i18n.ungettext,
-        _=tg.i18n.ugettext,
-        N_=tg.i18n.gettext_noop)
+        tg=tg_vars)
 
     # If there is an identity, push it to the Pylons template context
     tmpl_context.identity = tg_vars['identity']
@@ -115,6 +111,48 @@ def _get_tg_vars():
         root_vars.update(variable_provider())
     return root_vars
 
+def _get_static_tg_vars(conf):
+    """Template variables that don't depend on the request.
+
+    They are computed once and stored in the configuration,
+    until the application helpers get replaced.
+    """
+    helpers = conf['helpers']
+    try:
+        cached_helpers, static_tg_vars, static_root_vars = conf['tg.static_template_vars']
+    except KeyError:
+        cached_helpers = None
+
+    if cached_helpers is not helpers:
+        static_tg_vars = dict(
+            config=tg.config,
+            flash_obj=tg.flash,
+            quote_plus=quote_plus,
+            url=tg.url,
+            predicates=predicates)
+
+        static_root_vars = dict(
+            url=tg.url,
+            helpers=helpers,
+            h=helpers,
+            # Proxy, so that the translator is only created when used.
+            translator=tg.translator,
+            ungettext=tg.i18n.ungettext,
+            _=tg.i18n.ugettext,
+            N_=tg.i18n.gettext_noop)
+
+        conf['tg.static_template_vars'] = (helpers, static_tg_vars, static_root_vars)
+    return static_tg_vars, static_root_vars
+
+
+def _get_validation(req, attr):
+    try:
+        validation = req.validation
+    except AttributeError:
+        validation = {}
+    return validation and getattr(validation, attr)
+
+
 #Monkey patch pylons_globals for cases when pylons.templating is used
 #instead of tg.render to programmatically render templates.
 try: #pragma: no cover
@@ -194,6 +232,17 @@ def render(template_vars, template_engine=None, template_name=None, **kwargs):
     kwargs['cache_key'] = caching_options.get('key')
     kwargs['cache_expire'] = caching_options.get('expire')
     kwargs['cache_type'] = caching_options.get('type')
+    if caching_options.get('tags'):
+        kwargs['cache_tags'] = caching_options['tags']
+    if kwargs.get('stream'):
+        if caching_options:
+            # Cached templates are stored fully rendered, so they can't be streamed.
+            kwargs['stream'] = False
+        elif not config.get('registry_streaming', True):
+            # Request locals are gone when the response is iterated.
+            log.warning('Rendering %s without streaming, as the stream render '
+                        'param requires registry_streaming', template_name)
+            kwargs['stream'] = False
 
     tg.hooks.notify('before_render_call', (template_engine, template_name, template_vars, kwargs))
 
@@ -211,9 +260,54 @@ def render(template_vars, template_engine=None, template_name=None, **kwargs):
     return kwargs['result']
 
 
+def stream_chunks(chunks, encoding=None, buffer_size=8192):
+    """Encodes the text ``chunks`` generated by a template for streaming.
+
+    Chunks are joined in blocks of at least ``buffer_size`` characters,
+    so that the WSGI server doesn't have to send each small piece of
+    text generated by the template on its own. Blocks are encoded
+    with ``encoding``, by default the charset of the current response.
+
+    Rendering engines use this when the ``stream`` render param is
+    provided to return an iterator that can be used as the response
+    ``app_iter``. As the template is actually rendered while the
+    response is being sent, the ``stream`` render param is ignored
+    unless ``registry_streaming`` is enabled, so that request locals
+    are still available during the iteration.
+
+    Errors raised by the template while it is streamed happen after
+    the response status and headers have been sent, they are logged
+    and the response is truncated.
+    """
+    if encoding is None:
+        encoding = tg.response.charset or 'utf-8'
+    return _encode_chunks(chunks, encoding, buffer_size)
+
+
+def _encode_chunks(chunks, encoding, buffer_size):
+    buffer = []
+    buffered = 0
+    try:
+        for chunk in chunks:
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= buffer_size:
+                yield ''.join(buffer).encode(encoding)
+                buffer = []
+                buffered = 0
+    except Exception:
+        # Status and headers have already been sent, so error pages
+        # can't be served anymore and the response gets truncated.
+        log.exception('Failed to render streamed response, the response is truncated')
+        raise
+
+    if buffer:
+        yield ''.join(buffer).encode(encoding)
+
+
 def cached_template(template_name, render_func, ns_options=(),
                     cache_key=None, cache_type=None, cache_expire=None,
-                    **kwargs):
+                    cache_tags=None, **kwargs):
     """Cache and render a template, took from Pylons
 
     Cache a template to the namespace ``template_name``, along with a
@@ -245,11 +339,18 @@ def cached_template(template_name, render_func, ns_options=(),
         Time in seconds to cache this template with this ``cache_key``
         for. Or use 'never' to designate that the cache should never
         expire.
+    ``cache_tags``
+        List of tags attached to the cached template,
+        see :func:`tg.caching.invalidate_tags`.
 
     The minimum key required to trigger caching is
     ``cache_expire='never'`` which will cache the template forever
     seconds with no key.
 
+    When the ``cache.stale_grace`` option is set, expired templates
+    are served for that many seconds while a single thread renders
+    the template again.
+
     """
     # If one of them is not None then the user did set something
     if cache_key is not None or cache_type is not None or cache_expire is not None:
@@ -266,10 +367,144 @@ def cached_template(template_name, render_func, ns_options=(),
         for name in ns_options:
             namespace += str(kwargs.get(name))
 
+        stale_grace = asint(tg.config.get('cache.stale_grace', 0))
+
+        if cache_tags:
+            cache_key = _tagged_cache_key(tg.cache._current_obj(), cache_tags, cache_key)
+
         cache = tg.cache.get_cache(namespace, **get_cache_kw)
-        content = cache.get_value(cache_key, createfunc=render_func,
-            expiretime=cache_expire)
+        content = _get_cached_value(cache, cache_key, render_func,
+                                    expiretime=cache_expire,
+                                    stale_grace=stale_grace)
         return content
     else:
         return render_func()
 
+
+
+def exposed_templates(root_controller, extra_templates=()):
+    """Returns all the templates exposed by the application controllers.
+
+    Provides a list of ``(engine, template, render_params)`` tuples
+    for every template registered through ``@expose`` by the controllers
+    mounted in the tree of ``root_controller``. Templates that are only
+    selected at runtime, like the ones passed to
+    :func:`tg.decorators.override_template` or exposed by controllers
+    returned by ``_lookup``, can be provided through ``extra_templates``
+    as ``engine:template`` strings.
+    """
+    from tg.controllers.dispatchtable import MountIndex, _static_attribute
+
+    templates = []
+    seen = set()
+
+    def add_template(engine, template, render_params):
+        if (engine, template) not in seen:
+            seen.add((engine, template))
+            templates.append((engine, template, render_params))
+
+    controllers = []
+    if root_controller is not None:
+        controllers = MountIndex(root_controller).controllers()
+
+    for controller in controllers:
+        for name in dir(controller):
+            if name.startswith('__'):
+                continue
+
+            action = _static_attribute(controller, name)
+            deco = getattr(action, 'decoration', None)
+            if deco is None or not inspect.isfunction(action):
+                continue
+
+            for engine, template, render_params in deco.exposed_templates():
+                add_template(engine, template, render_params)
+
+    for template in extra_templates:
+        engine, template = template.split(':', 1)
+        add_template(engine, template, {})
+
+    templates.sort(key=lambda t: (t[0], t[1]))
+    return templates
+
+
+def warmup_templates(config=None, workers=0, extra_templates=(), root_controller=None):
+    """Loads and compiles all the templates exposed by the application.
+
+    Avoids the latency of compiling templates on the first request that
+    renders them. Rendering engines that provide a ``compile_template``
+    method are asked to compile each template returned by
+    :func:`exposed_templates` for ``root_controller``, templates of other
+    engines are skipped. When no ``root_controller`` is provided only
+    ``extra_templates`` are compiled.
+
+    When ``workers`` is greater than ``1`` templates are compiled by
+    that many threads. The first template that fails to compile stops
+    the warmup and the exception is propagated to the caller.
+
+    Returns a list of ``(engine, template, seconds)`` tuples with the
+    time spent compiling each template.
+    """
+    if config is None:
+        config = tg.config._current_obj()
+
+    render_functions = config['render_functions']
+
+    pending = []
+    for engine, template, render_params in exposed_templates(root_controller, extra_templates):
+        compile_template = getattr(render_functions.get(engine), 'compile_template', None)
+        if compile_template is None:
+            log.debug('Skipping warmup of %s template %s, engine does not support it',
+                      engine, template)
+            continue
+        pending.append((engine, template, compile_template, render_params))
+
+    def compile_pending(item):
+        engine, template, compile_template, render_params = item
+        start = time.time()
+        try:
+            compile_template(template, **render_params)
+        except:
+            log.error('Failed to compile %s template %s', engine, template)
+            raise
+
+        elapsed = time.time() - start
+        log.info('Compiled %s template %s in %.2fms', engine, template, elapsed * 1000)
+        return engine, template, elapsed
+
+    if workers <= 1:
+        return [compile_pending(item) for item in pending]
+
+    results = []
+    errors = []
+    lock = threading.Lock()
+    pending.reverse()
+
+    def worker():
+        while True:
+            with lock:
+                if errors or not pending:
+                    return
+                item = pending.pop()
+
+            try:
+                result = compile_pending(item)
+            except:
+                with lock:
+                    errors.append(sys.exc_info())
+                return
+
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=worker) for __ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        reraise(*errors[0])
+
+    results.sort(key=lambda r: (r[0], r[1]))
+    return results
@@ -1,3 +1,37 @@
+import os
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def _compiled_templates_dir(compiled_dir, option):
+    """Checks the directory where compiled templates should be stored.
+
+    Returns ``None`` when no directory was configured or when it is
+    not possible to write into it, in which case compiled templates
+    should only be kept in memory.
+    """
+    if not compiled_dir or compiled_dir.lower() in ('none', 'false'):
+        return None
+
+    bad_path = None
+    if os.path.exists(compiled_dir):
+        if not os.access(compiled_dir, os.W_OK):
+            bad_path = compiled_dir
+            compiled_dir = None
+    else:
+        try:
+            os.makedirs(compiled_dir)
+        except:
+            bad_path = compiled_dir
+            compiled_dir = None
+
+    if bad_path:
+        log.warn("Unable to write cached templates to %r; falling back "
+                 "to an in-memory cache. Please set the `%s` configuration "
+                 "option to a writable directory." % (bad_path, option))
+    return compiled_dir
+
 
 class RendererFactory(object):
     """
@@ -42,6 +76,17 @@ class RendererFactory(object):
 
         ``render_params`` parameter will contain all the values
         provide through ``@expose(render_params={})``.
+        ``cache_tags`` is also provided when the ``tg_cache`` option
+        includes ``tags``.
+
+        Engines that support streaming should return an iterator
+        of encoded chunks when the ``stream`` render param is ``True``,
+        see :func:`tg.render.stream_chunks`.
+
+        Rendering engines can also provide a
+        ``compile_template(template_name, **render_params)`` method
+        that loads and compiles a template without rendering it,
+        which is used by :func:`tg.render.warmup_templates`.
 
         """
         raise NotImplementedError()
\ No newline at end of file
@@ -4,7 +4,7 @@ from markupsafe import Markup
 from tg.configuration.utils import coerce_config
 from tg.support.converters import asint, asbool
 from tg.i18n import ugettext
-from tg.render import cached_template
+from tg.render import cached_template, stream_chunks
 from .base import RendererFactory
 import tg
 
@@ -37,6 +37,7 @@ class GenshiRenderer(RendererFactory):
         - Caching options supported by :func:`.cached_template`
         - ``doctype`` -> To override the global doctype
         - ``method`` -> To override the global rendering method
+        - ``stream`` -> Return an iterator over the rendered template, see :func:`.stream_chunks`
     """
     CONFIG_OPTIONS = {
         'max_cache_size': asint,
@@ -142,6 +143,10 @@ class GenshiRenderer(RendererFactory):
                 methods.update(method)
                 self.methods_for_content_type = methods
 
+    def compile_template(self, template_name, **render_params):
+        """Loads and compiles a template without rendering it."""
+        return self.load_template(template_name)
+
     @classmethod
     def on_template_loaded(cls, template):
         """
@@ -208,6 +213,11 @@ class GenshiRenderer(RendererFactory):
                 method = methods[0]
             kwargs['method'] = method
 
+        if kwargs.pop('stream', False):
+            template = self.load_template(template_name)
+            return stream_chunks(template.generate(**template_vars).serialize(doctype=doctype,
+                                                                              method=method))
+
         def render_template():
             template = self.load_template(template_name)
             return Markup(template.generate(**template_vars).render(
@@ -1,10 +1,12 @@
 from __future__ import absolute_import
 
 from os.path import exists, getmtime
+from tg.configuration.utils import coerce_config
 from tg.i18n import ugettext, ungettext
-from tg.render import cached_template
+from tg.render import cached_template, stream_chunks
+from tg.util.files import atomic_write
 from markupsafe import Markup
-from .base import RendererFactory
+from .base import RendererFactory, _compiled_templates_dir
 
 try:
     import jinja2
@@ -16,17 +18,27 @@ if jinja2 is not None:
     from jinja2 import ChoiceLoader, Environment
     from jinja2.filters import FILTERS
     from jinja2.exceptions import TemplateNotFound
+    from jinja2.bccache import FileSystemBytecodeCache
 else:  # pragma: no cover
     class FileSystemLoader(object): pass
+    class FileSystemBytecodeCache(object): pass
 
 __all__ = ['JinjaRenderer']
 
 
 class JinjaRenderer(RendererFactory):
     """
-    Currently Jinja2 support uses a bunch of options from the AppConfig
-    and doesn't provide its own namespace.
+    Currently Jinja2 support uses a bunch of options from the AppConfig,
+    options available as ``templating.jinja.*`` are:
+
+        - ``templating.jinja.compiled_templates_dir`` -> Where to store the bytecode
+          of compiled templates, so that they don't have to be compiled again when
+          the application restarts. By default templates are only compiled in memory.
     """
+    #: Configuration Options that can be set as ``templating.jinja.*``.
+    CONFIG_OPTIONS = {
+        'compiled_templates_dir': str
+    }
     engines = {'jinja': {'content_type': 'text/html'}}
 
     @classmethod
@@ -55,9 +67,17 @@ class JinjaRenderer(RendererFactory):
         loader = ChoiceLoader(
             [TemplateLoader(path, **template_loader_args) for path in config['paths']['templates']])
 
+        options = coerce_config(config, 'templating.jinja.', cls.CONFIG_OPTIONS)
+        compiled_dir = _compiled_templates_dir(options.get('compiled_templates_dir', None),
+                                               'templating.jinja.compiled_templates_dir')
+        bytecode_cache = None
+        if compiled_dir is not None:
+            bytecode_cache = AtomicFileSystemBytecodeCache(compiled_dir)
+
         jinja2_env = Environment(loader=loader, autoescape=True,
                                  auto_reload=config['auto_reload_templates'],
-                                 extensions=config['jinja_extensions'])
+                                 extensions=config['jinja_extensions'],
+                                 bytecode_cache=bytecode_cache)
 
         # Try to load custom filters module under app_package.lib.templatetools
         try:
@@ -95,14 +115,23 @@ class JinjaRenderer(RendererFactory):
     def __init__(self, jinja2_env):
         self.jinja2_env = jinja2_env
 
+    def compile_template(self, template_name, **render_params):
+        """Loads and compiles a template without rendering it."""
+        return self.jinja2_env.get_template(template_name)
+
     def __call__(self, template_name, template_vars, cache_key=None,
-                 cache_type=None, cache_expire=None):
+                 cache_type=None, cache_expire=None, cache_tags=None, stream=False):
         """Render a template with Jinja2
 
         Accepts the cache options ``cache_key``, ``cache_type``, and
-        ``cache_expire``.
+        ``cache_expire``. When ``stream`` is ``True`` an iterator
+        over the encoded output is returned, see :func:`.stream_chunks`.
 
         """
+        if stream:
+            template = self.jinja2_env.get_template(template_name)
+            return stream_chunks(template.generate(**template_vars))
+
         # Create a render callable for the cache function
         def render_template():
             # Grab a template reference
@@ -112,7 +141,8 @@ class JinjaRenderer(RendererFactory):
         return cached_template(template_name, render_template,
                                cache_key=cache_key,
                                cache_type=cache_type,
-                               cache_expire=cache_expire)
+                               cache_expire=cache_expire,
+                               cache_tags=cache_tags)
 
 
 class DottedTemplateLoader(FileSystemLoader):
@@ -150,3 +180,15 @@ class DottedTemplateLoader(FileSystemLoader):
             fd.close()
 
         return source, template, lambda: mtime == getmtime(template)
+
+
+class AtomicFileSystemBytecodeCache(FileSystemBytecodeCache):
+    """Jinja bytecode cache that can be shared by multiple processes.
+
+    Cached bytecode is keyed by template name and checked against
+    the checksum of the template source and the Jinja bytecode format.
+    Files are replaced atomically, so that processes loading a template
+    never read bytecode being written by another process.
+    """
+    def dump_bytecode(self, bucket):
+        atomic_write(self._get_cache_filename(bucket), bucket.bytecode_to_string())
@@ -1,11 +1,18 @@
+import itertools
+
 import tg
-from tg.jsonify import encode, JSONEncoder
+from tg.jsonify import encode, encode_stream, JSONEncoder
+from tg.render import stream_chunks
 from .base import RendererFactory
 from tg.exceptions import HTTPBadRequest
 
 __all__ = ['JSONRenderer']
 
 
+# Number of differently configured encoders memorized by the renderer
+_ENCODERS_CACHE_SIZE = 64
+
+
 class JSONRenderer(RendererFactory):
     """
     JSON rendering can be configured using options supported by :meth:`.JSONEncoder.configure`
@@ -16,6 +23,10 @@ class JSONRenderer(RendererFactory):
     - ``key`` -> Render a single key of the dictionary returned by controller
       instead of rendering the dictionary itself.
     - ``callback_param`` ->  Name of the callback to call in rendered JS for **jsonp**
+    - ``stream`` -> When ``True`` the response is sent in blocks of ~64KB while
+      it is encoded. Generators, SQLAlchemy queries and results and Ming queries
+      are encoded while they are iterated instead of being converted to lists first.
+      See :func:`tg.jsonify.encode_stream`.
 
     """
     engines = {'json': {'content_type': 'application/json'},
@@ -27,17 +38,58 @@ class JSONRenderer(RendererFactory):
         return {'json': cls.render_json,
                 'jsonp': cls.render_jsonp}
 
+    STREAM_BUFFER_SIZE = 65536
+
+    # Encoders for the render_params used by the exposed actions,
+    # indexed by the options they were configured with.
+    _encoders = {}
+
     @staticmethod
-    def _get_configured_encode(options):
+    def _get_configured_encoder(options):
         # Caching is not supported by JSON encoders
         options.pop('cache_expire', None)
         options.pop('cache_type', None)
         options.pop('cache_key', None)
+        options.pop('cache_tags', None)
 
         if not options:
+            return None
+
+        try:
+            key = frozenset(options.items())
+            encoder = JSONRenderer._encoders.get(key)
+        except TypeError:
+            # Options that cannot be hashed, like custom_encoders
+            return JSONEncoder(**options)
+
+        if encoder is None:
+            if len(JSONRenderer._encoders) >= _ENCODERS_CACHE_SIZE:
+                JSONRenderer._encoders.clear()
+            encoder = JSONRenderer._encoders[key] = JSONEncoder(**options)
+        return encoder
+
+    @staticmethod
+    def _get_configured_encode(options):
+        encoder = JSONRenderer._get_configured_encoder(options)
+        if encoder is None:
             return encode
         else:
-            return lambda obj: encode(obj, JSONEncoder(**options))
+            return lambda obj: encode(obj, encoder)
+
+    @staticmethod
+    def _stream(template_vars, render_params, prefix='', suffix=''):
+        encoder = JSONRenderer._get_configured_encoder(render_params)
+        chunks = encode_stream(template_vars, encoder)
+        if prefix or suffix:
+            chunks = itertools.chain((prefix, ), chunks, (suffix, ))
+
+        # Text responses get their charset when the controller output is
+        # assigned to the response, streamed ones must declare it themselves.
+        response = tg.response
+        if not response.charset:
+            response.charset = 'utf-8'
+        return stream_chunks(chunks, encoding=response.charset,
+                             buffer_size=JSONRenderer.STREAM_BUFFER_SIZE)
 
     @staticmethod
     def render_json(template_name, template_vars, **render_params):
@@ -45,6 +97,9 @@ class JSONRenderer(RendererFactory):
         if key is not None:
             template_vars = template_vars[key]
 
+        if render_params.pop('stream', False):
+            return JSONRenderer._stream(template_vars, render_params)
+
         encode = JSONRenderer._get_configured_encode(render_params)
         return encode(template_vars)
 
@@ -59,6 +114,10 @@ class JSONRenderer(RendererFactory):
         if callback is None:
             raise HTTPBadRequest('JSONP requires a "%s" parameter with callback name' % pname)
 
+        if render_params.pop('stream', False):
+            return JSONRenderer._stream(template_vars, render_params,
+                                        prefix='%s(' % callback, suffix=');')
+
         encode = JSONRenderer._get_configured_encode(render_params)
         values = encode(template_vars)
         return '%s(%s);' % (callback, values)
\ No newline at end of file
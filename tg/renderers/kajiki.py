@@ -1,12 +1,19 @@
 from __future__ import absolute_import
+import io
 import os
+import sys
+import logging
+import marshal
+from hashlib import sha1
 
-from tg.render import cached_template
+from tg.render import cached_template, stream_chunks
 from markupsafe import Markup
-from .base import RendererFactory
+from .base import RendererFactory, _compiled_templates_dir
 from ..configuration.utils import coerce_config
 from ..support.converters import asbool, aslist
+from ..util.files import atomic_write
 from ..i18n import ugettext
+from .._compat import exec_
 
 try:
     import kajiki
@@ -20,6 +27,32 @@ else:  # pragma: no cover
 
 __all__ = ['KajikiRenderer']
 
+log = logging.getLogger(__name__)
+
+# Range of Kajiki versions, as (major, minor), known to provide the
+# internals used to store compiled templates.
+_COMPILED_TEMPLATES_VERSIONS = ((0, 6), (0, 10))
+
+
+def _compiled_templates_supported():
+    """Whether the installed Kajiki provides the internals used to store compiled templates."""
+    try:
+        version = tuple(int(v) for v in kajiki.__version__.split('.')[:2])
+    except (AttributeError, ValueError):
+        return False
+
+    min_version, max_version = _COMPILED_TEMPLATES_VERSIONS
+    if not min_version <= version < max_version:
+        return False
+
+    try:
+        from kajiki.template import generate_python, _Template
+        from kajiki.text import _Scanner, _Parser
+        from kajiki.xml_template import _Parser, _DomTransformer, _Compiler
+    except ImportError:
+        return False
+    return hasattr(_Template, 'annotate_lnotab')
+
 
 class KajikiRenderer(RendererFactory):
     """
@@ -31,10 +64,16 @@ class KajikiRenderer(RendererFactory):
         - ``templating.kajiki.cdata_scripts`` -> Automatically wrap scripts in CDATA.
         - ``templating.kajiki.html_optional_tags`` -> Allow unclosed html, head and body tags.
         - ``templating.kajiki.strip_text`` -> Strip leading/trailing spaces from text nodes.
+        - ``templating.kajiki.compiled_templates_dir`` -> Where to store the code of compiled
+          templates, so that they don't have to be compiled again when the application restarts.
+          By default templates are only compiled in memory. Requires Kajiki 0.6.3 up to 0.9,
+          the internals it relies on are checked when the renderer is created and with
+          other versions templates are only compiled in memory.
 
     Supported ``render_params``:
 
         - Caching options supported by :func:`.cached_template`
+        - ``stream`` -> Return an iterator over the rendered template, see :func:`.stream_chunks`
         - All arguments supported by :func:`kajiki.xml_template.XMLTemplate`
 
     """
@@ -45,7 +84,8 @@ class KajikiRenderer(RendererFactory):
         'xml_autoblocks': aslist,
         'cdata_scripts': asbool,
         'html_optional_tags': asbool,
-        'strip_text': asbool
+        'strip_text': asbool,
+        'compiled_templates_dir': str
     }
     engines = {'kajiki': {'content_type': 'text/html'}}
 
@@ -70,6 +110,11 @@ class KajikiRenderer(RendererFactory):
         from kajiki import i18n
         i18n.gettext = ugettext
 
+        options['compiled_templates_dir'] = _compiled_templates_dir(
+            options.get('compiled_templates_dir', None),
+            'templating.kajiki.compiled_templates_dir'
+        )
+
         loader = KajikiTemplateLoader(config['paths'].templates[0],
                                       dotted_finder=app_globals.dotted_filename_finder,
                                       reload=config['auto_reload_templates'],
@@ -79,14 +124,24 @@ class KajikiRenderer(RendererFactory):
     def __init__(self, loader):
         self.loader = loader
 
+    def compile_template(self, template_name, stream=False, **render_params):
+        """Loads and compiles a template without rendering it."""
+        return self.loader.load(template_name, **render_params)
+
     def __call__(self, template_name, template_vars, cache_key=None,
-                 cache_type=None, cache_expire=None, **render_params):
+                 cache_type=None, cache_expire=None, cache_tags=None, stream=False,
+                 **render_params):
         """Render a template with Kajiki
 
         Accepts the cache options ``cache_key``, ``cache_type``, and
-        ``cache_expire``.
+        ``cache_expire``. When ``stream`` is ``True`` an iterator
+        over the encoded output is returned.
 
         """
+        if stream:
+            template = self.loader.load(template_name, **render_params)
+            return stream_chunks(template(template_vars))
+
         # Create a render callable for the cache function
         def render_template():
             # Grab a template reference
@@ -95,7 +150,8 @@ class KajikiRenderer(RendererFactory):
 
         return cached_template(template_name, render_template,
                                cache_key=cache_key, cache_type=cache_type,
-                               cache_expire=cache_expire)
+                               cache_expire=cache_expire,
+                               cache_tags=cache_tags)
 
 
 class KajikiTemplateLoader(FileLoader):
@@ -106,9 +162,17 @@ class KajikiTemplateLoader(FileLoader):
     def __init__(self, base, dotted_finder, reload=True, force_mode='html5', **kwargs):
         self.dotted_finder = dotted_finder
         self.template_extension = kwargs.pop('template_extension', '.xhtml')
+        self.compiled_dir = kwargs.pop('compiled_templates_dir', None)
 
         super(KajikiTemplateLoader, self).__init__(base, reload, force_mode, **kwargs)
 
+        if self.compiled_dir is not None and not (_compiled_templates_supported() and
+                                                  hasattr(self, '_template_options')):
+            log.warning('Unable to store compiled Kajiki templates with Kajiki %s, '
+                        'templates will only be compiled in memory',
+                        getattr(kajiki, '__version__', 'unknown'))
+            self.compiled_dir = None
+
     def _filename(self, filename):
         if not filename.endswith(self.template_extension):
             finder = self.dotted_finder
@@ -122,3 +186,111 @@ class KajikiTemplateLoader(FileLoader):
         if resolved_filename is None:
             raise IOError('Template %s not found in template paths' % filename)
         return resolved_filename
+
+    def _load(self, name, encoding='utf-8', *args, **kwargs):
+        if self.compiled_dir is None or args:
+            return super(KajikiTemplateLoader, self)._load(name, encoding, *args, **kwargs)
+
+        template = self._load_compiled(name, kwargs)
+        if template is None:
+            return super(KajikiTemplateLoader, self)._load(name, encoding, *args, **kwargs)
+        return template
+
+    def _load_compiled(self, name, kwargs):
+        """Loads the template from the compiled templates directory.
+
+        Returns ``None`` when the template can't be stored compiled.
+        """
+        filename = self._filename(name)
+
+        if self._force_mode:
+            mode = self._force_mode
+            autoblocks = self._xml_autoblocks
+        else:
+            # Mode is detected from the file extension, like kajiki does
+            mode = os.path.splitext(filename)[1][1:]
+            autoblocks = None
+            if mode not in self.extension_map:
+                return None
+            if mode == 'txt':
+                mode = 'text'
+            elif mode == 'xml':
+                mode = None
+
+        mtime = os.stat(filename).st_mtime
+
+        options = self._template_options.copy()
+        options.update(kwargs)
+
+        cache_key = sha1(repr((filename, mtime, mode, autoblocks,
+                               self._autoescape_text, sorted(options.items()),
+                               kajiki.__version__, sys.version_info)).encode('utf-8'))
+        cache_file = os.path.join(self.compiled_dir, cache_key.hexdigest() + '.kajiki')
+
+        compiled = None
+        try:
+            with open(cache_file, 'rb') as f:
+                compiled = marshal.load(f)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            pass
+
+        if compiled is None:
+            compiled = self._compile(filename, mode, autoblocks, options)
+            atomic_write(cache_file, marshal.dumps(compiled))
+
+        template = self._template_from_code(filename, options, *compiled)
+        self._timestamps[name] = mtime
+        return template
+
+    def _compile(self, filename, mode, autoblocks, options):
+        """Compiles a template file to python code.
+
+        Returns the code object, the python source and the
+        mapping between python lines and template lines,
+        which are the same data :func:`kajiki.template.from_ir` uses
+        to build the template.
+        """
+        from kajiki.template import generate_python
+
+        if mode == 'text':
+            from kajiki.text import _Scanner, _Parser
+
+            with io.open(filename, encoding=options.get('encoding', 'utf-8')) as f:
+                source = f.read()
+            ir_ = _Parser(_Scanner(filename, source), self._autoescape_text).parse()
+            ir_.filename = filename
+        else:
+            from kajiki.xml_template import _Parser, _DomTransformer, _Compiler
+
+            with io.open(filename, encoding=options.get('encoding', 'utf-8')) as f:
+                source = f.read()
+            doc = _Parser(filename, source).parse()
+            doc = _DomTransformer(doc, strip_text=options.get('strip_text', False)).transform()
+            ir_ = _Compiler(filename, doc, mode=mode,
+                            is_fragment=options.get('is_fragment', False),
+                            autoblocks=autoblocks,
+                            cdata_scripts=options.get('cdata_scripts', True)).compile()
+
+        py_lines = list(generate_python(ir_))
+        py_text = '\n'.join(map(str, py_lines))
+        py_linenos = []
+        last_lineno = 0
+        for i, l in enumerate(py_lines):
+            lno = max(last_lineno, l._lineno or 0)
+            py_linenos.append((i + 1, lno))
+            last_lineno = lno
+
+        code = compile(py_text, '<string>', 'exec')
+        return code, py_text, py_linenos
+
+    def _template_from_code(self, filename, options, code, py_text, py_linenos):
+        dct = dict(kajiki=kajiki)
+        exec_(code, dct)
+
+        tpl = dct['template']
+        tpl.base_globals = dict(options.get('base_globals') or {})
+        tpl.base_globals.update(dct)
+        tpl.py_text = py_text
+        tpl.filename = filename
+        tpl.annotate_lnotab(py_linenos)
+        return tpl
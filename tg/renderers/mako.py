@@ -13,7 +13,7 @@ except ImportError: #pragma: no cover
 from tg.support.converters import asbool
 from markupsafe import Markup
 from tg.render import cached_template
-from .base import RendererFactory
+from .base import RendererFactory, _compiled_templates_dir
 
 try:
     import mako
@@ -37,6 +37,9 @@ class MakoRenderer(RendererFactory):
         - ``templating.mako.template_extension`` -> Mako Templates extension, default ``.mak``
         - ``templating.mako.compiled_templates_dir`` -> Where to store mako precompiled templates.
           By default templates are only stored in memory and not on disk.
+
+    Mako doesn't support generating templates incrementally, so the ``stream``
+    render param is ignored and templates are always rendered as a whole.
     """
     #: Configuration Options that can be set as ``templating.mako.*``.
     CONFIG_OPTIONS = {
@@ -59,28 +62,8 @@ class MakoRenderer(RendererFactory):
 
         # If no dotted names support was required we will just setup
         # a file system based template lookup mechanism.
-        compiled_dir = options.get('compiled_templates_dir', None)
-
-        if not compiled_dir or compiled_dir.lower() in ('none', 'false'):
-            # Cache compiled templates in-memory
-            compiled_dir = None
-        else:
-            bad_path = None
-            if os.path.exists(compiled_dir):
-                if not os.access(compiled_dir, os.W_OK):
-                    bad_path = compiled_dir
-                    compiled_dir = None
-            else:
-                try:
-                    os.makedirs(compiled_dir)
-                except:
-                    bad_path = compiled_dir
-                    compiled_dir = None
-            if bad_path:
-                log.warn("Unable to write cached templates to %r; falling back "
-                         "to an in-memory cache. Please set the `templating.mak"
-                         "o.compiled_templates_dir` configuration option to a "
-                         "writable directory." % bad_path)
+        compiled_dir = _compiled_templates_dir(options.get('compiled_templates_dir', None),
+                                               'templating.mako.compiled_templates_dir')
 
         template_extension = options.get('template_extension', '.mak')
 
@@ -116,14 +99,23 @@ class MakoRenderer(RendererFactory):
         self.use_dotted_templatenames = use_dotted_templatenames
         self.template_extension = template_extension
 
-    def __call__(self, template_name, template_vars,
-                 cache_key=None, cache_type=None, cache_expire=None):
-
+    def _get_loader(self, template_name):
         if self.use_dotted_templatenames and not template_name.endswith(self.template_extension):
             template_name = self.dotted_loader.find_template_file(template_name)
             loader = self.dotted_loader
         else:
             loader = self.normal_loader
+        return loader, template_name
+
+    def compile_template(self, template_name, **render_params):
+        """Loads and compiles a template without rendering it."""
+        loader, template_name = self._get_loader(template_name)
+        return loader.get_template(template_name)
+
+    def __call__(self, template_name, template_vars,
+                 cache_key=None, cache_type=None, cache_expire=None, cache_tags=None,
+                 stream=False):
+        loader, template_name = self._get_loader(template_name)
 
         # Create a render callable for the cache function
         def render_template():
@@ -132,7 +124,8 @@ class MakoRenderer(RendererFactory):
             return Markup(template.render_unicode(**template_vars))
 
         return cached_template(template_name, render_template, cache_key=cache_key,
-                               cache_type=cache_type, cache_expire=cache_expire)
+                               cache_type=cache_type, cache_expire=cache_expire,
+                               cache_tags=cache_tags)
 
 
 class DottedTemplateLookup(object):
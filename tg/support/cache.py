@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+"""
+In process cache managers.
+
+Provide the same ``get_cache(namespace).get_value(key, createfunc, expiretime)``
+API of Beaker ``CacheManager``.
+
+:class:`MemoryCacheManager` stores caches in the memory of the
+current process. Each namespace is a thread safe LRU cache with
+a bounded number of entries (and optionally bytes) which expire
+after their ``expiretime``.
+
+:class:`LayeredCacheManager` puts a :class:`MemoryCacheManager` in front
+of a cache shared by multiple processes, so that hot values are served from
+memory while the others are still shared.
+
+They are used by :class:`tg.appwrappers.caching.CacheApplicationWrapper`
+when ``cache.type = tg_memory`` or ``cache.type = tg_layered``.
+
+"""
+import sys
+import time
+import threading
+
+from tg._compat import unicode_text
+from tg.support.converters import asint
+
+
+def _sizeof(value):
+    """Approximate size in bytes of a cached value."""
+    if isinstance(value, (bytes, unicode_text)):
+        return len(value)
+    elif isinstance(value, dict):
+        return sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        return sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class _CacheEntry(object):
+    __slots__ = ('prev', 'next', 'key', 'value', 'storedtime', 'expiretime', 'size')
+
+    def __init__(self, key=None, value=None, storedtime=None, expiretime=None, size=0):
+        self.prev = self.next = self
+        self.key = key
+        self.value = value
+        self.storedtime = storedtime
+        self.expiretime = expiretime
+        self.size = size
+
+
+class MemoryCache(object):
+    """A namespace of :class:`MemoryCacheManager`.
+
+    Entries are kept in a doubly linked list ordered from the most
+    recently used to the least recently used one, so that both
+    lookups and evictions happen in constant time.
+
+    ``max_entries`` and ``max_bytes`` limit the number of entries
+    and their approximate size, when ``None`` there is no limit.
+    ``expire`` is the default ``expiretime`` of entries.
+    """
+    def __init__(self, namespace, max_entries=None, max_bytes=None, expire=None):
+        self.namespace_name = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.expiretime = expire
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._root = _CacheEntry()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Returns a dictionary with the cache counters."""
+        return dict(entries=len(self._entries),
+                    bytes=self.bytes,
+                    hits=self.hits,
+                    misses=self.misses,
+                    evictions=self.evictions)
+
+    def _unlink(self, entry):
+        entry.prev.next = entry.next
+        entry.next.prev = entry.prev
+        del self._entries[entry.key]
+        self.bytes -= entry.size
+
+    def _link(self, entry):
+        root = self._root
+        entry.prev = root
+        entry.next = root.next
+        root.next.prev = entry
+        root.next = entry
+        self._entries[entry.key] = entry
+        self.bytes += entry.size
+
+    def _is_expired(self, entry, expiretime, starttime):
+        if starttime is not None and entry.storedtime < starttime:
+            return True
+
+        if expiretime is None:
+            expiretime = entry.expiretime
+        return expiretime is not None and time.time() >= entry.storedtime + expiretime
+
+    def _lookup(self, key, expiretime, starttime):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if self._is_expired(entry, expiretime, starttime):
+                self._unlink(entry)
+                self.misses += 1
+                return None
+
+            # Move the entry to the front, as it's the most recently used.
+            root = self._root
+            if root.next is not entry:
+                entry.prev.next = entry.next
+                entry.next.prev = entry.prev
+                entry.prev = root
+                entry.next = root.next
+                root.next.prev = entry
+                root.next = entry
+
+            self.hits += 1
+            return entry
+
+    def get_value(self, key, createfunc=None, expiretime=None, starttime=None):
+        """Retrieves the value stored for ``key``.
+
+        When the value is not available or expired it's created
+        through ``createfunc`` and stored, if no ``createfunc``
+        is provided a ``KeyError`` is raised instead.
+        """
+        entry = self._lookup(key, expiretime, starttime)
+        if entry is not None:
+            return entry.value
+
+        if createfunc is None:
+            raise KeyError(key)
+
+        value = createfunc()
+        self.put(key, value, expiretime=expiretime)
+        return value
+    get = get_value
+
+    def put(self, key, value, expiretime=None, starttime=None):
+        """Stores ``value`` for ``key``, evicting least recently used entries if needed."""
+        if expiretime is None:
+            expiretime = self.expiretime
+
+        size = 0
+        if self.max_bytes is not None:
+            size = _sizeof(value)
+            if size > self.max_bytes:
+                # Would evict everything else and still not fit.
+                self.remove_value(key)
+                return
+
+        entry = _CacheEntry(key, value, time.time(), expiretime, size)
+
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None:
+                self._unlink(previous)
+            self._link(entry)
+
+            max_entries = self.max_entries
+            max_bytes = self.max_bytes
+            root = self._root
+            while ((max_entries is not None and len(self._entries) > max_entries) or
+                   (max_bytes is not None and self.bytes > max_bytes)):
+                self._unlink(root.prev)
+                self.evictions += 1
+    set_value = put
+
+    def has_key(self, key):
+        return key in self
+
+    def remove_value(self, key, **kw):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._unlink(entry)
+    remove = remove_value
+
+    def clear(self):
+        """Removes all the entries of the namespace."""
+        with self._lock:
+            self._entries = {}
+            self._root = _CacheEntry()
+            self.bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not self._is_expired(entry, None, None)
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __delitem__(self, key):
+        self.remove_value(key)
+
+
+class MemoryCacheManager(object):
+    """Manages the :class:`MemoryCache` namespaces of the application.
+
+    Accepts the ``cache.`` options of the configuration (without the
+    prefix), the ones used are:
+
+        - ``max_entries``: Maximum number of entries of each namespace,
+          defaults to ``10000``. ``0`` means no limit.
+        - ``max_bytes``: Maximum approximate size in bytes of the values
+          stored in each namespace, by default there is no limit.
+        - ``expire``: Default expiration time in seconds of the entries.
+
+    Other options are ignored, so that the same configuration can be used
+    with Beaker.
+    """
+    DEFAULT_MAX_ENTRIES = 10000
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=None, expire=None,
+                 **kwargs):
+        self.max_entries = asint(max_entries) or None
+        self.max_bytes = asint(max_bytes) if max_bytes is not None else None
+        self.expire = asint(expire) if expire is not None else None
+        self._lock = threading.Lock()
+        self.caches = {}
+
+    def get_cache(self, name, **kwargs):
+        """Returns the :class:`MemoryCache` for namespace ``name``.
+
+        ``max_entries``, ``max_bytes`` and ``expire`` can be provided
+        to override the manager options when the namespace is created.
+        """
+        try:
+            return self.caches[name]
+        except KeyError:
+            pass
+
+        with self._lock:
+            cache = self.caches.get(name)
+            if cache is None:
+                max_entries = kwargs.get('max_entries', self.max_entries)
+                if max_entries is not None:
+                    max_entries = asint(max_entries) or None
+                max_bytes = kwargs.get('max_bytes', self.max_bytes)
+                if max_bytes is not None:
+                    max_bytes = asint(max_bytes)
+                expire = kwargs.get('expire', self.expire)
+                if expire is not None:
+                    expire = asint(expire)
+                cache = self.caches[name] = MemoryCache(name, max_entries=max_entries,
+                                                        max_bytes=max_bytes,
+                                                        expire=expire)
+        return cache
+
+    def stats(self):
+        """Returns the counters of each namespace indexed by namespace name."""
+        return dict((name, cache.stats()) for name, cache in list(self.caches.items()))
+
+
+class LayeredCache(object):
+    """A namespace of :class:`LayeredCacheManager`.
+
+    Values are looked up in the ``local`` :class:`MemoryCache` first
+    and then in the ``shared`` cache, which is a Beaker cache. Values
+    are written to both (write-through) and values read from the shared
+    cache are copied to the local one, but never for longer than the time
+    they have left in the shared cache.
+
+    ``l1_hits``, ``l2_hits`` and ``misses`` count the lookups served by
+    the local cache, by the shared cache and the ones that created the value.
+    """
+    def __init__(self, local, shared, local_expire=None):
+        self.namespace_name = shared.namespace_name
+        self.local = local
+        self.shared = shared
+        self.local_expire = local_expire
+
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Returns a dictionary with the counters of both tiers."""
+        return dict(l1_hits=self.l1_hits,
+                    l2_hits=self.l2_hits,
+                    misses=self.misses,
+                    l1=self.local.stats())
+
+    def _put_local(self, key, value, storedtime, expiretime):
+        local_expire = self.local_expire
+        if expiretime is None:
+            expiretime = self.shared.expiretime
+
+        if expiretime is not None:
+            remaining = storedtime + expiretime - time.time()
+            if remaining <= 0:
+                return
+
+            if local_expire is None or remaining < local_expire:
+                local_expire = remaining
+
+        # Local copies keep the time the value was stored in the shared cache,
+        # so that the expiration required by lookups can be checked.
+        self.local.put(key, (storedtime, value), expiretime=local_expire)
+
+    def get_value(self, key, createfunc=None, expiretime=None, starttime=None):
+        """Retrieves the value stored for ``key`` from the first tier that has it.
+
+        When no tier has the value it's created through ``createfunc``
+        and written to both, if no ``createfunc`` is provided a ``KeyError``
+        is raised instead.
+        """
+        try:
+            storedtime, value = self.local.get(key)
+        except KeyError:
+            pass
+        else:
+            if not ((starttime is not None and storedtime < starttime) or
+                    (expiretime is not None and time.time() >= storedtime + expiretime)):
+                self.l1_hits += 1
+                return value
+            self.local.remove_value(key)
+
+        created = []
+        def create_entry():
+            created.append(True)
+            return time.time(), createfunc()
+
+        try:
+            if createfunc is None:
+                storedtime, value = self.shared.get(key, expiretime=expiretime,
+                                                    starttime=starttime)
+            else:
+                storedtime, value = self.shared.get_value(key, createfunc=create_entry,
+                                                          expiretime=expiretime,
+                                                          starttime=starttime)
+        except KeyError:
+            self.misses += 1
+            raise
+
+        if created:
+            self.misses += 1
+        else:
+            self.l2_hits += 1
+
+        self._put_local(key, value, storedtime, expiretime)
+        return value
+    get = get_value
+
+    def put(self, key, value, expiretime=None, starttime=None):
+        """Stores ``value`` for ``key`` in both tiers."""
+        storedtime = time.time()
+        self.shared.put(key, (storedtime, value), expiretime=expiretime, starttime=starttime)
+        self._put_local(key, value, storedtime, expiretime)
+    set_value = put
+
+    def has_key(self, key):
+        return key in self
+
+    def remove_value(self, key, **kw):
+        self.local.remove_value(key)
+        self.shared.remove_value(key)
+    remove = remove_value
+
+    def clear(self):
+        """Removes all the entries of the namespace from both tiers."""
+        self.local.clear()
+        self.shared.clear()
+
+    def __contains__(self, key):
+        return key in self.local or key in self.shared
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __delitem__(self, key):
+        self.remove_value(key)
+
+
+class LayeredCacheManager(object):
+    """Two tiers cache manager, a local memory cache in front of a shared one.
+
+    Each process gets a small :class:`MemoryCache` (L1) for every namespace
+    which is backed by the namespace of ``shared_manager`` (L2), usually
+    a Beaker ``CacheManager`` using a backend shared between processes
+    like ``file``, ``dbm`` or ``ext:database``.
+
+    ``max_entries``, ``max_bytes`` and ``expire`` configure the local
+    caches like for :class:`MemoryCacheManager`. As the local caches of
+    other processes are not notified when a value is removed or replaced,
+    ``expire`` (defaults to 60 seconds) is the maximum time for which
+    a process might keep serving the previous value.
+    """
+    DEFAULT_LOCAL_EXPIRE = 60
+
+    def __init__(self, shared_manager, max_entries=MemoryCacheManager.DEFAULT_MAX_ENTRIES,
+                 max_bytes=None, expire=DEFAULT_LOCAL_EXPIRE):
+        self.local = MemoryCacheManager(max_entries=max_entries, max_bytes=max_bytes)
+        self.local_expire = asint(expire) if expire is not None else None
+        self.shared = shared_manager
+        self._lock = threading.Lock()
+        self.caches = {}
+
+    def get_cache(self, name, **kwargs):
+        """Returns the :class:`LayeredCache` for namespace ``name``.
+
+        ``kwargs`` are used to create the namespace of the shared cache.
+        """
+        try:
+            return self.caches[name]
+        except KeyError:
+            pass
+
+        with self._lock:
+            cache = self.caches.get(name)
+            if cache is None:
+                cache = self.caches[name] = LayeredCache(self.local.get_cache(name),
+                                                         self.shared.get_cache(name, **kwargs),
+                                                         self.local_expire)
+        return cache
+
+    def stats(self):
+        """Returns the counters of each namespace indexed by namespace name."""
+        return dict((name, cache.stats()) for name, cache in list(self.caches.items()))
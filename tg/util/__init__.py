@@ -1,5 +1,5 @@
 """Utilities"""
 from .decorators import no_warn
-from .bunch import Bunch
+from .bunch import Bunch, LazyBunch
 from .files import DottedFileNameFinder, DottedFileLocatorError
 from .lazystring import lazify, LazyString
\ No newline at end of file
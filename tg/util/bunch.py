@@ -1,3 +1,5 @@
+from collections import MutableMapping as DictMixin
+
 from tg.configuration.utils import get_partial_dict
 
 
@@ -20,3 +22,91 @@ class Bunch(dict):
             del self[name]
         except KeyError:
             raise AttributeError(name)
+
+
+class LazyBunch(DictMixin):
+    """A :class:`Bunch` like mapping whose values can be computed on first access.
+
+    ``lazy`` is a dictionary of functions, each one is called the
+    first time its key is accessed and the returned value is stored
+    in place of the function, ``lazy`` itself is modified in the process.
+    Operations involving all the values, like iterating or copying,
+    compute the ones still pending.
+
+    It is not a ``dict`` subclass on purpose: on Python 2 ``dict(lb)``,
+    ``d.update(lb)`` and ``**lb`` read the storage of dict subclasses
+    directly and would skip the values still pending. Copies and pickles
+    are plain :class:`Bunch` instances.
+    """
+    __slots__ = ('_values', '_lazy')
+
+    def __init__(self, lazy, *args, **kwargs):
+        object.__setattr__(self, '_values', dict(*args, **kwargs))
+        object.__setattr__(self, '_lazy', lazy)
+
+    def __getitem__(self, key):
+        values = self._values
+        try:
+            return values[key]
+        except KeyError:
+            pass
+
+        try:
+            factory = self._lazy.pop(key)
+        except KeyError:
+            raise KeyError(key)
+
+        value = values[key] = factory()
+        return value
+
+    def __setitem__(self, key, value):
+        self._lazy.pop(key, None)
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        if self._lazy.pop(key, None) is None:
+            del self._values[key]
+
+    def __contains__(self, key):
+        return key in self._values or key in self._lazy
+
+    def __iter__(self):
+        self._resolve()
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values) + len(self._lazy)
+
+    def __repr__(self):
+        self._resolve()
+        return repr(self._values)
+
+    def __getattr__(self, name):
+        if name in LazyBunch.__slots__:
+            # Slots are unset only on instances not created by __init__
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            return get_partial_dict(name, self, Bunch)
+
+    __setattr__ = __setitem__
+
+    def __delattr__(self, name):
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def copy(self):
+        self._resolve()
+        return Bunch(self._values)
+
+    __copy__ = copy
+
+    def __reduce__(self):
+        return Bunch, (self.copy(), )
+
+    def _resolve(self):
+        for key in list(self._lazy):
+            self[key]
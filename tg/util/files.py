@@ -1,10 +1,11 @@
 import contextlib
 import os, sys
 import re
+import tempfile
 import uuid
 
 from pkg_resources import resource_filename, resource_stream, get_default_cache
-from .._compat import unicode_text, PY2
+from .._compat import unicode_text, PY2, WIN
 
 
 class DottedFileLocatorError(Exception):
@@ -160,3 +161,30 @@ def safe_filename(filename):
             filename = '_' + filename
 
     return filename
+
+
+def atomic_write(filename, data):
+    """Writes ``data`` bytes to ``filename`` replacing it atomically.
+
+    Data is written to a temporary file in the same directory which
+    is then renamed to ``filename``, so that other processes reading
+    the file never see it partially written.
+    """
+    fd, tmp_filename = tempfile.mkstemp(dir=os.path.dirname(filename),
+                                        prefix='.' + os.path.basename(filename))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+        if hasattr(os, 'replace'):
+            os.replace(tmp_filename, filename)
+        else:  # pragma: no cover
+            if WIN and os.path.exists(filename):
+                os.remove(filename)
+            os.rename(tmp_filename, filename)
+    except:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 
+import inspect
+import weakref
+
 try:
     from bson import ObjectId
 except ImportError:  # pragma: no cover
@@ -9,8 +12,27 @@ except ImportError:  # pragma: no cover
 try:
     import ming
     import ming.odm
+    from ming.odm.odmsession import ODMCursor
 except ImportError:  # pragma: no cover
     ming = None
+    ODMCursor = None
+
+
+def _mapper_create_remakes():
+    # Ming versions that don't validate the documents again when
+    # creating instances provide the remake argument.
+    try:
+        create = ming.odm.Mapper.create
+    except AttributeError:  # pragma: no cover
+        return False
+
+    try:
+        argspec = inspect.getfullargspec(create)
+    except AttributeError:  # pragma: no cover
+        argspec = inspect.getargspec(create)
+    return 'remake' in argspec[0]
+
+_CREATE_REMAKE = ming is not None and _mapper_create_remakes()
 
 
 def is_objectid(value):
@@ -22,14 +44,72 @@ def is_mingobject(obj):
     return ming is not None and hasattr(obj, '__ming__')
 
 
+def is_odm_cursor(obj):
+    """Checks if the provided object is the result of a Ming ODM query"""
+    return ODMCursor is not None and isinstance(obj, ODMCursor)
+
+
+_field_names = weakref.WeakKeyDictionary()
+
+
+def _mapper_field_names(mapper):
+    # Fields of a mapped class never change, so they are looked up only once.
+    names = _field_names.get(mapper)
+    if names is None:
+        names = _field_names[mapper] = tuple(prop.name for prop in mapper.properties
+                                             if isinstance(prop, ming.odm.FieldProperty))
+    return names
+
+
 def dictify(obj):
     """Converts a Ming model instance to a dictionary"""
     if ming is None:  # pragma: no cover
         raise RuntimeError("Ming is not available")
 
-    prop_names = [prop.name for prop in ming.odm.mapper(obj).properties
-                  if isinstance(prop, ming.odm.property.FieldProperty)]
     props = {}
-    for key in prop_names:
+    for key in _mapper_field_names(ming.odm.mapper(obj)):
         props[key] = getattr(obj, key)
-    return props
\ No newline at end of file
+    return props
+
+
+def dictify_cursor(cursor):
+    """Converts the results of a Ming ODM query to dictionaries.
+
+    Returns an iterator that converts documents while they are read from
+    the cursor, like :func:`dictify` would do for each object, but without
+    creating the model instances. Objects already in the identity map of
+    the session are converted from the instance, so that changes not yet
+    flushed are included.
+
+    When the cursor has a ``decorate`` function or the session has
+    extensions the cursor is iterated as usual, as they expect to receive
+    the model instances. The same happens with Ming versions that don't
+    provide the cursor internals used to read the documents.
+    """
+    if ming is None:  # pragma: no cover
+        raise RuntimeError("Ming is not available")
+
+    options = getattr(cursor, '_options', None)
+    if (not _CREATE_REMAKE or options is None or not hasattr(cursor, 'ming_cursor') or
+            getattr(options, 'decorate', None) is not None or cursor.extensions):
+        for obj in cursor:
+            yield dictify(obj) if is_mingobject(obj) else obj
+        return
+
+    imap = cursor.session.imap
+    for doc in cursor.ming_cursor:
+        obj = imap.get(cursor.cls, doc['_id'])
+        if obj is not None:
+            yield dictify(obj)
+            continue
+
+        # The document might be of a subclass when using polymorphic models.
+        mapper = ming.odm.Mapper.by_collection(type(doc))
+        props = {}
+        try:
+            for key in _mapper_field_names(mapper):
+                props[key] = doc[key]
+        except KeyError:
+            # Missing fields have defaults or raise, the instance knows.
+            props = dictify(mapper.create(doc, options, remake=False))
+        yield props
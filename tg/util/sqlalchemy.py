@@ -1,13 +1,18 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 
+import weakref
+
 try:
     import sqlalchemy
     from sqlalchemy.engine import ResultProxy, RowProxy
+    from sqlalchemy.orm import Query
+    from sqlalchemy.orm.attributes import instance_state
 except ImportError:  # pragma: no cover
     sqlalchemy = None
     ResultProxy = None
     RowProxy = None
+    Query = None
 
 
 def is_saobject(obj):
@@ -23,18 +28,103 @@ def is_query_row(obj):
     return RowProxy is not None and isinstance(obj, RowProxy)
 
 
+def is_query(obj):
+    """Checks if the provided object is a SQLAlchemy ORM query"""
+    return Query is not None and isinstance(obj, Query)
+
+
+class _DictifyPlan(object):
+    """Attributes of the instances of a mapped class converted by :func:`dictify`.
+
+    The loaded attributes of an instance are the ones in its ``__dict__``
+    apart from SQLAlchemy internals, instances of the same class usually
+    have the same ones so they are looked up only when they change.
+    """
+    __slots__ = ('layout', )
+
+    def __init__(self):
+        # Keys of the last seen instance dictionary and the ones to exclude.
+        self.layout = (frozenset(), ())
+
+    def props(self, obj_dict):
+        keys, excluded = self.layout
+        if len(keys) != len(obj_dict) or not keys.issuperset(obj_dict):
+            keys = frozenset(obj_dict)
+            excluded = tuple(key for key in keys if key.startswith('_sa_'))
+            self.layout = (keys, excluded)
+
+        props = obj_dict.copy()
+        for key in excluded:
+            del props[key]
+        return props
+
+
+_dictify_plans = weakref.WeakKeyDictionary()
+
+
+def _dictify_plan(cls):
+    plan = _dictify_plans.get(cls)
+    if plan is None:
+        plan = _dictify_plans[cls] = _DictifyPlan()
+    return plan
+
+
+def _check_attached(obj):
+    if instance_state(obj).detached:
+        raise ValueError("SQLAlchemy instance '%r' must be attached to a session." % obj)
+
+
 def dictify(obj):
     """Converts a SQLAlchemy model instance to a dictionary"""
     if sqlalchemy is None:  # pragma: no cover
         raise RuntimeError('SQLAlchemy not available')
 
-    if sqlalchemy.inspect(obj).detached:
-        raise ValueError("SQLAlchemy instance '%r' must be attached to a session." % obj)
+    _check_attached(obj)
+    return _dictify_plan(obj.__class__).props(obj.__dict__)
+
+
+def dictify_all(objs, columns=None):
+    """Converts SQLAlchemy model instances to a list of dictionaries.
+
+    ``objs`` can be any iterable, like a list or a query. Each instance is
+    converted like :func:`dictify` does, unless ``columns`` is provided:
+    in such case only the listed attributes are included.
+    Values that are not model instances are returned as they are.
+    """
+    if sqlalchemy is None:  # pragma: no cover
+        raise RuntimeError('SQLAlchemy not available')
+
+    if columns is not None:
+        columns = tuple(columns)
+
+    plans = {}
+    # Instances usually come from the same session, check it once.
+    attached_sessions = set()
+    result = []
+    for obj in objs:
+        cls = obj.__class__
+        plan = plans.get(cls)
+        if plan is None:
+            plan = plans[cls] = _dictify_plan(cls) if is_saobject(obj) else False
+
+        if plan is False:
+            result.append(obj)
+            continue
+
+        state = instance_state(obj)
+        if state.session_id not in attached_sessions:
+            _check_attached(obj)
+            if state.session_id is not None:
+                attached_sessions.add(state.session_id)
 
-    props = {}
-    for key in obj.__dict__:
-        if not key.startswith('_sa_'):
-            props[key] = getattr(obj, key)
-    return props
+        obj_dict = obj.__dict__
+        if columns is None:
+            result.append(plan.props(obj_dict))
+        else:
+            # Loaded values are taken as they are, others are loaded.
+            result.append(dict((column, obj_dict[column] if column in obj_dict
+                                        else getattr(obj, column))
+                               for column in columns))
+    return result
 
 
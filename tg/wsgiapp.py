@@ -1,12 +1,14 @@
-import os, sys, logging
+import os, sys, logging, time
 import warnings
 import inspect
 from webob.exc import HTTPNotFound
 
 import tg
 from tg import request_local
-from tg.i18n import _get_translator
+from tg.configuration import milestones
+from tg.i18n import _get_request_translator
 from tg.request_local import Request, Response
+from tg.support.converters import asbool, asint, aslist
 
 try: #pragma: no cover
     import pylons
@@ -20,8 +22,20 @@ log = logging.getLogger(__name__)
 
 class RequestLocals(object):
     __slots__ = ('response', 'request', 'app_globals',
-                 'config', 'tmpl_context', 'translator',
-                 'session', 'cache', 'url')
+                 'config', 'tmpl_context', '_translator',
+                 '_translator_lang', 'session', 'cache', 'url')
+
+    @property
+    def translator(self):
+        """Translator for the request languages, created on first access."""
+        translator = self._translator
+        if translator is None:
+            translator = self._translator = _get_request_translator(self)
+        return translator
+
+    @translator.setter
+    def translator(self, value):
+        self._translator = value
 
 
 class TGApp(object):
@@ -83,6 +97,61 @@ class TGApp(object):
         if 'tg.root_controller' in self.config:
             self.controller_instances['root'] = self.config['tg.root_controller']
 
+        dispatch_cache_size = asint(self.config.get('dispatch.cache_size', 0))
+        if dispatch_cache_size > 0:
+            from tg.controllers.dispatchcache import DispatchCache
+            self.config['tg.dispatch_cache'] = DispatchCache(dispatch_cache_size)
+
+        if 'tg.root_controller' in self.config:
+            # When the root controller is looked up from the package
+            # the mount index is built on first use instead.
+            milestones.renderers_ready.register(self._build_mount_index)
+        if asbool(self.config.get('dispatch.compiled_routes', False)):
+            milestones.renderers_ready.register(self._compile_dispatch_routes)
+        if asbool(self.config.get('templating.warmup', False)):
+            milestones.renderers_ready.register(self._warmup_templates)
+
+    def _build_mount_index(self):
+        """Indexes where each controller is mounted in the controllers tree.
+
+        The resulting :class:`.MountIndex` is stored in the ``tg.mount_index``
+        configuration option and used by :attr:`.CoreDispatcher.mount_point`.
+        """
+        from tg.controllers.dispatchtable import MountIndex
+
+        self.config['tg.mount_index'] = MountIndex(self.config['tg.root_controller'])
+
+    def _compile_dispatch_routes(self):
+        """Precompiles the static routes of the root controller.
+
+        The resulting :class:`.DispatchTable` is stored in the
+        ``tg.dispatch_routes`` configuration option and is used by
+        the root controller to resolve requests without traversing
+        the controllers tree.
+        """
+        from tg.controllers.dispatchtable import DispatchTable
+
+        root_controller = self._get_controller_instance('root')
+        self.config['tg.dispatch_routes'] = DispatchTable.create(root_controller)
+
+    def _warmup_templates(self):
+        """Compiles the templates exposed by the controllers.
+
+        The templates exposed by the controllers mounted in the tree of
+        the root controller are compiled through :func:`tg.render.warmup_templates`.
+        """
+        from tg.render import warmup_templates
+
+        root_controller = self._get_controller_instance('root')
+
+        start = time.time()
+        workers = asint(self.config.get('templating.warmup_workers', 0))
+        extra_templates = aslist(self.config.get('templating.warmup_templates'))
+        compiled = warmup_templates(self.config, workers=workers,
+                                    extra_templates=extra_templates,
+                                    root_controller=root_controller)
+        log.info('Compiled %s templates in %.2fs', len(compiled), time.time() - start)
+
     def _setup_pylons_compatibility(self, environ, controller): #pragma: no cover
         """Updates environ to be backward compatible with Pylons"""
         try:
@@ -158,9 +227,6 @@ class TGApp(object):
             headers=resp_options['headers']
         )
 
-        # Setup the translator object
-        translator = _get_translator(self.lang, tg_config=conf)
-
         if self.strict_tmpl_context:
             tmpl_context = TemplateContext()
         else:
@@ -174,7 +240,9 @@ class TGApp(object):
         locals.app_globals = app_globals
         locals.config = conf
         locals.tmpl_context = tmpl_context
-        locals.translator = translator
+        # Translator is created only when something gets translated
+        locals._translator = None
+        locals._translator_lang = None
         locals.session = environ.get('beaker.session')  # Usually None, unless middleware in place
         locals.cache = environ.get('beaker.cache')  # Usually None, unless middleware in place
 